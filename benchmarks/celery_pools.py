@@ -0,0 +1,154 @@
+"""
+Confirmation email throughput on the notifications worker's pool, threads
+against solo (how the single worker used to run everything).
+
+Pending confirmations are seeded into a throwaway test database and one task
+per --batch-size of them is started, as dispatch_ticket_emails splits them.
+Each task runs send_reservation_email_batch: it leases its rows, renders and
+sends them over one connection to the SMTP stand-in from
+benchmarks.email_dispatch (which waits --handshake-ms before greeting and
+--send-ms before accepting each message) and marks them sent, then returns
+its connection as Celery does after a task. The tasks run on Celery's own
+pool implementations, so only the pool differs.
+
+Needs Postgres (SQLite serialises the concurrent claims) and a connection
+pool as large as the thread count, which the notifications worker gets from
+DB_POOL_MAX_SIZE in docker-compose.yml:
+
+    POSTGRES_DB=theater POSTGRES_USER=... POSTGRES_PASSWORD=... \\
+        python -m benchmarks.celery_pools --emails 400 --batch-size 25
+
+PostgreSQL 16.2 on the same host, the defaults (200 emails, batches of 10,
+50 ms handshake, 20 ms per message), three runs:
+
+    solo          5.9-6.0 s
+    threads x4    1.7-1.8 s
+    threads x16   1.1 s
+
+Nearly all of a task's time is spent waiting on the server, so threads
+overlap it until there are fewer tasks than threads. Each thread holds its
+database connection for the whole task: with DB_POOL_MAX_SIZE=4, as the
+gunicorn-sized pool used to give the worker, 16 threads take 2.2-2.3 s,
+and a task that waits longer than DB_POOL_TIMEOUT for a connection fails
+with PoolTimeout.
+"""
+
+import argparse
+import os
+import threading
+import time
+from unittest import mock
+
+import django
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "theater_service.settings.dev")
+os.environ.setdefault("DB_POOL_MAX_SIZE", "16")
+django.setup()
+
+from celery.concurrency import get_implementation  # noqa: E402
+from django.db import close_old_connections, connection  # noqa: E402
+from django.test.utils import override_settings, setup_test_environment  # noqa: E402
+
+from benchmarks.email_dispatch import SMTPHandler, SMTPStandIn, seed  # noqa: E402
+from theater.emails import send_reservation_email_batch  # noqa: E402
+from theater.models import ReservationEmail  # noqa: E402
+
+
+class SlowSMTPHandler(SMTPHandler):
+    def reply(self, line: str) -> None:
+        if line.startswith("250 queued"):
+            time.sleep(self.server.send_delay)
+        super().reply(line)
+
+
+def send_batch(batch_size: int) -> int | Exception:
+    try:
+        return send_reservation_email_batch(batch_size)["sent"]
+    except Exception as exc:
+        # handed back to run(): the pool would not call back on failure
+        return exc
+    finally:
+        close_old_connections()
+
+
+def run(pool_name: str, concurrency: int, tasks: int, batch_size: int) -> float:
+    pool = get_implementation(pool_name)(limit=concurrency)
+    pool.start()
+    done = threading.Semaphore(0)
+    results = []
+
+    def finished(result):
+        results.append(result)
+        done.release()
+
+    started = time.perf_counter()
+    for _ in range(tasks):
+        pool.apply_async(send_batch, (batch_size,), callback=finished)
+    for _ in range(tasks):
+        done.acquire()
+    elapsed = time.perf_counter() - started
+    pool.stop()
+    for result in results:
+        if isinstance(result, Exception):
+            raise result
+    return elapsed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--emails", type=int, default=200)
+    parser.add_argument("--batch-size", type=int, default=10)
+    parser.add_argument("--handshake-ms", type=float, default=50)
+    parser.add_argument("--send-ms", type=float, default=20)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[4, 16])
+    args = parser.parse_args()
+
+    setup_test_environment(debug=False)
+    smtp = SMTPStandIn(args.handshake_ms / 1000)
+    smtp.RequestHandlerClass = SlowSMTPHandler
+    smtp.send_delay = args.send_ms / 1000
+    threading.Thread(target=smtp.serve_forever, daemon=True).start()
+
+    old_name = connection.creation.create_test_db(verbosity=0)
+    try:
+        with mock.patch("theater.services.rebuild_catalog_snapshot.apply_async"):
+            seed(args.emails)
+        tasks = -(-args.emails // args.batch_size)
+        print(
+            f"{args.emails} confirmations in {tasks} tasks, "
+            f"{args.handshake_ms:g} ms handshake, {args.send_ms:g} ms per message"
+        )
+        print(f"{'pool':<14}{'seconds':>9}{'emails/s':>10}")
+        with override_settings(
+            EMAIL_BACKEND="django.core.mail.backends.smtp.EmailBackend",
+            EMAIL_HOST="127.0.0.1",
+            EMAIL_PORT=smtp.server_address[1],
+            EMAIL_USE_TLS=False,
+            EMAIL_HOST_USER="",
+            DEFAULT_FROM_EMAIL="tickets@example.com",
+        ):
+            runs = [("solo", 1)] + [("threads", n) for n in args.concurrency]
+            for pool_name, concurrency in runs:
+                ReservationEmail.objects.update(
+                    sent_at=None, attempts=0, claimed_until=None, claimed_by=""
+                )
+                smtp.messages = 0
+                elapsed = run(pool_name, concurrency, tasks, args.batch_size)
+                if smtp.messages != args.emails:
+                    raise RuntimeError(
+                        f"{pool_name}: {smtp.messages} of {args.emails} sent"
+                    )
+                label = pool_name if pool_name == "solo" else f"threads x{concurrency}"
+                print(f"{label:<14}{elapsed:>9.2f}{args.emails / elapsed:>10.1f}")
+    finally:
+        smtp.shutdown()
+        connection.close()
+        if getattr(connection, "pool", None) is not None:
+            connection.close_pool()
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+
+
+if __name__ == "__main__":
+    main()
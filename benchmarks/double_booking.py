@@ -0,0 +1,276 @@
+"""
+Double-booking stress test: many threads book overlapping seats at once
+through the booking form (HomePageListView.post) and the v1 TicketViewSet.
+
+Every attempt targets a seat from a deliberately small pool, so most of them
+collide. Afterwards the harness checks the database. No seat may be sold
+twice, every successful response must match exactly one ticket, and no
+ticket may exist without a successful response. It then reports throughput,
+conflict rate and per-channel latency. The exit status is non-zero if any
+invariant is broken or a request failed with something other than a clean
+conflict.
+
+Runs against a throwaway test database of the configured backend. For SQLite
+that is a temporary file, so threads contend on real locks:
+
+    python -m benchmarks.double_booking --threads 16 --attempts 800
+    DJANGO_SETTINGS_MODULE=theater_service.settings.prod \\
+        python -m benchmarks.double_booking --channel api
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from unittest import mock
+
+import django
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "theater_service.settings.base")
+django.setup()
+
+from django.contrib.auth import get_user_model  # noqa: E402
+from django.db import connection, connections  # noqa: E402
+from django.test import Client  # noqa: E402
+from django.test.utils import setup_test_environment  # noqa: E402
+from django.urls import reverse  # noqa: E402
+from django.utils import timezone  # noqa: E402
+from rest_framework.throttling import AnonRateThrottle, UserRateThrottle  # noqa: E402
+from rest_framework_simplejwt.tokens import AccessToken  # noqa: E402
+
+from theater.messages import MSG  # noqa: E402
+from theater.models import (  # noqa: E402
+    Play,
+    TheatreHall,
+    Performance,
+    Reservation,
+    Ticket,
+)
+
+SUCCESS = {"form": 200, "api": 201}
+
+
+def seed(performances: int, users: int) -> tuple[list, list]:
+    hall = TheatreHall.objects.create(name="Stress", rows=10, seats_in_row=10)
+    play = Play.objects.create(title="Stress", description="d")
+    perfs = [
+        Performance.objects.create(
+            play=play,
+            theatre_hall=hall,
+            show_time=timezone.now() + timedelta(days=i + 1),
+        )
+        for i in range(performances)
+    ]
+    accounts = []
+    for i in range(users):
+        user = get_user_model().objects.create_user(
+            email=f"stress{i}@example.com", password="stress"
+        )
+        # the API books into an existing reservation
+        reservation = Reservation.objects.create(user=user)
+        accounts.append((user, reservation, str(AccessToken.for_user(user))))
+    return perfs, accounts
+
+
+class Worker:
+    """
+    Per-thread test clients, one logged-in form client and one API client per
+    account. Threads wait for each other after logging in, so the first wave
+    of bookings starts at the same instant.
+    """
+
+    def __init__(self, accounts: list, start: threading.Barrier) -> None:
+        self.site, self.api = {}, {}
+        for user, _, token in accounts:
+            self.site[user.pk] = Client(raise_request_exception=False)
+            self.site[user.pk].force_login(user)
+            self.api[user.pk] = Client(
+                raise_request_exception=False, HTTP_AUTHORIZATION=f"Bearer {token}"
+            )
+        start.wait()
+
+
+def outcome(channel: str, response) -> str:
+    if response.status_code == SUCCESS[channel]:
+        return "ok"
+    # the form's unique check catches most collisions before the INSERT (400);
+    # the constraint catches the ones that race past it (409)
+    if (
+        response.status_code in (400, 409)
+        and MSG.SEAT_TAKEN in response.content.decode()
+    ):
+        return "conflict"
+    return "error"
+
+
+def attempt(worker, channel, account, perf_id, row, seat) -> dict:
+    user, reservation, _ = account
+    begin = time.perf_counter()
+    if channel == "form":
+        response = worker.site[user.pk].post(
+            reverse("theater:home"),
+            {"performance": perf_id, "row": row, "seat": seat},
+            HTTP_X_REQUESTED_WITH="XMLHttpRequest",
+        )
+    else:
+        response = worker.api[user.pk].post(
+            reverse("api_v1:ticket-list"),
+            {
+                "reservation": reservation.pk,
+                "performance": perf_id,
+                "row": row,
+                "seat": seat,
+            },
+            content_type="application/json",
+        )
+    end = time.perf_counter()
+    return {
+        "channel": channel,
+        "user": user.pk,
+        "seat": (perf_id, row, seat),
+        "status": response.status_code,
+        "outcome": outcome(channel, response),
+        "begin": begin,
+        "end": end,
+        "ms": (end - begin) * 1000,
+    }
+
+
+def percentile(values: list[float], pct: int) -> float:
+    if len(values) < 2:
+        return values[0] if values else 0.0
+    return statistics.quantiles(values, n=100, method="inclusive")[pct - 1]
+
+
+def check(results: list[dict], perfs: list) -> list[str]:
+    problems = []
+    tickets = list(
+        Ticket.objects.filter(performance__in=perfs).values_list(
+            "performance_id", "row", "seat", "reservation__user_id"
+        )
+    )
+    sold = Counter((perf, row, seat) for perf, row, seat, _ in tickets)
+    for key, count in sold.items():
+        if count > 1:
+            problems.append(f"seat {key} sold {count} times")
+
+    won = [r for r in results if r["outcome"] == "ok"]
+    winners = Counter(r["seat"] for r in won)
+    for key, count in winners.items():
+        if count > 1:
+            problems.append(f"seat {key} confirmed to {count} clients")
+    owners = {(perf, row, seat): user for perf, row, seat, user in tickets}
+    for r in won:
+        if owners.get(r["seat"]) != r["user"]:
+            problems.append(f"seat {r['seat']} confirmed but not owned by {r['user']}")
+    if len(tickets) != len(won):
+        problems.append(f"{len(tickets)} tickets for {len(won)} confirmations")
+    return problems
+
+
+def report(results: list[dict]) -> None:
+    by_channel = defaultdict(list)
+    for r in results:
+        by_channel[r["channel"]].append(r)
+
+    wall = max(r["end"] for r in results) - min(r["begin"] for r in results)
+    print(f"{len(results)} attempts in {wall:.2f}s ({len(results) / wall:.1f}/s)")
+    print(
+        f"{'channel':<8}{'ok':>6}{'taken':>7}{'error':>7}{'conflict%':>11}"
+        f"{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'max ms':>9}"
+    )
+    for channel, rows in sorted(by_channel.items()):
+        outcomes = Counter(r["outcome"] for r in rows)
+        latencies = [r["ms"] for r in rows]
+        print(
+            f"{channel:<8}{outcomes['ok']:>6}{outcomes['conflict']:>7}"
+            f"{outcomes['error']:>7}{100 * outcomes['conflict'] / len(rows):>10.1f}%"
+            f"{percentile(latencies, 50):>9.1f}{percentile(latencies, 95):>9.1f}"
+            f"{percentile(latencies, 99):>9.1f}{max(latencies):>9.1f}"
+        )
+    errors = Counter(r["status"] for r in results if r["outcome"] == "error")
+    if errors:
+        print(f"failed requests by status: {dict(errors)}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--attempts", type=int, default=400)
+    parser.add_argument(
+        "--seats", type=int, default=20, help="Size of the contested seat pool"
+    )
+    parser.add_argument("--performances", type=int, default=2)
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--channel", choices=("form", "api", "both"), default="both")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    setup_test_environment(debug=False)
+    for throttle in (AnonRateThrottle, UserRateThrottle):
+        throttle.allow_request = lambda self, request, view: True
+
+    settings_dict = connection.settings_dict
+    if settings_dict["ENGINE"] == "django.db.backends.sqlite3":
+        # a shared in-memory database serialises on its own cache lock; use a
+        # file so the threads hit SQLite's real write locking
+        tmp = tempfile.TemporaryDirectory()
+        settings_dict["TEST"]["NAME"] = os.path.join(tmp.name, "stress.sqlite3")
+        settings_dict["OPTIONS"].update(timeout=30, transaction_mode="IMMEDIATE")
+
+    threads = min(args.threads, args.attempts)
+    old_name = connection.creation.create_test_db(verbosity=0)
+    try:
+        with mock.patch("theater.services.rebuild_catalog_snapshot.apply_async"):
+            perfs, accounts = seed(args.performances, args.users)
+            rng = random.Random(args.seed)
+            pool = [
+                (perf.pk, 1 + i // 10, 1 + i % 10)
+                for perf in perfs
+                for i in rng.sample(range(100), args.seats)
+            ]
+            channels = ("form", "api") if args.channel == "both" else (args.channel,)
+            plan = [
+                (rng.choice(channels), rng.choice(accounts), *rng.choice(pool))
+                for _ in range(args.attempts)
+            ]
+
+            start = threading.Barrier(threads)
+            local = threading.local()
+
+            def run(item: tuple) -> dict:
+                if not hasattr(local, "worker"):
+                    local.worker = Worker(accounts, start)
+                try:
+                    return attempt(local.worker, *item)
+                finally:
+                    connections.close_all()
+
+            connections.close_all()
+            with ThreadPoolExecutor(max_workers=threads) as executor:
+                results = list(executor.map(run, plan))
+
+        report(results)
+        problems = check(results, perfs)
+    finally:
+        connections.close_all()
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+
+    for problem in problems:
+        print(f"OVERSELL {problem}")
+    if problems or any(r["outcome"] == "error" for r in results):
+        sys.exit(1)
+    print("no oversells")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,188 @@
+"""
+Booking confirmation throughput, one SMTP connection per email (how
+send_ticket_email used to deliver) against dispatch_ticket_emails batches.
+
+Pending confirmations are seeded into a throwaway test database and then
+delivered both ways. The SMTP stand-in is a local server that accepts
+everything. It waits --handshake-ms before greeting, to stand in for the TCP,
+TLS and AUTH round-trips of a real provider. With --backend locmem, messages
+go to Django's in-memory outbox instead, which isolates the rendering and
+database cost:
+
+    python -m benchmarks.email_dispatch --emails 500 --handshake-ms 80
+    python -m benchmarks.email_dispatch --backend locmem --batch-size 100
+"""
+
+import argparse
+import os
+import socketserver
+import threading
+import time
+from datetime import timedelta
+from unittest import mock
+
+import django
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "theater_service.settings.base")
+django.setup()
+
+from django.contrib.auth import get_user_model  # noqa: E402
+from django.core import mail  # noqa: E402
+from django.db import connection  # noqa: E402
+from django.test.utils import override_settings, setup_test_environment  # noqa: E402
+from django.utils import timezone  # noqa: E402
+
+from theater.emails import (  # noqa: E402
+    build_reservation_email,
+    tickets_by_reservation,
+)
+from theater.models import (  # noqa: E402
+    Play,
+    TheatreHall,
+    Performance,
+    Reservation,
+    Ticket,
+    ReservationEmail,
+)
+from theater.tasks import dispatch_ticket_emails  # noqa: E402
+
+
+class SMTPStandIn(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, handshake: float) -> None:
+        super().__init__(("127.0.0.1", 0), SMTPHandler)
+        self.handshake = handshake
+        self.lock = threading.Lock()
+        self.connections = 0
+        self.messages = 0
+
+
+class SMTPHandler(socketserver.StreamRequestHandler):
+    def reply(self, line: str) -> None:
+        self.wfile.write(line.encode() + b"\r\n")
+
+    def handle(self) -> None:
+        server = self.server
+        with server.lock:
+            server.connections += 1
+        time.sleep(server.handshake)
+        self.reply("220 stand-in ready")
+        while line := self.rfile.readline():
+            command = line[:4].upper()
+            if command in (b"EHLO", b"HELO"):
+                self.reply("250-stand-in\r\n250 SIZE 10485760")
+            elif command == b"DATA":
+                self.reply("354 go ahead")
+                while self.rfile.readline() not in (b".\r\n", b""):
+                    pass
+                with server.lock:
+                    server.messages += 1
+                self.reply("250 queued")
+            elif command == b"QUIT":
+                self.reply("221 bye")
+                return
+            else:
+                self.reply("250 OK")
+
+
+def seed(count: int) -> None:
+    hall = TheatreHall.objects.create(name="Bench", rows=100, seats_in_row=100)
+    play = Play.objects.create(title="Bench", description="d")
+    perf = Performance.objects.create(
+        play=play, theatre_hall=hall, show_time=timezone.now() + timedelta(days=1)
+    )
+    for i in range(count):
+        user = get_user_model().objects.create_user(
+            email=f"bench{i}@example.com", password=None
+        )
+        reservation = Reservation.objects.create(user=user)
+        Ticket.objects.create(
+            performance=perf,
+            reservation=reservation,
+            row=1 + i // 100,
+            seat=1 + i % 100,
+        )
+        ReservationEmail.objects.create(reservation=reservation)
+
+
+def per_message() -> None:
+    # one task per confirmation: its own lookups and a fresh connection
+    for reservation_id in ReservationEmail.objects.values_list(
+        "reservation_id", flat=True
+    ):
+        reservation = Reservation.objects.select_related("user").get(id=reservation_id)
+        tickets = tickets_by_reservation([reservation_id])[reservation_id]
+        build_reservation_email(reservation, tickets).send()
+
+
+def batched() -> None:
+    dispatch_ticket_emails.apply()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--emails", type=int, default=200)
+    parser.add_argument("--batch-size", type=int, default=50)
+    parser.add_argument("--handshake-ms", type=float, default=50)
+    parser.add_argument("--backend", choices=("smtp", "locmem"), default="smtp")
+    args = parser.parse_args()
+
+    setup_test_environment(debug=False)
+    smtp = SMTPStandIn(args.handshake_ms / 1000)
+    threading.Thread(target=smtp.serve_forever, daemon=True).start()
+    backend = {
+        "smtp": "django.core.mail.backends.smtp.EmailBackend",
+        "locmem": "django.core.mail.backends.locmem.EmailBackend",
+    }[args.backend]
+
+    old_name = connection.creation.create_test_db(verbosity=0)
+    try:
+        with mock.patch("theater.services.rebuild_catalog_snapshot.apply_async"):
+            seed(args.emails)
+        print(
+            f"{args.emails} confirmations, {args.backend} backend"
+            + (
+                f", {args.handshake_ms:g} ms handshake"
+                if args.backend == "smtp"
+                else ""
+            )
+        )
+        print(f"{'mode':<14}{'seconds':>9}{'emails/s':>10}{'connections':>13}")
+        with override_settings(
+            EMAIL_BACKEND=backend,
+            EMAIL_HOST="127.0.0.1",
+            EMAIL_PORT=smtp.server_address[1],
+            EMAIL_USE_TLS=False,
+            EMAIL_HOST_USER="",
+            DEFAULT_FROM_EMAIL="tickets@example.com",
+            EMAIL_BATCH_SIZE=args.batch_size,
+            EMAIL_DISPATCH_MAX_BATCHES=args.emails // args.batch_size + 1,
+        ):
+            for mode, run in (("per-message", per_message), ("batched", batched)):
+                ReservationEmail.objects.update(sent_at=None, attempts=0)
+                mail.outbox = []
+                smtp.connections = smtp.messages = 0
+                started = time.perf_counter()
+                run()
+                elapsed = time.perf_counter() - started
+                delivered = (
+                    smtp.messages if args.backend == "smtp" else len(mail.outbox)
+                )
+                if delivered != args.emails:
+                    raise RuntimeError(f"{mode}: {delivered} of {args.emails} sent")
+                connections = smtp.connections if args.backend == "smtp" else "-"
+                print(
+                    f"{mode:<14}{elapsed:>9.2f}{args.emails / elapsed:>10.1f}"
+                    f"{connections:>13}"
+                )
+    finally:
+        smtp.shutdown()
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,175 @@
+"""
+Per-email render cost of a booking confirmation, before and after the
+templates were split and fed preformatted values.
+
+"before" renders the previous templates, read from git as they were before
+layout.html was added (or at --before-rev), with render_to_string the way
+build_reservation_email used to. "before, no cache" does the same through an
+engine without the cached template loader, so every render also compiles
+both templates. "after" is build_reservation_email itself: templates held by
+the process, the HTML layout prerendered once and values passed as strings.
+Nothing touches the database or a mail server:
+
+    python -m benchmarks.email_render --performances 2 --seats 4
+
+On a laptop, one performance with two seats went from about 390 to 175 us
+per email and two performances with four seats each from 830 to 255 us.
+Most of the old cost was localising integers and the date filter.
+"""
+
+import argparse
+import os
+import subprocess
+import time
+from datetime import timedelta
+
+import django
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "theater_service.settings.base")
+django.setup()
+
+from django.conf import settings  # noqa: E402
+from django.contrib.auth import get_user_model  # noqa: E402
+from django.core.mail import EmailMultiAlternatives  # noqa: E402
+from django.template.engine import Engine  # noqa: E402
+from django.utils import timezone  # noqa: E402
+
+from theater.emails import build_reservation_email  # noqa: E402
+from theater.models import (  # noqa: E402
+    Play,
+    TheatreHall,
+    Performance,
+    Reservation,
+    Ticket,
+)
+
+LAYOUT_PATH = "templates/email/layout.html"
+BEFORE_TEMPLATES = ("ticket_booked.txt", "ticket_booked.html")
+
+
+def git(*args: str) -> str:
+    return subprocess.run(
+        ["git", *args],
+        cwd=settings.BASE_DIR,
+        capture_output=True,
+        check=True,
+        text=True,
+    ).stdout
+
+
+def before_templates(rev: str | None) -> dict[str, str]:
+    # by default the parent of the commit that split out the layout
+    if rev is None:
+        added = git("log", "--diff-filter=A", "--format=%H", "--", LAYOUT_PATH)
+        rev = f"{added.split()[-1]}^"
+    return {
+        name: git("show", f"{rev}:templates/email/{name}") for name in BEFORE_TEMPLATES
+    }
+
+
+def before_context(reservation, tickets, home_url):
+    performances, by_perf = [], {}
+    for ticket in tickets:
+        perf = ticket.performance
+        if perf.pk not in by_perf:
+            by_perf[perf.pk] = {
+                "play_title": perf.play.title,
+                "hall_name": perf.theatre_hall.name,
+                "show_time": perf.show_time,
+                "seats": [],
+            }
+            performances.append(by_perf[perf.pk])
+        by_perf[perf.pk]["seats"].append({"row": ticket.row, "seat": ticket.seat})
+    return {
+        "site_name": "Wildfire Stageworks",
+        "user_first": reservation.user.first_name,
+        "user_last": reservation.user.last_name,
+        "user_full": reservation.user.email,
+        "reservation_id": reservation.id,
+        "performances": performances,
+        "ticket_count": len(tickets),
+        "home_url": home_url,
+    }
+
+
+def build(performances: int, seats: int) -> tuple:
+    # unsaved instances with ids: the renderers only read attributes
+    user = get_user_model()(id=1, email="guest@example.com", first_name="Ada")
+    reservation = Reservation(id=42, user=user)
+    hall = TheatreHall(id=1, name="Main", rows=20, seats_in_row=30)
+    tickets = []
+    for p in range(performances):
+        perf = Performance(
+            id=p + 1,
+            play=Play(id=p + 1, title=f"Play {p}"),
+            theatre_hall=hall,
+            show_time=timezone.now() + timedelta(days=p + 1),
+        )
+        for s in range(seats):
+            tickets.append(
+                Ticket(
+                    id=len(tickets) + 1,
+                    performance=perf,
+                    reservation=reservation,
+                    row=1,
+                    seat=s + 1,
+                )
+            )
+    return reservation, tickets
+
+
+def timed(render, rounds: int) -> float:
+    render()
+    started = time.perf_counter()
+    for _ in range(rounds):
+        render()
+    return (time.perf_counter() - started) / rounds * 1_000_000
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--performances", type=int, default=1)
+    parser.add_argument("--seats", type=int, default=2)
+    parser.add_argument("--rounds", type=int, default=2000)
+    parser.add_argument("--before-rev", help="git revision of the old templates")
+    args = parser.parse_args()
+
+    reservation, tickets = build(args.performances, args.seats)
+    home_url = "https://example.com/"
+    locmem = (
+        "django.template.loaders.locmem.Loader",
+        before_templates(args.before_rev),
+    )
+    cached = Engine(loaders=[("django.template.loaders.cached.Loader", [locmem])])
+    uncached = Engine(loaders=[locmem])
+
+    def before(engine):
+        def render():
+            ctx = before_context(reservation, tickets, home_url)
+            text = engine.render_to_string("ticket_booked.txt", ctx)
+            html = engine.render_to_string("ticket_booked.html", ctx)
+            msg = EmailMultiAlternatives("subject", text, None, ["a@example.com"])
+            msg.attach_alternative(html, "text/html")
+
+        return render
+
+    def after():
+        build_reservation_email(reservation, tickets, home_url)
+
+    print(
+        f"{args.performances} performance(s) x {args.seats} seat(s), "
+        f"{args.rounds} renders, DEBUG={settings.DEBUG}"
+    )
+    print(f"{'renderer':<20}{'us/email':>10}")
+    for label, render in (
+        ("before, no cache", before(uncached)),
+        ("before", before(cached)),
+        ("after", after),
+    ):
+        print(f"{label:<20}{timed(render, args.rounds):>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
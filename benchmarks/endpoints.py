@@ -0,0 +1,338 @@
+"""
+Latency distribution and query count of the booking and catalog hot paths
+over seeded datasets of different sizes.
+
+Each dataset is generated with `manage.py seed_theater` into a throwaway test
+database. Every endpoint is then requested --iterations times through the
+Django test client, after --warmup unmeasured requests. Results are written
+as JSON. With --compare, endpoints whose p50 grew by more than --threshold,
+or whose query count grew at all, are reported as regressions and the script
+exits non-zero:
+
+    python -m benchmarks.endpoints --sizes small medium
+    python -m benchmarks.endpoints --sizes small --compare baseline.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone as dt_timezone
+from io import StringIO
+from pathlib import Path
+
+import django
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "theater_service.settings.base")
+django.setup()
+
+from django.contrib.auth import get_user_model  # noqa: E402
+from django.core.cache import cache  # noqa: E402
+from django.core.management import call_command  # noqa: E402
+from django.db import connection  # noqa: E402
+from django.db.models import Count  # noqa: E402
+from django.test import Client  # noqa: E402
+from django.test.utils import (  # noqa: E402
+    CaptureQueriesContext,
+    setup_test_environment,
+)
+from django.urls import reverse  # noqa: E402
+from django.utils import timezone  # noqa: E402
+from rest_framework.throttling import AnonRateThrottle, UserRateThrottle  # noqa: E402
+from rest_framework_simplejwt.tokens import AccessToken  # noqa: E402
+
+from theater.models import (  # noqa: E402
+    Actor,
+    Genre,
+    Play,
+    TheatreHall,
+    Performance,
+    Reservation,
+    Ticket,
+)
+
+RESULTS_DIR = Path(__file__).resolve().parent / "results"
+
+# seed_theater options per dataset size
+DATASETS = {
+    "small": {
+        "halls": 5,
+        "actors": 50,
+        "genres": 10,
+        "plays": 20,
+        "performances": 100,
+        "users": 100,
+    },
+    "medium": {
+        "halls": 20,
+        "actors": 500,
+        "genres": 20,
+        "plays": 200,
+        "performances": 2000,
+        "users": 2000,
+    },
+    "large": {
+        "halls": 50,
+        "actors": 2000,
+        "genres": 30,
+        "plays": 1000,
+        "performances": 20_000,
+        "users": 50_000,
+    },
+}
+
+
+class FreeSeats:
+    """Hands out unsold seats of upcoming performances for the write cases."""
+
+    def __init__(self) -> None:
+        self.performances = iter(
+            Performance.objects.filter(show_time__gt=timezone.now())
+            .select_related("theatre_hall")
+            .order_by("show_time")
+        )
+        self.seats = iter(())
+
+    def __call__(self) -> tuple[int, int, int]:
+        for perf, row, seat in self.seats:
+            return perf, row, seat
+        perf = next(self.performances)
+        hall = perf.theatre_hall
+        taken = set(perf.tickets.values_list("row", "seat"))
+        self.seats = iter(
+            (perf.pk, row, seat)
+            for row in range(1, hall.rows + 1)
+            for seat in range(1, hall.seats_in_row + 1)
+            if (row, seat) not in taken
+        )
+        return self()
+
+
+def summarize(latencies: list[float], queries: list[int]) -> dict:
+    if len(latencies) > 1:
+        q = statistics.quantiles(latencies, n=100, method="inclusive")
+    else:
+        q = latencies * 99
+    return {
+        "n": len(latencies),
+        "mean_ms": round(statistics.fmean(latencies), 3),
+        "p50_ms": round(q[49], 3),
+        "p90_ms": round(q[89], 3),
+        "p99_ms": round(q[98], 3),
+        "max_ms": round(max(latencies), 3),
+        "queries": max(queries),
+    }
+
+
+def measure(request, expected: int, iterations: int, warmup: int) -> dict:
+    for _ in range(warmup):
+        request()
+    latencies, queries = [], []
+    for _ in range(iterations):
+        with CaptureQueriesContext(connection) as ctx:
+            start = time.perf_counter()
+            response = request()
+            latencies.append((time.perf_counter() - start) * 1000)
+        if response.status_code != expected:
+            raise RuntimeError(
+                f"{response.request['PATH_INFO']} returned {response.status_code}"
+            )
+        queries.append(len(ctx.captured_queries))
+    return summarize(latencies, queries)
+
+
+def cases(user) -> dict:
+    site = Client()
+    site.force_login(user)
+    api = Client(HTTP_AUTHORIZATION=f"Bearer {AccessToken.for_user(user)}")
+    free_seat = FreeSeats()
+    reservation = Reservation.objects.create(user=user)
+
+    perf = Performance.objects.filter(show_time__gt=timezone.now()).first()
+    my_ticket = Ticket.objects.filter(reservation__user=user).first()
+    retrieve = {
+        "actor": Actor.objects.first(),
+        "genre": Genre.objects.first(),
+        "play": Play.objects.first(),
+        "hall": TheatreHall.objects.first(),
+        "performance": perf,
+        "reservation": my_ticket.reservation,
+        "ticket": my_ticket,
+    }
+
+    def book_on_site():
+        perf_id, row, seat = free_seat()
+        return site.post(
+            reverse("theater:home"),
+            {"performance": perf_id, "row": row, "seat": seat},
+            HTTP_X_REQUESTED_WITH="XMLHttpRequest",
+        )
+
+    def book_via_api():
+        perf_id, row, seat = free_seat()
+        return api.post(
+            reverse("api_v1:ticket-list"),
+            {
+                "reservation": reservation.pk,
+                "performance": perf_id,
+                "row": row,
+                "seat": seat,
+            },
+            content_type="application/json",
+        )
+
+    def ajax(path):
+        return lambda: site.get(path, HTTP_X_REQUESTED_WITH="XMLHttpRequest")
+
+    result = {
+        "performance_info": (
+            ajax(reverse("api:performance-info", args=[perf.pk])),
+            200,
+        ),
+        "home.get": (lambda: site.get(reverse("theater:home")), 200),
+        "home.post": (book_on_site, 200),
+        "v1.ticket.create": (book_via_api, 201),
+    }
+    for basename, obj in retrieve.items():
+        list_url = reverse(f"api_v1:{basename}-list")
+        detail_url = reverse(f"api_v1:{basename}-detail", args=[obj.pk])
+        result[f"v1.{basename}.list"] = (lambda u=list_url: api.get(u), 200)
+        result[f"v1.{basename}.retrieve"] = (lambda u=detail_url: api.get(u), 200)
+    return result
+
+
+def run_dataset(name: str, seed: int, iterations: int, warmup: int) -> dict:
+    old_name = connection.creation.create_test_db(verbosity=0)
+    try:
+        cache.clear()
+        call_command("seed_theater", seed=seed, stdout=StringIO(), **DATASETS[name])
+        # the busiest customer, so "my reservations" has something to page
+        user = (
+            get_user_model()
+            .objects.annotate(n=Count("reservations"))
+            .order_by("-n")
+            .first()
+        )
+        counts = {
+            model._meta.model_name: model.objects.count()
+            for model in (Play, Performance, Reservation, Ticket)
+        }
+
+        endpoints = {}
+        for endpoint, (request, expected) in cases(user).items():
+            endpoints[endpoint] = measure(request, expected, iterations, warmup)
+            print(
+                f"  {endpoint:<28}p50 {endpoints[endpoint]['p50_ms']:8.2f} ms"
+                f"   p99 {endpoints[endpoint]['p99_ms']:8.2f} ms"
+                f"   {endpoints[endpoint]['queries']:>3} queries"
+            )
+        return {
+            "seed_options": DATASETS[name],
+            "counts": counts,
+            "endpoints": endpoints,
+        }
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+
+
+def git_revision() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(baseline: dict, current: dict, threshold: float) -> list[str]:
+    regressions = []
+    for dataset, data in current["datasets"].items():
+        old_endpoints = baseline["datasets"].get(dataset, {}).get("endpoints", {})
+        for endpoint, new in data["endpoints"].items():
+            old = old_endpoints.get(endpoint)
+            if old is None:
+                continue
+            if new["p50_ms"] > old["p50_ms"] * (1 + threshold):
+                regressions.append(
+                    f"{dataset}/{endpoint}: p50 {old['p50_ms']:.2f} -> "
+                    f"{new['p50_ms']:.2f} ms"
+                )
+            if new["queries"] > old["queries"]:
+                regressions.append(
+                    f"{dataset}/{endpoint}: queries {old['queries']} -> "
+                    f"{new['queries']}"
+                )
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument(
+        "--sizes", nargs="+", choices=DATASETS, default=["small", "medium"]
+    )
+    parser.add_argument("--iterations", type=int, default=50)
+    parser.add_argument("--warmup", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", type=Path)
+    parser.add_argument("--compare", type=Path, help="Baseline results JSON")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.15,
+        help="Allowed relative p50 increase before flagging (default 0.15)",
+    )
+    args = parser.parse_args()
+
+    # as under the test runner: no debug toolbar, no query log overhead
+    setup_test_environment(debug=False)
+    # measure the views, not the rate limits
+    for throttle in (AnonRateThrottle, UserRateThrottle):
+        throttle.allow_request = lambda self, request, view: True
+
+    started = datetime.now(dt_timezone.utc)
+    results = {
+        "meta": {
+            "started_at": started.isoformat(),
+            "git_revision": git_revision(),
+            "python": platform.python_version(),
+            "django": django.get_version(),
+            "database": connection.vendor,
+            "iterations": args.iterations,
+            "warmup": args.warmup,
+            "seed": args.seed,
+        },
+        "datasets": {},
+    }
+    for size in args.sizes:
+        print(f"{size}:")
+        results["datasets"][size] = run_dataset(
+            size, args.seed, args.iterations, args.warmup
+        )
+
+    output = args.output or RESULTS_DIR / f"endpoints-{started:%Y%m%dT%H%M%S}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(results, indent=2) + "\n")
+    print(f"results written to {output}")
+
+    if args.compare:
+        regressions = compare(
+            json.loads(args.compare.read_text()), results, args.threshold
+        )
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        if regressions:
+            sys.exit(1)
+        print(f"no regressions against {args.compare}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+"""
+CPU and memory cost of the values-based list path (`ValuesListSerializer`)
+against DRF's stock `ListSerializer` on the flat v1 list serializers.
+
+    python -m benchmarks.list_serializers --rows 10000
+"""
+
+import argparse
+import os
+import time
+import tracemalloc
+from datetime import timedelta
+
+import django
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "theater_service.settings.base")
+django.setup()
+
+from django.contrib.auth import get_user_model  # noqa: E402
+from django.db import connection  # noqa: E402
+from django.utils import timezone  # noqa: E402
+from rest_framework import serializers  # noqa: E402
+from rest_framework.renderers import JSONRenderer  # noqa: E402
+
+from theater.api.v1.serializers import (  # noqa: E402
+    GenreSerializer,
+    PerformanceListSerializer,
+    ReservationListSerializer,
+    TicketListSerializer,
+)
+from theater.models import (  # noqa: E402
+    Genre,
+    Play,
+    TheatreHall,
+    Performance,
+    Reservation,
+    Ticket,
+)
+
+
+def seed(rows: int) -> None:
+    user = get_user_model().objects.create_user(
+        email="bench@example.com", password="bench"
+    )
+    seats = 100
+    hall = TheatreHall.objects.create(
+        name="Bench", rows=rows // seats + 1, seats_in_row=seats
+    )
+    play = Play.objects.create(title="Bench", description="d")
+    now = timezone.now()
+    Genre.objects.bulk_create(Genre(name=f"Genre {i}") for i in range(rows))
+    perfs = Performance.objects.bulk_create(
+        Performance(play=play, theatre_hall=hall, show_time=now + timedelta(hours=i))
+        for i in range(rows)
+    )
+    reservations = Reservation.objects.bulk_create(
+        Reservation(user=user) for _ in range(rows)
+    )
+    Ticket.objects.bulk_create(
+        Ticket(
+            performance=perfs[0],
+            reservation=reservations[i],
+            row=i // seats + 1,
+            seat=i % seats + 1,
+        )
+        for i in range(rows)
+    )
+
+
+def measure(build, repeat: int) -> tuple[float, int, bytes]:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        data = build()
+        best = min(best, time.perf_counter() - start)
+
+    tracemalloc.start()
+    data = build()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return best, peak, JSONRenderer().render(data)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=10_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    old_name = connection.creation.create_test_db(verbosity=0)
+    try:
+        seed(args.rows)
+        cases = (
+            (GenreSerializer, Genre.objects.order_by("name")),
+            (PerformanceListSerializer, Performance.objects.order_by("show_time")),
+            (ReservationListSerializer, Reservation.objects.order_by("-created_at")),
+            (TicketListSerializer, Ticket.objects.order_by("row", "seat")),
+        )
+
+        print(f"{args.rows} rows, best of {args.repeat}")
+        print(
+            f"{'serializer':<28}{'stock ms':>10}{'fast ms':>10}"
+            f"{'stock MiB':>11}{'fast MiB':>10}"
+        )
+        for serializer_class, qs in cases:
+            stock_t, stock_mem, stock_out = measure(
+                lambda: serializers.ListSerializer(
+                    qs.all(), child=serializer_class()
+                ).data,
+                args.repeat,
+            )
+            fast_t, fast_mem, fast_out = measure(
+                lambda: serializer_class(qs.all(), many=True).data, args.repeat
+            )
+            assert stock_out == fast_out, f"{serializer_class.__name__} output differs"
+            print(
+                f"{serializer_class.__name__:<28}"
+                f"{stock_t * 1000:>10.1f}{fast_t * 1000:>10.1f}"
+                f"{stock_mem / 2**20:>11.1f}{fast_mem / 2**20:>10.1f}"
+            )
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+
+
+if __name__ == "__main__":
+    main()
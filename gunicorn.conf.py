@@ -0,0 +1,13 @@
+import os
+
+# gunicorn reads WEB_CONCURRENCY itself; the settings size each worker's
+# database pool from the same two variables
+threads = max(int(os.getenv("GUNICORN_THREADS", "1")), 1)
+
+
+def child_exit(server, worker):
+    # drop the dead worker's live gauges from the aggregated /metrics
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        from prometheus_client import multiprocess
+
+        multiprocess.mark_process_dead(worker.pid)
@@ -112,6 +112,55 @@ function initCustomAnchorScrollAndActive() {
   }
 }
 
+// --- "My Reservations": infinite scroll + history toggle ---
+function initMyReservations() {
+  const tbody  = document.getElementById('my-reservations-body');
+  const toggle = document.getElementById('my-reservations-history');
+  if (!tbody) return;
+
+  const baseUrl = tbody.dataset.url;
+  let loading = false;
+
+  const io = new IntersectionObserver((entries) => {
+    for (const entry of entries) {
+      if (!entry.isIntersecting || loading) continue;
+      const sentinel = entry.target;
+      io.unobserve(sentinel);
+      loading = true;
+      fetch(sentinel.dataset.nextUrl, {
+        headers: { 'X-Requested-With': 'XMLHttpRequest', 'Accept': 'text/html' },
+        credentials: 'same-origin'
+      })
+        .then(r => (r.ok ? r.text() : Promise.reject(r)))
+        .then(html => { sentinel.insertAdjacentHTML('afterend', html); sentinel.remove(); })
+        .catch(() => io.observe(sentinel))
+        .finally(() => { loading = false; });
+    }
+  }, { rootMargin: '200px' });
+
+  function observeSentinel() {
+    const sentinel = tbody.querySelector('.reservations-sentinel');
+    if (sentinel) io.observe(sentinel);
+  }
+
+  // rows are replaced by booking.js after a purchase and by the toggle below
+  new MutationObserver(observeSentinel).observe(tbody, { childList: true });
+  observeSentinel();
+
+  if (toggle && baseUrl) {
+    toggle.addEventListener('change', () => {
+      tbody.dataset.url = toggle.checked ? `${baseUrl}?scope=all` : baseUrl;
+      fetch(tbody.dataset.url, {
+        headers: { 'X-Requested-With': 'XMLHttpRequest', 'Accept': 'text/html' },
+        credentials: 'same-origin'
+      })
+        .then(r => (r.ok ? r.text() : Promise.reject(r)))
+        .then(html => { tbody.innerHTML = html; })
+        .catch(() => {});
+    });
+  }
+}
+
 // --- public init (called from template) ---
 export function initPartials() {
   // Performances
@@ -174,6 +223,9 @@ export function initPartials() {
     });
   }
 
+  // My reservations
+  initMyReservations();
+
   // Navbar behavior
   initCustomAnchorScrollAndActive();
 }
\ No newline at end of file
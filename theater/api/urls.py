@@ -1,8 +1,14 @@
 from django.urls import path
-from theater.views import performance_info
+from theater.views import (
+    performance_info,
+    catalog_snapshot,
+    catalog_snapshot_file,
+)
 
 app_name = "api"
 
 urlpatterns = [
     path("performance-info/<int:pk>/", performance_info, name="performance-info"),
+    path("catalog/", catalog_snapshot, name="catalog"),
+    path("catalog/<slug:digest>.json", catalog_snapshot_file, name="catalog-file"),
 ]
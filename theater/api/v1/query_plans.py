@@ -0,0 +1,62 @@
+from dataclasses import dataclass
+from django.db.models import Prefetch, QuerySet
+from rest_framework import serializers
+from rest_framework.relations import ManyRelatedField
+
+
+@dataclass(frozen=True)
+class QueryPlan:
+    select_related: tuple[str, ...] = ()
+    prefetch_related: tuple[str | Prefetch, ...] = ()
+    only: tuple[str, ...] = ()
+
+    def apply(self, qs: QuerySet) -> QuerySet:
+        if self.select_related:
+            qs = qs.select_related(*self.select_related)
+        if self.prefetch_related:
+            qs = qs.prefetch_related(*self.prefetch_related)
+        if self.only:
+            qs = qs.only(*self.only)
+        return qs
+
+
+class QueryPlanMixin:
+    query_plans: dict[str, QueryPlan] = {}
+    default_query_plan = QueryPlan()
+
+    def get_query_plan(self) -> QueryPlan:
+        return self.query_plans.get(self.action, self.default_query_plan)
+
+    def get_queryset(self) -> QuerySet:
+        return self.get_query_plan().apply(super().get_queryset())
+
+
+def serializer_relations(
+    serializer: serializers.Serializer, prefix: str = ""
+) -> tuple[set[str], set[str]]:
+    """Relations read while serializing: (select_related, prefetch_related)."""
+    select: set[str] = set()
+    prefetch: set[str] = set()
+
+    for field in serializer.fields.values():
+        if field.write_only or not field.source_attrs:
+            continue
+        path = prefix + "__".join(field.source_attrs)
+
+        if isinstance(field, serializers.ListSerializer):
+            prefetch.add(path)
+            sub_select, sub_prefetch = serializer_relations(field.child, path + "__")
+            prefetch |= sub_select | sub_prefetch
+        elif isinstance(field, ManyRelatedField):
+            prefetch.add(path)
+        elif isinstance(field, serializers.Serializer):
+            select.add(path)
+            sub_select, sub_prefetch = serializer_relations(field, path + "__")
+            select |= sub_select
+            prefetch |= sub_prefetch
+        elif len(field.source_attrs) > 1:
+            select.add(prefix + "__".join(field.source_attrs[:-1]))
+
+    # "performance__play" already joins "performance"
+    select = {s for s in select if not any(o.startswith(s + "__") for o in select)}
+    return select, prefetch
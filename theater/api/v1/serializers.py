@@ -1,7 +1,11 @@
 from django.contrib.auth import get_user_model
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import QuerySet
+from django.db.models.manager import BaseManager
 from rest_framework import serializers
 from typing import Optional
 
+from theater.images import responsive_sources
 from theater.models import (
     Actor,
     Genre,
@@ -15,12 +19,94 @@ from theater.models import (
 User = get_user_model()
 
 
+class ValuesListSerializer(serializers.ListSerializer):
+    """
+    Serializes flat querysets straight from `values_list()` rows, skipping
+    model instantiation. Falls back to the regular path whenever a readable
+    field is not a plain column, so the output stays identical.
+    """
+
+    passthrough_fields = (
+        serializers.IntegerField,
+        serializers.CharField,
+        serializers.PrimaryKeyRelatedField,
+    )
+
+    def get_values_plan(self) -> list[tuple] | None:
+        child = self.child
+        if (
+            type(child).to_representation
+            is not serializers.Serializer.to_representation
+        ):
+            return None
+
+        opts = child.Meta.model._meta
+        plan = []
+        for field in child._readable_fields:
+            if len(field.source_attrs) != 1:
+                return None
+            try:
+                model_field = opts.get_field(field.source_attrs[0])
+            except FieldDoesNotExist:
+                return None
+            if not model_field.concrete or model_field.many_to_many:
+                return None
+            if isinstance(field, serializers.RelatedField) and (
+                not isinstance(field, serializers.PrimaryKeyRelatedField)
+                or field.pk_field is not None
+            ):
+                return None
+
+            convert = (
+                None
+                if isinstance(field, self.passthrough_fields)
+                else field.to_representation
+            )
+            plan.append((field.field_name, model_field.attname, convert))
+        return plan
+
+    def to_representation(self, data):
+        if isinstance(data, BaseManager):
+            data = data.all()
+        # prefetched (already evaluated) querysets are cheaper to serialize as is
+        fresh = isinstance(data, QuerySet) and data._result_cache is None
+        plan = self.get_values_plan() if fresh else None
+        if plan is None:
+            return super().to_representation(data)
+
+        names = [name for name, _, _ in plan]
+        converters = [(i, convert) for i, (_, _, convert) in enumerate(plan) if convert]
+        rows = (
+            data.prefetch_related(None)
+            .values_list(*[attname for _, attname, _ in plan])
+            .iterator(chunk_size=2000)
+        )
+
+        result = []
+        for row in rows:
+            if converters:
+                row = list(row)
+                for i, convert in converters:
+                    if row[i] is not None:
+                        row[i] = convert(row[i])
+            result.append(dict(zip(names, row)))
+        return result
+
+
 class ActorSerializer(serializers.ModelSerializer):
     avatar_url = serializers.SerializerMethodField(read_only=True)
+    avatar_srcset = serializers.SerializerMethodField(read_only=True)
 
     class Meta:
         model = Actor
-        fields = ["id", "first_name", "last_name", "avatar", "avatar_url"]
+        fields = [
+            "id",
+            "first_name",
+            "last_name",
+            "avatar",
+            "avatar_url",
+            "avatar_srcset",
+        ]
         extra_kwargs = {
             "avatar": {"write_only": True, "required": False},
         }
@@ -35,12 +121,21 @@ class ActorSerializer(serializers.ModelSerializer):
         url = obj.avatar.url
         return request.build_absolute_uri(url) if request else url
 
+    def get_avatar_srcset(self, obj: "Actor") -> Optional[dict]:
+        request = self.context.get("request")
+        return responsive_sources(
+            obj.avatar,
+            obj.avatar_variants,
+            request.build_absolute_uri if request else None,
+        )
+
 
 class GenreSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Genre
         fields = ("id", "name")
+        list_serializer_class = ValuesListSerializer
 
 
 class TheatreHallSerializer(serializers.ModelSerializer):
@@ -51,10 +146,11 @@ class TheatreHallSerializer(serializers.ModelSerializer):
 
 class _PlayBaseSerializer(serializers.ModelSerializer):
     image_url = serializers.SerializerMethodField(read_only=True)
+    image_srcset = serializers.SerializerMethodField(read_only=True)
 
     class Meta:
         model = Play
-        fields = ("id", "title", "description", "image", "image_url")
+        fields = ("id", "title", "description", "image", "image_url", "image_srcset")
         extra_kwargs = {
             "image": {"write_only": True, "required": False},
         }
@@ -66,6 +162,14 @@ class _PlayBaseSerializer(serializers.ModelSerializer):
         url = obj.image.url
         return request.build_absolute_uri(url) if request else url
 
+    def get_image_srcset(self, obj: Play) -> Optional[dict]:
+        request = self.context.get("request")
+        return responsive_sources(
+            obj.image,
+            obj.image_variants,
+            request.build_absolute_uri if request else None,
+        )
+
 
 class PlayListSerializer(_PlayBaseSerializer):
     actors = serializers.PrimaryKeyRelatedField(many=True, read_only=True)
@@ -117,6 +221,7 @@ class PerformanceListSerializer(serializers.ModelSerializer):
     class Meta:
         model = Performance
         fields = ("id", "show_time", "play", "theatre_hall")
+        list_serializer_class = ValuesListSerializer
 
 
 class PerformanceRetrieveSerializer(serializers.ModelSerializer):
@@ -139,6 +244,7 @@ class ReservationListSerializer(serializers.ModelSerializer):
     class Meta:
         model = Reservation
         fields = ("id", "created_at", "user")
+        list_serializer_class = ValuesListSerializer
 
 
 class ReservationRetrieveSerializer(serializers.ModelSerializer):
@@ -192,6 +298,7 @@ class TicketListSerializer(serializers.ModelSerializer):
     class Meta:
         model = Ticket
         fields = ("id", "row", "seat", "performance", "reservation")
+        list_serializer_class = ValuesListSerializer
 
 
 class TicketRetrieveSerializer(serializers.ModelSerializer):
@@ -9,6 +9,8 @@ from theater.api.v1.views import (
     PerformanceViewSet,
     ReservationViewSet,
     TicketViewSet,
+    SyncView,
+    DatabasePoolStatsView,
 )
 
 app_name = "api_v1"
@@ -24,5 +26,7 @@ router.register("performances", PerformanceViewSet, basename="performance")
 
 
 urlpatterns = [
+    path("sync/", SyncView.as_view(), name="sync"),
+    path("ops/db-pool/", DatabasePoolStatsView.as_view(), name="db-pool"),
     path("", include(router.urls)),
 ]
@@ -1,6 +1,16 @@
+from datetime import timedelta
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Prefetch
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
 from rest_framework import viewsets
+from rest_framework import status
+from rest_framework.exceptions import APIException, ValidationError
+from rest_framework.response import Response
+from rest_framework.views import APIView
 from django_filters.rest_framework import DjangoFilterBackend
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
 from drf_spectacular.utils import (
     extend_schema,
     extend_schema_view,
@@ -9,6 +19,11 @@ from drf_spectacular.utils import (
     OpenApiExample,
 )
 
+from theater.db import pool_stats, violates_constraint
+from theater.messages import MSG
+from theater.metrics import record_booking
+from theater.services import notify_reservation_booked
+from theater.api.v1.query_plans import QueryPlan, QueryPlanMixin
 from theater.api.v1.serializers import (
     ActorSerializer,
     GenreSerializer,
@@ -27,6 +42,7 @@ from theater.api.v1.serializers import (
     TicketWriteSerializer,
 )
 from theater.models import (
+    CatalogTombstone,
     Actor,
     Genre,
     Play,
@@ -37,6 +53,12 @@ from theater.models import (
 )
 
 
+class SeatTaken(APIException):
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = MSG.SEAT_TAKEN
+    default_code = "seat_taken"
+
+
 class ActorViewSet(viewsets.ModelViewSet):
     queryset = Actor.objects.all().order_by("last_name", "first_name")
     serializer_class = ActorSerializer
@@ -66,13 +88,17 @@ class TheatreHallViewSet(viewsets.ModelViewSet):
         ],
     )
 )
-class PlayViewSet(viewsets.ModelViewSet):
-    queryset = (
-        Play.objects.all()
-        .prefetch_related("actors", "genres")
-        .order_by("title")
-        .distinct()
-    )
+class PlayViewSet(QueryPlanMixin, viewsets.ModelViewSet):
+    queryset = Play.objects.all().order_by("title").distinct()
+    query_plans = {
+        "list": QueryPlan(
+            prefetch_related=(
+                Prefetch("actors", queryset=Actor.objects.only("id")),
+                Prefetch("genres", queryset=Genre.objects.only("id")),
+            )
+        ),
+        "retrieve": QueryPlan(prefetch_related=("actors", "genres")),
+    }
     filter_backends = [DjangoFilterBackend]
     filterset_fields = {"genres": ["exact"]}
 
@@ -98,12 +124,15 @@ class PlayViewSet(viewsets.ModelViewSet):
         ],
     )
 )
-class PerformanceViewSet(viewsets.ModelViewSet):
-    queryset = (
-        Performance.objects.select_related("play", "theatre_hall")
-        .prefetch_related("play__actors", "play__genres")
-        .order_by("show_time")
-    )
+class PerformanceViewSet(QueryPlanMixin, viewsets.ModelViewSet):
+    queryset = Performance.objects.order_by("show_time")
+    query_plans = {
+        "list": QueryPlan(only=("id", "show_time", "play", "theatre_hall")),
+        "retrieve": QueryPlan(
+            select_related=("play", "theatre_hall"),
+            prefetch_related=("play__actors", "play__genres"),
+        ),
+    }
     filter_backends = [DjangoFilterBackend]
     filterset_fields = ["theatre_hall"]
 
@@ -115,17 +144,15 @@ class PerformanceViewSet(viewsets.ModelViewSet):
         return PerformanceWriteSerializer
 
 
-class ReservationViewSet(viewsets.ModelViewSet):
+class ReservationViewSet(QueryPlanMixin, viewsets.ModelViewSet):
     permission_classes = [IsAuthenticated]
+    queryset = Reservation.objects.order_by("-created_at")
+    query_plans = {
+        "retrieve": QueryPlan(select_related=("user",)),
+    }
 
     def get_queryset(self):
-        qs = (
-            Reservation.objects.select_related("user")
-            .prefetch_related(
-                "tickets", "tickets__performance", "tickets__performance__play"
-            )
-            .order_by("-created_at")
-        )
+        qs = super().get_queryset()
         user = self.request.user
         if not user.is_authenticated:
             return qs.none()
@@ -153,31 +180,134 @@ class ReservationViewSet(viewsets.ModelViewSet):
         ],
     )
 )
-class TicketViewSet(viewsets.ModelViewSet):
+class TicketViewSet(QueryPlanMixin, viewsets.ModelViewSet):
     permission_classes = [IsAuthenticated]
     filter_backends = [DjangoFilterBackend]
     filterset_fields = ["performance"]
-
-    def get_queryset(self):
-        qs = (
-            Ticket.objects.select_related(
-                "reservation",
+    queryset = Ticket.objects.order_by("performance__show_time", "row", "seat")
+    query_plans = {
+        "list": QueryPlan(),
+        "retrieve": QueryPlan(
+            select_related=(
                 "reservation__user",
-                "performance",
-                "performance__theatre_hall",
                 "performance__play",
-            )
-            .prefetch_related("performance__play__actors", "performance__play__genres")
-            .order_by("performance__show_time", "row", "seat")
-        )
+                "performance__theatre_hall",
+            ),
+            prefetch_related=("performance__play__actors", "performance__play__genres"),
+        ),
+    }
+    # updates validate row/seat against instance.performance.theatre_hall
+    default_query_plan = QueryPlan(select_related=("performance__theatre_hall",))
+
+    def get_queryset(self):
+        qs = super().get_queryset()
         user = self.request.user
         if not user.is_authenticated:
             return qs.none()
         return qs if user.is_staff else qs.filter(reservation__user=user)
 
+    def perform_create(self, serializer):
+        # the serializer skips the unique-seat check; the constraint decides
+        # which of two concurrent requests for the same seat wins
+        try:
+            with transaction.atomic():
+                ticket = serializer.save()
+                notify_reservation_booked(self.request, ticket.reservation)
+        except IntegrityError as exc:
+            if not violates_constraint(exc, Ticket, "uniq_performance_row_seat"):
+                raise
+            record_booking("api", "conflict")
+            raise SeatTaken()
+        record_booking("api", "success")
+
     def get_serializer_class(self):
         if self.action == "list":
             return TicketListSerializer
         if self.action == "retrieve":
             return TicketRetrieveSerializer
         return TicketWriteSerializer
+
+
+@extend_schema(
+    description=(
+        "Catalog changes since a cursor. Returns rows created or updated and ids "
+        "deleted since `since`, plus the cursor for the next call. Without "
+        "`since`, or with a cursor older than the tombstone retention, returns "
+        "the full catalog with `reset: true`."
+    ),
+    parameters=[
+        OpenApiParameter(
+            name="since",
+            type=OpenApiTypes.DATETIME,
+            location=OpenApiParameter.QUERY,
+            description="`cursor` value from the previous sync response.",
+        ),
+    ],
+)
+class SyncView(APIView):
+    resources = {
+        "actors": (Actor, ActorSerializer, QueryPlan()),
+        "genres": (Genre, GenreSerializer, QueryPlan()),
+        "halls": (TheatreHall, TheatreHallSerializer, QueryPlan()),
+        "plays": (Play, PlayListSerializer, PlayViewSet.query_plans["list"]),
+        "performances": (
+            Performance,
+            PerformanceListSerializer,
+            PerformanceViewSet.query_plans["list"],
+        ),
+    }
+    # rows committed by transactions still open when the cursor was issued
+    overlap = timedelta(seconds=5)
+
+    def get_since(self):
+        raw = self.request.query_params.get("since")
+        if not raw:
+            return None
+        since = parse_datetime(raw)
+        if since is None:
+            raise ValidationError({"since": "Invalid cursor."})
+        # cursors carry an offset; a bare timestamp is read as server time
+        if timezone.is_naive(since):
+            since = timezone.make_aware(since)
+        return since
+
+    def get(self, request, *args, **kwargs):
+        now = timezone.now()
+        since = self.get_since()
+        retention = timedelta(days=settings.CATALOG_TOMBSTONE_RETENTION_DAYS)
+        reset = since is None or since < now - retention
+
+        payload = {"cursor": now.isoformat(), "reset": reset, "deleted": {}}
+        for name, (model, serializer_class, plan) in self.resources.items():
+            qs = plan.apply(model.objects.order_by("pk"))
+            deleted = []
+            if not reset:
+                qs = qs.filter(updated_at__gte=since - self.overlap)
+                deleted = (
+                    CatalogTombstone.objects.filter(
+                        model_name=model._meta.model_name,
+                        deleted_at__gte=since - self.overlap,
+                    )
+                    .order_by("object_id")
+                    .values_list("object_id", flat=True)
+                    .distinct()
+                )
+            payload[name] = serializer_class(
+                qs, many=True, context={"request": request}
+            ).data
+            payload["deleted"][name] = list(deleted)
+        return Response(payload)
+
+
+@extend_schema(
+    description=(
+        "Per-process database connection pool statistics (psycopg pool): "
+        "size, available connections, waiting requests, cumulative wait time "
+        "and saturation. Empty when pooling is disabled."
+    ),
+)
+class DatabasePoolStatsView(APIView):
+    permission_classes = [IsAdminUser]
+
+    def get(self, request, *args, **kwargs):
+        return Response(pool_stats())
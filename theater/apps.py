@@ -6,4 +6,4 @@ class TheaterConfig(AppConfig):
     name = "theater"
 
     def ready(self) -> None:
-        from . import signals  # noqa: F401
+        from . import metrics, signals  # noqa: F401
@@ -0,0 +1,106 @@
+import gzip
+import json
+from datetime import datetime
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import storages
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+from rest_framework.utils.encoders import JSONEncoder
+
+from theater.db import delete_rows
+from theater.models import HistoricalTicket, Performance, Reservation, Ticket
+
+ARCHIVE_STORAGE = "archive"
+
+
+def archive_name(first_id: int) -> str:
+    # Named after the batch's first performance, not the run: the file is
+    # written before the batch commits, so a rolled-back batch leaves one
+    # behind. That performance is still there and the retry starts from it,
+    # overwriting the file; no committed batch can have the name, since its
+    # first performance is gone.
+    return f"archive/performances/{first_id:012d}.jsonl.gz"
+
+
+def _archive_rows(name: str, rows: list[dict]) -> None:
+    body = "".join(
+        json.dumps(row, cls=JSONEncoder, ensure_ascii=False) + "\n" for row in rows
+    )
+    storage = storages[ARCHIVE_STORAGE]
+    if storage.exists(name):
+        storage.delete(name)
+    storage.save(name, ContentFile(gzip.compress(body.encode(), mtime=0)))
+
+
+def purge_performance_batch(cutoff: datetime, batch_size: int) -> dict | None:
+    """
+    Archive and delete up to batch_size performances that started before
+    cutoff, together with their tickets and the reservations left empty.
+    Returns None once nothing is left to purge.
+    """
+    with transaction.atomic():
+        perf_ids = list(
+            Performance.objects.select_for_update(skip_locked=True)
+            .filter(show_time__lt=cutoff)
+            .order_by("id")
+            .values_list("id", flat=True)[:batch_size]
+        )
+        if not perf_ids:
+            return None
+
+        performances = list(
+            Performance.objects.filter(id__in=perf_ids)
+            .order_by("id")
+            .values(
+                "id",
+                "show_time",
+                "play_id",
+                "play__title",
+                "theatre_hall_id",
+                "theatre_hall__name",
+            )
+        )
+        ticket_rows = []
+        for model in (Ticket, HistoricalTicket):
+            ticket_rows += model.objects.filter(performance_id__in=perf_ids).values(
+                "id", "performance_id", "reservation_id", "row", "seat"
+            )
+        ticket_rows.sort(key=lambda row: row["id"])
+        # reservations whose every ticket is in this batch
+        reservations = Reservation.objects.filter(
+            id__in={t["reservation_id"] for t in ticket_rows}
+        )
+        for model in (Ticket, HistoricalTicket):
+            reservations = reservations.exclude(
+                Exists(
+                    model.objects.filter(reservation=OuterRef("pk")).exclude(
+                        performance_id__in=perf_ids
+                    )
+                )
+            )
+        reservation_rows = list(
+            reservations.order_by("id").values("id", "created_at", "user_id")
+        )
+
+        _archive_rows(
+            archive_name(perf_ids[0]),
+            [{"model": "theater.performance", **row} for row in performances]
+            + [{"model": "theater.ticket", **row} for row in ticket_rows]
+            + [{"model": "theater.reservation", **row} for row in reservation_rows],
+        )
+
+        # one DELETE instead of per-ticket post_delete handlers; the empty
+        # reservations those handlers would remove are deleted just below
+        for model in (Ticket, HistoricalTicket):
+            delete_rows(model.objects.filter(performance_id__in=perf_ids))
+        Reservation.objects.filter(
+            id__in=[r["id"] for r in reservation_rows]
+        ).delete_empty()
+        Performance.objects.filter(id__in=perf_ids).delete()
+
+    return {
+        "performances": len(performances),
+        "tickets": len(ticket_rows),
+        "reservations": len(reservation_rows),
+    }
@@ -0,0 +1,89 @@
+import json
+import hashlib
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import storages
+from django.db import transaction
+from django.utils import timezone
+from rest_framework.utils.encoders import JSONEncoder
+
+from theater.models import CatalogSnapshot, Performance
+from theater.api.v1.serializers import PerformanceRetrieveSerializer
+
+CATALOG_STORAGE = "catalog"
+CATALOG_PENDING_KEY = "theater:catalog-snapshot:pending"
+CATALOG_REBUILD_DELAY = 30
+
+
+def catalog_snapshot_name(digest: str) -> str:
+    # stored uncompressed: storages do not set Content-Encoding, so compression
+    # is left to the CDN, which negotiates it with the client's Accept-Encoding
+    return f"catalog/{digest}.json"
+
+
+def current_catalog_snapshot() -> CatalogSnapshot | None:
+    # kept in the database so every web process follows the worker's rebuild
+    return (
+        CatalogSnapshot.objects.filter(superseded_at__isnull=True)
+        .order_by("-id")
+        .first()
+    )
+
+
+def catalog_payload() -> list[dict]:
+    qs = (
+        Performance.objects.filter(show_time__gte=timezone.now())
+        .select_related("play", "theatre_hall")
+        .prefetch_related("play__actors", "play__genres")
+        .order_by("show_time", "id")
+    )
+    return PerformanceRetrieveSerializer(qs, many=True).data
+
+
+def build_catalog_snapshot() -> dict:
+    performances = catalog_payload()
+    canonical = json.dumps(
+        performances, cls=JSONEncoder, ensure_ascii=False, separators=(",", ":")
+    ).encode()
+    digest = hashlib.sha256(canonical).hexdigest()[:20]
+
+    current = current_catalog_snapshot()
+    storage = storages[CATALOG_STORAGE]
+    name = catalog_snapshot_name(digest)
+    if current and current.name == name:
+        prune_catalog_snapshots(storage)
+        return {"digest": digest, "name": current.name, "previous": None}
+
+    body = json.dumps(
+        {"generated_at": timezone.now(), "performances": performances},
+        cls=JSONEncoder,
+        ensure_ascii=False,
+        separators=(",", ":"),
+    ).encode()
+    if not storage.exists(name):
+        storage.save(name, ContentFile(body))
+
+    with transaction.atomic():
+        CatalogSnapshot.objects.filter(superseded_at__isnull=True).update(
+            superseded_at=timezone.now()
+        )
+        CatalogSnapshot.objects.update_or_create(
+            digest=digest, defaults={"name": name, "superseded_at": None}
+        )
+    prune_catalog_snapshots(storage)
+    return {
+        "digest": digest,
+        "name": name,
+        "previous": current.digest if current else None,
+    }
+
+
+def prune_catalog_snapshots(storage) -> None:
+    # superseded files stay long enough for clients and CDNs still following
+    # an earlier redirect to them
+    cutoff = timezone.now() - timedelta(seconds=settings.CATALOG_SNAPSHOT_GRACE)
+    for snapshot in CatalogSnapshot.objects.filter(superseded_at__lt=cutoff):
+        storage.delete(snapshot.name)
+        snapshot.delete()
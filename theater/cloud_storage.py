@@ -0,0 +1,8 @@
+from cloudinary_storage.storage import MediaCloudinaryStorage
+
+from theater.storage import CachedUrlMixin
+
+
+class CachedMediaCloudinaryStorage(CachedUrlMixin, MediaCloudinaryStorage):
+    # every url() call otherwise runs the Cloudinary URL builder
+    pass
@@ -0,0 +1,105 @@
+import weakref
+from typing import Any, Callable, Hashable
+
+from django.core.exceptions import EmptyResultSet
+from django.db import (
+    DEFAULT_DB_ALIAS,
+    IntegrityError,
+    connections,
+    router,
+    transaction,
+)
+from django.db.models import Model, QuerySet
+
+# per connection: flush -> the batch its pending on_commit callback holds
+_commit_batches: "weakref.WeakKeyDictionary[Any, dict]" = weakref.WeakKeyDictionary()
+
+
+def delete_rows(queryset: QuerySet, using: str | None = None) -> int:
+    """
+    Delete the rows of queryset with one DELETE ... WHERE pk IN (SELECT ...),
+    without loading them, following cascades or sending delete signals. Only
+    for rows nothing else needs to react to.
+    """
+    model = queryset.model
+    using = using or router.db_for_write(model)
+    connection = connections[using]
+    try:
+        subquery, params = queryset.values("pk").query.get_compiler(using).as_sql()
+    except EmptyResultSet:
+        return 0
+    qn = connection.ops.quote_name
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"DELETE FROM {qn(model._meta.db_table)} "
+            f"WHERE {qn(model._meta.pk.column)} IN ({subquery})",
+            params,
+        )
+        return cursor.rowcount
+
+
+def violates_constraint(exc: IntegrityError, model: type[Model], name: str) -> bool:
+    """
+    Whether exc was raised by the constraint of model called name. PostgreSQL
+    reports the constraint by name; SQLite only lists the columns of a failed
+    UNIQUE constraint, so those are compared instead.
+    """
+    diag = getattr(exc.__cause__, "diag", None)
+    if diag is not None:
+        return diag.constraint_name == name
+    constraint = next(c for c in model._meta.constraints if c.name == name)
+    table = model._meta.db_table
+    columns = ", ".join(
+        f"{table}.{model._meta.get_field(field).column}" for field in constraint.fields
+    )
+    return str(exc) == f"UNIQUE constraint failed: {columns}"
+
+
+def pool_stats() -> dict[str, dict]:
+    stats = {}
+    for alias in connections:
+        pool = getattr(connections[alias], "pool", None)
+        if pool is None:
+            continue
+        data = pool.get_stats()
+        in_use = data.get("pool_size", 0) - data.get("pool_available", 0)
+        data["saturation"] = (
+            round(in_use / data["pool_max"], 3) if data.get("pool_max") else 0.0
+        )
+        stats[alias] = data
+    return stats
+
+
+class _CommitBatch:
+    def __init__(self, flush: Callable[[str, set], None], using: str) -> None:
+        self.flush = flush
+        self.using = using
+        self.values: set = set()
+        self.pending = True
+
+    def __call__(self) -> None:
+        self.pending = False
+        self.flush(self.using, self.values)
+
+
+def collect_on_commit(
+    flush: Callable[[str, set], None], value: Hashable, using: str | None = None
+) -> None:
+    """
+    Add value to the set flush(using, values) gets once the current
+    transaction commits, with one on_commit callback per transaction however
+    many values are added; outside a transaction flush runs right away. The
+    callback is the only reference to its batch: when a rollback makes Django
+    drop it, the batch and its values go too and the next call starts anew.
+    """
+    using = using or DEFAULT_DB_ALIAS
+    batches = _commit_batches.setdefault(connections[using], {})
+    ref = batches.get(flush)
+    batch = ref() if ref is not None else None
+    if batch is not None and batch.pending:
+        batch.values.add(value)
+        return
+    batch = _CommitBatch(flush, using)
+    batch.values.add(value)
+    batches[flush] = weakref.ref(batch)
+    transaction.on_commit(batch, using=using)
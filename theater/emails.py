@@ -0,0 +1,266 @@
+import uuid
+from datetime import timedelta
+from functools import cache
+from itertools import groupby
+from typing import Callable
+
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.db import models, transaction
+from django.template.loader import get_template
+from django.utils import timezone
+
+from theater.models import Reservation, ReservationEmail, ReminderEmail, Ticket
+
+LAYOUT_SLOT = "__content__"
+TEMPLATES = (
+    "ticket_booked.txt",
+    "ticket_booked.html",
+    "performance_reminder.txt",
+    "performance_reminder.html",
+    "layout.html",
+)
+
+
+@cache
+def email_templates() -> dict:
+    # compiled once per process and reused for every message
+    return {name: get_template(f"email/{name}") for name in TEMPLATES}
+
+
+@cache
+def html_layout(site_name: str) -> tuple[str, str]:
+    # the markup around the message only depends on the site, so it is
+    # rendered once and the per-reservation part goes in between
+    page = email_templates()["layout.html"].render(
+        {"site_name": site_name, "content": LAYOUT_SLOT}
+    )
+    head, foot = page.split(LAYOUT_SLOT)
+    return head, foot
+
+
+def tickets_by_reservation(
+    reservation_ids, performance_id: int | None = None
+) -> dict[int, list[Ticket]]:
+    # one query for the whole batch, ordered for the message
+    tickets = Ticket.objects.filter(reservation_id__in=reservation_ids)
+    if performance_id is not None:
+        tickets = tickets.filter(performance_id=performance_id)
+    tickets = tickets.select_related(
+        "performance__play", "performance__theatre_hall"
+    ).order_by("reservation_id", "performance__show_time", "row", "seat")
+    return {
+        reservation_id: list(group)
+        for reservation_id, group in groupby(tickets, lambda t: t.reservation_id)
+    }
+
+
+def email_context(reservation: Reservation, tickets: list[Ticket]) -> dict:
+    site_name = getattr(settings, "SITE_NAME", "Wildfire Stageworks")
+    user = reservation.user
+    user_full = f"{user.first_name} {user.last_name}".strip() or user.email
+
+    # values arrive as strings so rendering skips localisation and filters
+    performances = []
+    for perf, group in groupby(tickets, lambda t: t.performance):
+        show_time = timezone.localtime(perf.show_time)
+        performances.append(
+            {
+                "play_title": perf.play.title,
+                "hall_name": perf.theatre_hall.name,
+                "show_time": f"{show_time:%Y-%m-%d %H:%M}",
+                "seats": [f"Row {t.row}, Seat {t.seat}" for t in group],
+            }
+        )
+    return {
+        "site_name": site_name,
+        "user_full": user_full,
+        "reservation_id": str(reservation.id),
+        "performances": performances,
+    }
+
+
+def render_email(
+    template: str, subject: str, ctx: dict, to: str
+) -> EmailMultiAlternatives:
+    templates = email_templates()
+    text = templates[f"{template}.txt"].render(ctx)
+    head, foot = html_layout(ctx["site_name"])
+    html = head + templates[f"{template}.html"].render(ctx) + foot
+
+    from_email = (
+        getattr(settings, "DEFAULT_FROM_EMAIL", None) or settings.EMAIL_HOST_USER
+    )
+    msg = EmailMultiAlternatives(subject, text, from_email, [to])
+    msg.attach_alternative(html, "text/html")
+    return msg
+
+
+def build_reservation_email(
+    reservation: Reservation, tickets: list[Ticket], home_url: str | None = None
+) -> EmailMultiAlternatives:
+    ctx = email_context(reservation, tickets)
+    ctx["home_url"] = home_url
+    first = ctx["performances"][0]
+    subject = (
+        f"[{ctx['site_name']}] Reservation №{reservation.id}: "
+        f"{first['play_title']} — {first['show_time']}"
+    )
+    return render_email("ticket_booked", subject, ctx, reservation.user.email)
+
+
+def build_reminder_email(
+    reservation: Reservation, tickets: list[Ticket]
+) -> EmailMultiAlternatives:
+    ctx = email_context(reservation, tickets)
+    perf = ctx["performances"][0]
+    ctx["performance"] = perf
+    subject = (
+        f"[{ctx['site_name']}] Reminder: {perf['play_title']} — {perf['show_time']}"
+    )
+    return render_email("performance_reminder", subject, ctx, reservation.user.email)
+
+
+def deliver(
+    rows: list[models.Model], build: Callable[[models.Model], tuple]
+) -> tuple[int, set[int]]:
+    """
+    Send one message per row over a single SMTP connection and mark each row
+    sent or failed in memory. build returns (message, None), or (None, reason)
+    when there is nothing to send, which gives the row up.
+    """
+    sent, failed_ids = 0, set()
+    # opening fails loudly, so the task retries the whole batch later
+    connection = get_connection()
+    connection.open()
+    try:
+        for row in rows:
+            try:
+                msg, reason = build(row)
+                if msg is None:
+                    row.attempts = settings.EMAIL_MAX_ATTEMPTS
+                    row.last_error = reason
+                    failed_ids.add(row.id)
+                    continue
+                msg.connection = connection
+                msg.send()
+            except Exception as exc:
+                row.attempts += 1
+                row.last_error = repr(exc)[:255]
+                failed_ids.add(row.id)
+            else:
+                row.sent_at = timezone.now()
+                sent += 1
+    finally:
+        connection.close()
+    return sent, failed_ids
+
+
+def claim(queryset: models.QuerySet, limit: int) -> tuple[str, list[models.Model]]:
+    """
+    Lease up to limit claimable rows of queryset to a new token for
+    EMAIL_CLAIM_LEASE seconds and return the token and the rows. The claim
+    commits before anything is sent, so no row stays locked during the SMTP
+    session; another sender only takes a row over once its lease expired.
+    """
+    token = uuid.uuid4().hex
+    model = queryset.model
+    with transaction.atomic():
+        ids = list(
+            queryset.claimable()
+            .select_for_update(skip_locked=True)
+            .order_by("id")
+            .values_list("id", flat=True)[:limit]
+        )
+        if not ids:
+            return token, []
+        model.objects.filter(id__in=ids).update(
+            claimed_until=timezone.now()
+            + timedelta(seconds=settings.EMAIL_CLAIM_LEASE),
+            claimed_by=token,
+        )
+    return token, list(model.objects.filter(id__in=ids).order_by("id"))
+
+
+def release(token: str, rows: list[models.Model]) -> None:
+    # rows a new booking made pending again while they were being sent are
+    # no longer ours: they keep their new state and go out again
+    for row in rows:
+        row.claimed_until = None
+        row.claimed_by = ""
+    type(rows[0]).objects.filter(claimed_by=token).bulk_update(
+        rows, ["sent_at", "attempts", "last_error", "claimed_until", "claimed_by"]
+    )
+
+
+def send_reservation_email_batch(
+    batch_size: int, exclude: set[int] = frozenset()
+) -> dict:
+    """
+    Send up to batch_size pending confirmations over one SMTP connection, one
+    message per reservation. Rows are leased in one short transaction and
+    marked in another, so no transaction or row lock is open while sending.
+    Returns counts and the ids that failed, which the caller skips for the
+    rest of its run.
+    """
+    token, emails = claim(ReservationEmail.objects.exclude(id__in=exclude), batch_size)
+    if not emails:
+        return {"claimed": 0, "sent": 0, "failed_ids": set()}
+
+    ids = {e.reservation_id for e in emails}
+    reservations = Reservation.objects.select_related("user").in_bulk(ids)
+    tickets = tickets_by_reservation(ids)
+
+    def build(email):
+        reservation = reservations.get(email.reservation_id)
+        seats = tickets.get(email.reservation_id)
+        if reservation is None or not seats:
+            # booking gone before it was confirmed: nothing to send
+            return None, "reservation has no tickets"
+        return (
+            build_reservation_email(reservation, seats, email.home_url or None),
+            None,
+        )
+
+    try:
+        sent, failed_ids = deliver(emails, build)
+    finally:
+        # also when the server cannot be reached: the rows go back untouched
+        release(token, emails)
+    return {"claimed": len(emails), "sent": sent, "failed_ids": failed_ids}
+
+
+def send_reminder_batch(performance_id: int, reservation_ids: list[int]) -> dict:
+    """
+    Send the pending reminders of these reservations for one performance over
+    one SMTP connection. Rows already sent, or leased by a job running the
+    same chunk, are skipped, so queueing a chunk twice sends nothing twice.
+    """
+    token, reminders = claim(
+        ReminderEmail.objects.filter(
+            performance_id=performance_id, reservation_id__in=reservation_ids
+        ),
+        len(reservation_ids),
+    )
+    if not reminders:
+        return {"claimed": 0, "sent": 0}
+
+    ids = {r.reservation_id for r in reminders}
+    reservations = Reservation.objects.select_related("user").in_bulk(ids)
+    tickets = tickets_by_reservation(ids, performance_id)
+    now = timezone.now()
+
+    def build(reminder):
+        reservation = reservations.get(reminder.reservation_id)
+        seats = tickets.get(reminder.reservation_id)
+        if reservation is None or not seats:
+            return None, "reservation has no tickets"
+        if seats[0].performance.show_time <= now:
+            return None, "performance started"
+        return build_reminder_email(reservation, seats), None
+
+    try:
+        sent, _ = deliver(reminders, build)
+    finally:
+        release(token, reminders)
+    return {"claimed": len(reminders), "sent": sent}
@@ -1,13 +1,56 @@
+from functools import lru_cache
 from django import forms
-from django.utils import timezone
+from django.core.exceptions import ValidationError
+from django.utils.choices import CallableChoiceIterator
+from theater.messages import MSG
 from theater.models import Ticket, Performance
-from django.db.models import Count, F, IntegerField, ExpressionWrapper
+from theater.services import (
+    bookable_performances,
+    bookable_performances_queryset,
+    find_bookable_performance,
+)
+
+
+@lru_cache(maxsize=64)
+def number_choices(count: int) -> tuple[tuple[int, str], ...]:
+    return tuple((n, str(n)) for n in range(1, count + 1))
 
 
 class PerformanceChoiceField(forms.ModelChoiceField):
     def label_from_instance(self, obj: Performance) -> str:
         return obj.play.title
 
+    def _bookable_choices(self) -> list[tuple]:
+        choices = [(p["id"], p["title"]) for p in bookable_performances()]
+        if self.empty_label is not None:
+            choices.insert(0, ("", self.empty_label))
+        return choices
+
+    @property
+    def choices(self):
+        return CallableChoiceIterator(self._bookable_choices)
+
+    @choices.setter
+    def choices(self, value):
+        forms.ChoiceField.choices.fset(self, value)
+
+    def to_python(self, value):
+        if value in self.empty_values:
+            return None
+        if find_bookable_performance(value) is not None:
+            perf = (
+                Performance.objects.select_related("play", "theatre_hall")
+                .filter(pk=value)
+                .first()
+            )
+            if perf is not None:
+                return perf
+        raise ValidationError(
+            self.error_messages["invalid_choice"],
+            code="invalid_choice",
+            params={"value": value},
+        )
+
 
 class TicketForm(forms.ModelForm):
     performance = PerformanceChoiceField(
@@ -25,36 +68,19 @@ class TicketForm(forms.ModelForm):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
 
-        perf_qs = (
-            Performance.objects.filter(show_time__gte=timezone.now())
-            .select_related("play", "theatre_hall")
-            .annotate(
-                reserved=Count("tickets"),
-                capacity=ExpressionWrapper(
-                    F("theatre_hall__rows") * F("theatre_hall__seats_in_row"),
-                    output_field=IntegerField(),
-                ),
-            )
-            .filter(reserved__lt=F("capacity"))
-            .order_by("show_time")
-        )
-        self.fields["performance"].queryset = perf_qs
+        self.fields["performance"].queryset = bookable_performances_queryset()
         self.fields["row"].choices = []
         self.fields["seat"].choices = []
 
         if self.is_bound:
             perf_id = (self.data or self.initial).get("performance")
             if perf_id:
-                try:
-                    perf = Performance.objects.select_related("theatre_hall").get(
-                        pk=perf_id
-                    )
-                except Performance.DoesNotExist:
+                perf = find_bookable_performance(perf_id)
+                if perf is None:
                     return
-                hall = perf.theatre_hall
-                self.fields["row"].choices = [
-                    (r, str(r)) for r in range(1, hall.rows + 1)
-                ]
-                self.fields["seat"].choices = [
-                    (s, str(s)) for s in range(1, hall.seats_in_row + 1)
-                ]
+                self.fields["row"].choices = number_choices(perf["rows"])
+                self.fields["seat"].choices = number_choices(perf["seats_in_row"])
+
+    def seat_taken(self) -> bool:
+        # the unique constraint's validation lands in the non-field errors
+        return any(MSG.SEAT_TAKEN in errors for errors in self.errors.values())
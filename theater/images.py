@@ -0,0 +1,111 @@
+import base64
+import logging
+import os
+from io import BytesIO
+from typing import Callable
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db.models.fields.files import FieldFile
+from PIL import Image, ImageOps
+
+logger = logging.getLogger(__name__)
+
+
+def _encode(image: Image.Image, fmt: str, quality: int) -> bytes:
+    buffer = BytesIO()
+    if fmt == "JPEG":
+        if image.mode in ("RGBA", "LA", "P"):
+            # JPEG has no alpha: flatten onto white like the cards do
+            rgba = image.convert("RGBA")
+            image = Image.new("RGB", rgba.size, "white")
+            image.paste(rgba, mask=rgba.getchannel("A"))
+        elif image.mode != "RGB":
+            image = image.convert("RGB")
+        image.save(buffer, "JPEG", quality=quality, optimize=True, progressive=True)
+    else:
+        image.save(buffer, "WEBP", quality=quality, method=4)
+    return buffer.getvalue()
+
+
+def _resized(image: Image.Image, width: int) -> Image.Image:
+    if width >= image.width:
+        return image
+    height = max(1, round(image.height * width / image.width))
+    return image.resize((width, height), Image.Resampling.LANCZOS)
+
+
+def generate_derivatives(field_file: FieldFile) -> dict:
+    """
+    Write WebP and JPEG copies of an uploaded image at each of
+    IMAGE_DERIVATIVE_WIDTHS (capped at the original width) next to it, and
+    return the manifest stored on the model: the source name, the saved
+    names per width and a tiny inline JPEG to show while they load.
+    """
+    storage, name = field_file.storage, field_file.name
+    try:
+        with storage.open(name, "rb") as f:
+            image = Image.open(f)
+            image.load()
+    except (OSError, Image.DecompressionBombError) as exc:
+        # nothing Pillow can read: the original keeps being served as is
+        logger.warning("No derivatives for %s: %r", name, exc)
+        return {"source": name, "variants": [], "lqip": ""}
+    image = ImageOps.exif_transpose(image)
+    if image.mode not in ("RGB", "RGBA"):
+        image = image.convert("RGBA" if "transparency" in image.info else "RGB")
+
+    root = os.path.splitext(name)[0]
+    variants = []
+    for width in sorted(
+        {min(w, image.width) for w in settings.IMAGE_DERIVATIVE_WIDTHS}
+    ):
+        resized = _resized(image, width)
+        variant = {"width": width}
+        for fmt, ext, quality in (
+            ("WEBP", "webp", settings.IMAGE_WEBP_QUALITY),
+            ("JPEG", "jpg", settings.IMAGE_JPEG_QUALITY),
+        ):
+            data = _encode(resized, fmt, quality)
+            variant[ext] = storage.save(f"{root}_{width}w.{ext}", ContentFile(data))
+        variants.append(variant)
+
+    placeholder = _encode(_resized(image, settings.IMAGE_LQIP_WIDTH), "JPEG", 40)
+    return {
+        "source": name,
+        "variants": variants,
+        "lqip": "data:image/jpeg;base64," + base64.b64encode(placeholder).decode(),
+    }
+
+
+def delete_derivatives(storage, manifest: dict) -> None:
+    for variant in manifest.get("variants", ()):
+        for ext in ("webp", "jpg"):
+            if variant.get(ext):
+                storage.delete(variant[ext])
+
+
+def responsive_sources(
+    field_file: FieldFile, manifest: dict, build_url: Callable | None = None
+) -> dict | None:
+    # a manifest left from a previous upload describes other files
+    if (
+        not field_file
+        or not manifest.get("variants")
+        or manifest["source"] != field_file.name
+    ):
+        return None
+    storage = field_file.storage
+
+    def srcset(ext: str) -> str:
+        urls = (storage.url(v[ext]) for v in manifest["variants"])
+        if build_url:
+            urls = map(build_url, urls)
+        widths = (v["width"] for v in manifest["variants"])
+        return ", ".join(f"{url} {width}w" for url, width in zip(urls, widths))
+
+    return {
+        "webp": srcset("webp"),
+        "jpeg": srcset("jpg"),
+        "placeholder": manifest["lqip"],
+    }
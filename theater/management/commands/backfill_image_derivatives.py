@@ -0,0 +1,36 @@
+from typing import Any
+
+from django.core.management.base import BaseCommand
+
+from theater import outbox
+from theater.models import Actor, Play
+
+
+class Command(BaseCommand):
+    help = (  # noqa: VNE003
+        "Queues derivative generation for every actor avatar and play image "
+        "uploaded before it existed or changed since"
+    )
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        total = 0
+        for model in (Actor, Play):
+            field, manifest_field = model.RESPONSIVE_IMAGE
+            default = model._meta.get_field(field).default
+            label = model._meta.label_lower
+            rows = (
+                model.objects.exclude(**{field: default})
+                .exclude(**{field: ""})
+                .values_list("pk", field, manifest_field)
+                .iterator()
+            )
+            for pk, name, manifest in rows:
+                if (manifest or {}).get("source") == name:
+                    continue
+                outbox.publish(
+                    "theater.tasks.generate_image_derivatives",
+                    {"model": label, "pk": pk},
+                    dedup_key=f"derivatives:{label}:{pk}",
+                )
+                total += 1
+        self.stdout.write(self.style.SUCCESS(f"Queued {total} images."))
@@ -0,0 +1,32 @@
+import time
+from typing import Any
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandParser
+from django.utils import timezone
+
+from theater.ticket_history import move_tickets_to_history
+
+
+class Command(BaseCommand):
+    help = (  # noqa: VNE003
+        "Moves tickets of past performances into the history table in small "
+        "batches, pausing between them so it can run against a live database"
+    )
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument(
+            "--batch-size", type=int, default=settings.TICKET_HISTORY_BATCH_SIZE
+        )
+        parser.add_argument(
+            "--pause", type=float, default=0.1, help="Seconds to sleep per batch"
+        )
+
+    def handle(self, *args: str, **options: Any) -> None:
+        cutoff = timezone.now()
+        total = 0
+        while moved := move_tickets_to_history(cutoff, options["batch_size"]):
+            total += moved
+            self.stdout.write(f"Moved {total} tickets…")
+            time.sleep(options["pause"])
+        self.stdout.write(self.style.SUCCESS(f"Done, {total} tickets moved."))
@@ -0,0 +1,49 @@
+import time
+from typing import Any
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandParser
+from django.db import close_old_connections
+
+from theater.outbox import relay_batch
+
+
+class Command(BaseCommand):
+    help = (  # noqa: VNE003
+        "Publishes outbox messages to the broker as they are committed, "
+        "polling while the outbox is empty"
+    )
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument(
+            "--batch-size", type=int, default=settings.OUTBOX_BATCH_SIZE
+        )
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=0.5,
+            help="Seconds to wait when the outbox is empty",
+        )
+        parser.add_argument(
+            "--once", action="store_true", help="Drain the outbox and exit"
+        )
+
+    def handle(self, *args: str, **options: Any) -> None:
+        total = 0
+        while True:
+            try:
+                relayed = relay_batch(options["batch_size"])
+            except Exception as exc:
+                # broker or database away: the rows stay for the next attempt
+                if options["once"]:
+                    raise
+                self.stderr.write(f"Relay failed: {exc!r}")
+                relayed = 0
+            total += relayed
+            if relayed < options["batch_size"]:
+                if options["once"]:
+                    break
+                # give the connection back while idle and drop a broken one
+                close_old_connections()
+                time.sleep(options["interval"])
+        self.stdout.write(self.style.SUCCESS(f"Relayed {total} messages."))
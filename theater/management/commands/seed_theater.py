@@ -0,0 +1,379 @@
+import math
+import random
+import time
+from datetime import datetime, timedelta
+from itertools import islice
+from typing import Any, Iterable, Iterator
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandParser
+from django.core.management.color import no_style
+from django.db import connection, models, transaction
+from django.utils import timezone
+
+from theater.models import (
+    Actor,
+    Genre,
+    Play,
+    TheatreHall,
+    Performance,
+    Reservation,
+    Ticket,
+)
+from theater.services import invalidate_bookable_performances
+
+WORDS = (
+    "Midnight Silver Broken Winter Hidden Golden Distant Quiet Burning Crimson "
+    "Garden Harbor Mirror Empire Letters Orchard Lantern Island Crown Shadow"
+).split()
+FIRST_NAMES = (
+    "Anna Boris Clara Daniel Elena Felix Greta Hugo Irina Jonas Kira Leo Maya "
+    "Nikolai Olga Pavel Rosa Stefan Tanya Viktor"
+).split()
+LAST_NAMES = (
+    "Adler Brandt Costa Duval Engel Fischer Gray Hart Ivanova Jensen Keller "
+    "Lang Moreau Novak Olsen Petrov Quinn Rossi Sato Weber"
+).split()
+# how many seats one reservation takes, and how often
+PARTY_SIZES = (1, 2, 3, 4)
+PARTY_WEIGHTS = (25, 45, 15, 15)
+
+
+def batched(rows: Iterable, size: int) -> Iterator[list]:
+    it = iter(rows)
+    while batch := list(islice(it, size)):
+        yield batch
+
+
+class Command(BaseCommand):
+    help = (  # noqa: VNE003
+        "Generates a large, deterministic synthetic data set (halls, plays, "
+        "actors, performances, reservations and tickets) for benchmarking"
+    )
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument("--seed", type=int, default=1)
+        parser.add_argument("--halls", type=int, default=50)
+        parser.add_argument("--actors", type=int, default=2000)
+        parser.add_argument("--genres", type=int, default=30)
+        parser.add_argument("--plays", type=int, default=1000)
+        parser.add_argument("--performances", type=int, default=20_000)
+        parser.add_argument("--users", type=int, default=50_000)
+        parser.add_argument(
+            "--days-back", type=int, default=365, help="History before --anchor"
+        )
+        parser.add_argument(
+            "--days-ahead", type=int, default=90, help="Schedule after --anchor"
+        )
+        parser.add_argument(
+            "--anchor",
+            type=datetime.fromisoformat,
+            default=None,
+            help="ISO date treated as 'now' (default: today, 00:00 UTC)",
+        )
+        parser.add_argument("--batch-size", type=int, default=5000)
+
+    def handle(self, *args: str, **options: Any) -> None:
+        self.options = options
+        self.seed = options["seed"]
+        self.rng = random.Random(self.seed)
+        anchor = options["anchor"] or timezone.now()
+        if timezone.is_naive(anchor):
+            anchor = timezone.make_aware(anchor, timezone.UTC)
+        self.anchor = anchor.replace(hour=0, minute=0, second=0, microsecond=0)
+
+        started = time.perf_counter()
+        genre_ids = self.seed_genres()
+        actor_ids = self.seed_actors()
+        halls = self.seed_halls()
+        plays = self.seed_plays(actor_ids, genre_ids)
+        user_ids = self.seed_users()
+        performances = self.seed_performances(plays, halls)
+        self.seed_sales(performances, user_ids)
+
+        self.reset_sequences()
+        invalidate_bookable_performances()
+        self.stdout.write(
+            self.style.SUCCESS(f"Seeded in {time.perf_counter() - started:.1f}s")
+        )
+
+    # writing
+
+    def write(
+        self, model: type[models.Model], fields: tuple[str, ...], rows: Iterable
+    ) -> int:
+        """
+        Stream rows (tuples in `fields` order, FKs by attname) into the model's
+        table: COPY on PostgreSQL, batched INSERTs elsewhere. No signals and
+        no pre_save, so auto_now(_add) columns keep the seeded timestamps.
+        """
+        started = time.perf_counter()
+        count = 0
+        qn = connection.ops.quote_name
+        table = qn(model._meta.db_table)
+        columns = ", ".join(qn(model._meta.get_field(f).column) for f in fields)
+        with transaction.atomic():
+            if connection.vendor == "postgresql":
+                sql = f"COPY {table} ({columns}) FROM STDIN"
+                # COPY cannot dump dicts, so JSON values use the field's adapter
+                json_fields = {
+                    i: field
+                    for i, field in enumerate(map(model._meta.get_field, fields))
+                    if isinstance(field, models.JSONField)
+                }
+                with connection.cursor() as cursor, cursor.cursor.copy(sql) as copy:
+                    for row in rows:
+                        if json_fields:
+                            row = list(row)
+                            for i, field in json_fields.items():
+                                row[i] = field.get_db_prep_save(row[i], connection)
+                        copy.write_row(row)
+                        count += 1
+            else:
+                sql = (
+                    f"INSERT INTO {table} ({columns}) "
+                    f"VALUES ({', '.join(['%s'] * len(fields))})"
+                )
+                prep = [model._meta.get_field(f).get_db_prep_save for f in fields]
+                with connection.cursor() as cursor:
+                    for batch in batched(rows, self.options["batch_size"]):
+                        cursor.executemany(
+                            sql,
+                            [
+                                [p(value, connection) for p, value in zip(prep, row)]
+                                for row in batch
+                            ],
+                        )
+                        count += len(batch)
+        self.stdout.write(
+            f"  {model._meta.db_table:<28}{count:>12,} rows"
+            f"{time.perf_counter() - started:>9.1f}s"
+        )
+        return count
+
+    def next_ids(self, model: type[models.Model], count: int) -> range:
+        start = (model.objects.aggregate(m=models.Max("pk"))["m"] or 0) + 1
+        return range(start, start + count)
+
+    def reset_sequences(self) -> None:
+        seeded = [
+            get_user_model(),
+            Actor,
+            Genre,
+            Play,
+            TheatreHall,
+            Performance,
+            Reservation,
+        ]
+        with connection.cursor() as cursor:
+            for sql in connection.ops.sequence_reset_sql(no_style(), seeded):
+                cursor.execute(sql)
+
+    # catalog
+
+    def seed_genres(self) -> range:
+        ids = self.next_ids(Genre, self.options["genres"])
+        self.write(
+            Genre,
+            ("id", "name", "updated_at"),
+            ((pk, f"Genre {pk}", self.anchor) for pk in ids),
+        )
+        return ids
+
+    def seed_actors(self) -> range:
+        ids = self.next_ids(Actor, self.options["actors"])
+        avatar = Actor._meta.get_field("avatar").default
+        self.write(
+            Actor,
+            (
+                "id",
+                "first_name",
+                "last_name",
+                "avatar",
+                "avatar_variants",
+                "updated_at",
+            ),
+            (
+                (
+                    pk,
+                    self.rng.choice(FIRST_NAMES),
+                    self.rng.choice(LAST_NAMES),
+                    avatar,
+                    {},
+                    self.anchor,
+                )
+                for pk in ids
+            ),
+        )
+        return ids
+
+    def seed_halls(self) -> list[tuple[int, int, int]]:
+        halls = [
+            (pk, self.rng.randint(8, 40), self.rng.randint(12, 40))
+            for pk in self.next_ids(TheatreHall, self.options["halls"])
+        ]
+        self.write(
+            TheatreHall,
+            ("id", "name", "rows", "seats_in_row", "updated_at"),
+            ((pk, f"Hall {pk}", r, s, self.anchor) for pk, r, s in halls),
+        )
+        return halls
+
+    def seed_plays(self, actor_ids: range, genre_ids: range) -> list[tuple]:
+        # popularity drives how well a play's performances sell
+        plays = [
+            (pk, self.rng.betavariate(2, 3))
+            for pk in self.next_ids(Play, self.options["plays"])
+        ]
+        image = Play._meta.get_field("image").default
+        self.write(
+            Play,
+            ("id", "title", "description", "image", "image_variants", "updated_at"),
+            (
+                (
+                    pk,
+                    f"The {self.rng.choice(WORDS)} {self.rng.choice(WORDS)} #{pk}",
+                    "Synthetic play generated by seed_theater.",
+                    image,
+                    {},
+                    self.anchor,
+                )
+                for pk, _ in plays
+            ),
+        )
+        self.write(
+            Play.actors.through,
+            ("play_id", "actor_id"),
+            (
+                (pk, actor)
+                for pk, _ in plays
+                for actor in self.rng.sample(actor_ids, min(len(actor_ids), 6))
+            ),
+        )
+        self.write(
+            Play.genres.through,
+            ("play_id", "genre_id"),
+            (
+                (pk, genre)
+                for pk, _ in plays
+                for genre in self.rng.sample(
+                    genre_ids, min(len(genre_ids), self.rng.randint(1, 3))
+                )
+            ),
+        )
+        return plays
+
+    def seed_users(self) -> range:
+        user_model = get_user_model()
+        ids = self.next_ids(user_model, self.options["users"])
+        password = make_password(None)
+        self.write(
+            user_model,
+            (
+                "id",
+                "email",
+                "password",
+                "first_name",
+                "last_name",
+                "is_superuser",
+                "is_staff",
+                "is_active",
+                "date_joined",
+            ),
+            (
+                (
+                    pk,
+                    f"seed{pk}@example.com",
+                    password,
+                    self.rng.choice(FIRST_NAMES),
+                    self.rng.choice(LAST_NAMES),
+                    False,
+                    False,
+                    True,
+                    self.anchor - timedelta(days=self.options["days_back"]),
+                )
+                for pk in ids
+            ),
+        )
+        return ids
+
+    def seed_performances(self, plays: list, halls: list) -> list[tuple]:
+        span = (self.options["days_back"] + self.options["days_ahead"]) * 24
+        start = self.anchor - timedelta(days=self.options["days_back"])
+        performances = []
+        for pk in self.next_ids(Performance, self.options["performances"]):
+            hour = self.rng.randrange(span)
+            # shows start in the evening or as matinees
+            show_time = start + timedelta(
+                hours=hour - hour % 24 + self.rng.choice((14, 19, 20))
+            )
+            play_id, popularity = self.rng.choice(plays)
+            hall = self.rng.choice(halls)
+            performances.append((pk, play_id, hall, show_time, popularity))
+        self.write(
+            Performance,
+            ("id", "play_id", "theatre_hall_id", "show_time", "updated_at"),
+            (
+                (pk, play_id, hall[0], show_time, self.anchor)
+                for pk, play_id, hall, show_time, _ in performances
+            ),
+        )
+        return performances
+
+    # sales
+
+    def sales(self, performance: tuple, user_ids: range) -> Iterator[tuple]:
+        """
+        Reservations for one performance as (created_at, user_id, seats). Uses
+        its own RNG so reservations and tickets can be generated in separate
+        passes and still agree.
+        """
+        pk, _, (_, rows, seats_in_row), show_time, popularity = performance
+        rng = random.Random(f"{self.seed}:{pk}")
+        capacity = rows * seats_in_row
+
+        final = rng.gauss(0.3 + 0.6 * popularity, 0.12)
+        if show_time.weekday() >= 4:
+            final *= 1.15
+        days_out = (show_time - self.anchor).total_seconds() / 86400
+        # share of the eventual demand that has already booked
+        booked = 1.0 if days_out <= 0 else 1 / (1 + math.exp((days_out - 14) / 5))
+        sold = int(capacity * min(max(final, 0.02), 0.99) * booked)
+
+        taken = sorted(rng.sample(range(capacity), sold))
+        while taken:
+            size = rng.choices(PARTY_SIZES, PARTY_WEIGHTS)[0]
+            party, taken = taken[:size], taken[size:]
+            lead = max(days_out, 0) + rng.expovariate(1 / 12)
+            yield (
+                show_time - timedelta(days=lead),
+                user_ids[rng.randrange(len(user_ids))],
+                [(seat // seats_in_row + 1, seat % seats_in_row + 1) for seat in party],
+            )
+
+    def seed_sales(self, performances: list, user_ids: range) -> None:
+        first_id = self.next_ids(Reservation, 1).start
+        self.write(
+            Reservation,
+            ("id", "created_at", "user_id"),
+            (
+                (first_id + i, created_at, user_id)
+                for i, (created_at, user_id, _) in enumerate(
+                    sale for perf in performances for sale in self.sales(perf, user_ids)
+                )
+            ),
+        )
+        self.write(
+            Ticket,
+            ("performance_id", "reservation_id", "row", "seat"),
+            (
+                (perf[0], first_id + i, row, seat)
+                for i, (perf, (_, _, seats)) in enumerate(
+                    (perf, sale)
+                    for perf in performances
+                    for sale in self.sales(perf, user_ids)
+                )
+                for row, seat in seats
+            ),
+        )
@@ -0,0 +1,184 @@
+import hmac
+import os
+import time
+from datetime import datetime
+
+from celery import signals as celery_signals
+from django.conf import settings
+from django.http import HttpResponse
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+    start_http_server,
+)
+
+from .db import pool_stats
+
+# With PROMETHEUS_MULTIPROC_DIR set (it must be set before this module is
+# imported, and emptied when the service starts) every gunicorn worker and
+# Celery pool process writes its samples to files in that directory and a
+# scrape aggregates them; otherwise each process exposes only its own.
+MULTIPROCESS = bool(os.getenv("PROMETHEUS_MULTIPROC_DIR"))
+
+METHODS = {"GET", "HEAD", "OPTIONS", "POST", "PUT", "PATCH", "DELETE"}
+
+REQUEST_LATENCY = Histogram(
+    "theater_http_request_duration_seconds",
+    "Request latency by resolved view name",
+    ["view", "method", "status"],
+)
+BOOKINGS = Counter(
+    "theater_bookings_total",
+    "Seat booking attempts by channel (form, api) and outcome",
+    ["channel", "outcome"],
+)
+CACHE_REQUESTS = Counter(
+    "theater_cache_requests_total",
+    "Django cache lookups by result (hit, miss)",
+    ["result"],
+)
+CACHE_HITS = CACHE_REQUESTS.labels("hit")
+CACHE_MISSES = CACHE_REQUESTS.labels("miss")
+DB_POOL = Gauge(
+    "theater_db_pool_connections",
+    "psycopg pool connections by state (in_use, available, max, waiting)",
+    ["alias", "state"],
+    multiprocess_mode="livesum",
+)
+TASK_DURATION = Histogram(
+    "theater_celery_task_duration_seconds",
+    "Celery task run time by final state",
+    ["task", "state"],
+    buckets=(0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600),
+)
+TASK_QUEUE_LATENCY = Histogram(
+    "theater_celery_task_queue_latency_seconds",
+    "Time from a task becoming runnable (publish or eta) to a worker starting it",
+    ["task"],
+    buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 300),
+)
+TASK_RETRIES = Counter(
+    "theater_celery_task_retries_total",
+    "Celery task retries",
+    ["task"],
+)
+
+READY_AT_HEADER = "theater_ready_at"
+
+
+def record_booking(channel: str, outcome: str) -> None:
+    BOOKINGS.labels(channel, outcome).inc()
+
+
+def record_pool_usage() -> None:
+    for alias, stats in pool_stats().items():
+        size = stats.get("pool_size", 0)
+        available = stats.get("pool_available", 0)
+        DB_POOL.labels(alias, "in_use").set(size - available)
+        DB_POOL.labels(alias, "available").set(available)
+        DB_POOL.labels(alias, "max").set(stats.get("pool_max", 0))
+        DB_POOL.labels(alias, "waiting").set(stats.get("requests_waiting", 0))
+
+
+def collect() -> bytes:
+    if MULTIPROCESS:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry)
+    return generate_latest(REGISTRY)
+
+
+def metrics_view(request):
+    token = settings.METRICS_TOKEN
+    if not token:
+        # fail closed where a token is required but was never configured
+        if settings.METRICS_REQUIRE_TOKEN:
+            return HttpResponse(status=404)
+    elif not hmac.compare_digest(
+        request.headers.get("Authorization", ""), f"Bearer {token}"
+    ):
+        return HttpResponse(status=401)
+    return HttpResponse(collect(), content_type=CONTENT_TYPE_LATEST)
+
+
+class MetricsMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        start = time.perf_counter()
+        response = self.get_response(request)
+        match = getattr(request, "resolver_match", None)
+        REQUEST_LATENCY.labels(
+            match.view_name if match else "unmatched",
+            request.method if request.method in METHODS else "other",
+            response.status_code,
+        ).observe(time.perf_counter() - start)
+        record_pool_usage()
+        return response
+
+
+# Celery
+
+
+_task_started: dict[str, float] = {}
+
+
+@celery_signals.before_task_publish.connect
+def _stamp_ready_at(headers=None, **kwargs) -> None:
+    # a retry or countdown is not queue latency: count from the eta
+    if headers is None:
+        return
+    eta = headers.get("eta")
+    headers[READY_AT_HEADER] = (
+        datetime.fromisoformat(eta).timestamp() if eta else time.time()
+    )
+
+
+@celery_signals.task_prerun.connect
+def _task_prerun(task_id=None, task=None, **kwargs) -> None:
+    _task_started[task_id] = time.perf_counter()
+    ready_at = task.request.get(READY_AT_HEADER)
+    if ready_at is not None:
+        TASK_QUEUE_LATENCY.labels(task.name).observe(max(time.time() - ready_at, 0))
+
+
+@celery_signals.task_postrun.connect
+def _task_postrun(task_id=None, task=None, state=None, **kwargs) -> None:
+    started = _task_started.pop(task_id, None)
+    if started is not None:
+        TASK_DURATION.labels(task.name, state or "UNKNOWN").observe(
+            time.perf_counter() - started
+        )
+
+
+@celery_signals.task_retry.connect
+def _task_retry(sender=None, **kwargs) -> None:
+    TASK_RETRIES.labels(sender.name).inc()
+
+
+@celery_signals.worker_ready.connect
+def _serve_worker_metrics(**kwargs) -> None:
+    # the worker has no HTTP server of its own; the main process serves the
+    # pool children's samples on CELERY_METRICS_PORT
+    port = settings.CELERY_METRICS_PORT
+    if not port:
+        return
+    if MULTIPROCESS:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        start_http_server(port, registry=registry)
+    else:
+        start_http_server(port)
+
+
+@celery_signals.worker_process_shutdown.connect
+def _mark_pool_process_dead(pid=None, **kwargs) -> None:
+    if MULTIPROCESS:
+        multiprocess.mark_process_dead(pid or os.getpid())
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.3 on 2026-10-19 16:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("theater", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="ticket",
+            index=models.Index(fields=["reservation", "-id"], name="ticket_res_id_idx"),
+        ),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 5.2.3 on 2026-10-19 16:23
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("theater", "0003_catalog_sync_tracking"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="HistoricalTicket",
+            fields=[
+                ("id", models.BigIntegerField(primary_key=True, serialize=False)),
+                ("row", models.PositiveIntegerField()),
+                ("seat", models.PositiveIntegerField()),
+                (
+                    "performance",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="historical_tickets",
+                        to="theater.performance",
+                    ),
+                ),
+                (
+                    "reservation",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="historical_tickets",
+                        to="theater.reservation",
+                    ),
+                ),
+            ],
+            options={
+                "db_table": "theater_ticket_history",
+                "indexes": [
+                    models.Index(
+                        fields=["reservation", "-id"], name="histticket_res_id_idx"
+                    )
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,67 @@
+# Generated by Django 5.2.3 on 2026-10-19 16:45
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("theater", "0004_ticket_history"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="TicketEmail",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("home_url", models.CharField(blank=True, max_length=500)),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                ("sent_at", models.DateTimeField(blank=True, null=True)),
+                ("attempts", models.PositiveSmallIntegerField(default=0)),
+                ("last_error", models.CharField(blank=True, max_length=255)),
+                (
+                    "reservation",
+                    models.ForeignKey(
+                        db_constraint=False,
+                        on_delete=django.db.models.deletion.DO_NOTHING,
+                        related_name="+",
+                        to="theater.reservation",
+                    ),
+                ),
+                (
+                    "ticket",
+                    models.ForeignKey(
+                        db_constraint=False,
+                        on_delete=django.db.models.deletion.DO_NOTHING,
+                        related_name="+",
+                        to="theater.ticket",
+                    ),
+                ),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        condition=models.Q(("sent_at__isnull", True)),
+                        fields=["id"],
+                        name="ticketemail_pending_idx",
+                    ),
+                    models.Index(fields=["sent_at"], name="ticketemail_sent_idx"),
+                ],
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("reservation", "ticket"),
+                        name="uniq_ticketemail_res_ticket",
+                    )
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,68 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def one_per_reservation(apps, schema_editor):
+    # keep a pending row where there is one, so unsent seats still go out
+    TicketEmail = apps.get_model("theater", "TicketEmail")
+    keep = {}
+    for pk, reservation_id, sent_at in TicketEmail.objects.order_by("id").values_list(
+        "id", "reservation_id", "sent_at"
+    ):
+        kept = keep.get(reservation_id)
+        if kept is None or (kept[1] is not None and sent_at is None):
+            keep[reservation_id] = (pk, sent_at)
+    TicketEmail.objects.exclude(id__in=[pk for pk, _ in keep.values()]).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("theater", "0005_ticket_email"),
+    ]
+
+    operations = [
+        migrations.RunPython(one_per_reservation, migrations.RunPython.noop),
+        migrations.RemoveConstraint(
+            model_name="ticketemail",
+            name="uniq_ticketemail_res_ticket",
+        ),
+        migrations.RemoveIndex(
+            model_name="ticketemail",
+            name="ticketemail_pending_idx",
+        ),
+        migrations.RemoveIndex(
+            model_name="ticketemail",
+            name="ticketemail_sent_idx",
+        ),
+        migrations.RemoveField(
+            model_name="ticketemail",
+            name="ticket",
+        ),
+        migrations.RenameModel(
+            old_name="TicketEmail",
+            new_name="ReservationEmail",
+        ),
+        migrations.AlterField(
+            model_name="reservationemail",
+            name="reservation",
+            field=models.OneToOneField(
+                db_constraint=False,
+                on_delete=django.db.models.deletion.DO_NOTHING,
+                related_name="+",
+                to="theater.reservation",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="reservationemail",
+            index=models.Index(
+                condition=models.Q(("sent_at__isnull", True)),
+                fields=["id"],
+                name="resemail_pending_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="reservationemail",
+            index=models.Index(fields=["sent_at"], name="resemail_sent_idx"),
+        ),
+    ]
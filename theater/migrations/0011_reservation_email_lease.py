@@ -0,0 +1,23 @@
+# Generated by Django 5.2.3 on 2026-10-19 17:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("theater", "0010_catalog_snapshot"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="reservationemail",
+            name="claimed_by",
+            field=models.CharField(blank=True, max_length=32),
+        ),
+        migrations.AddField(
+            model_name="reservationemail",
+            name="claimed_until",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.3 on 2026-10-19 18:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("theater", "0011_reservation_email_lease"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="reminderemail",
+            name="claimed_by",
+            field=models.CharField(blank=True, max_length=32),
+        ),
+        migrations.AddField(
+            model_name="reminderemail",
+            name="claimed_until",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -3,8 +3,11 @@ from django.core.exceptions import ValidationError
 from django.utils.text import slugify
 from django.conf import settings
 from django.db import models
+from django.utils import timezone
 import os
 
+from theater.db import delete_rows
+from theater.images import responsive_sources
 from theater.messages import MSG
 
 
@@ -24,13 +27,23 @@ class Actor(models.Model):
     avatar = models.ImageField(
         upload_to=actor_directory_path, default="actors/default.png"
     )
+    # resized copies of avatar, written by generate_image_derivatives
+    avatar_variants = models.JSONField(default=dict, blank=True, editable=False)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+
+    RESPONSIVE_IMAGE = ("avatar", "avatar_variants")
 
     def __str__(self) -> str:
         return f"{self.first_name} {self.last_name}"
 
+    @property
+    def avatar_sources(self) -> dict | None:
+        return responsive_sources(self.avatar, self.avatar_variants)
+
 
 class Genre(models.Model):
     name = models.CharField(max_length=50, unique=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
 
     def __str__(self) -> str:
         return self.name
@@ -44,15 +57,25 @@ class Play(models.Model):
     image = models.ImageField(
         upload_to=play_directory_path, default="plays/default.png"
     )
+    # resized copies of image, written by generate_image_derivatives
+    image_variants = models.JSONField(default=dict, blank=True, editable=False)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+
+    RESPONSIVE_IMAGE = ("image", "image_variants")
 
     def __str__(self) -> str:
         return self.title
 
+    @property
+    def image_sources(self) -> dict | None:
+        return responsive_sources(self.image, self.image_variants)
+
 
 class TheatreHall(models.Model):
     name = models.CharField(max_length=20, unique=True)
     rows = models.PositiveIntegerField(validators=[MinValueValidator(1)])
     seats_in_row = models.PositiveIntegerField(validators=[MinValueValidator(1)])
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
 
     def __str__(self) -> str:
         return self.name
@@ -66,17 +89,65 @@ class Performance(models.Model):
         TheatreHall, on_delete=models.CASCADE, related_name="performances"
     )
     show_time = models.DateTimeField(db_index=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
 
     def __str__(self) -> str:
         return f"{self.play.title} at {self.show_time}"
 
 
+class CatalogTombstone(models.Model):
+    model_name = models.CharField(max_length=50)
+    object_id = models.BigIntegerField()
+    deleted_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["model_name", "deleted_at"], name="tombstone_model_deleted_idx"
+            ),
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.model_name} #{self.object_id} deleted at {self.deleted_at}"
+
+
+class CatalogSnapshot(models.Model):
+    """
+    A catalog file written by rebuild_catalog_snapshot. The row without
+    superseded_at is the one /api/catalog/ redirects to, shared by every web
+    process; older files are kept for CATALOG_SNAPSHOT_GRACE seconds.
+    """
+
+    digest = models.CharField(max_length=20, unique=True)
+    name = models.CharField(max_length=255)
+    created_at = models.DateTimeField(auto_now_add=True)
+    superseded_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self) -> str:
+        return self.name
+
+
+class ReservationQuerySet(models.QuerySet):
+    def delete_empty(self) -> int:
+        # a single DELETE ... WHERE NOT EXISTS; with no tickets left there is
+        # nothing to cascade, so the collector and its signals are skipped
+        qs = self.filter(
+            ~models.Exists(Ticket.objects.filter(reservation=models.OuterRef("pk"))),
+            ~models.Exists(
+                HistoricalTicket.objects.filter(reservation=models.OuterRef("pk"))
+            ),
+        )
+        return delete_rows(qs, self._db)
+
+
 class Reservation(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     user = models.ForeignKey(
         settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="reservations"
     )
 
+    objects = ReservationQuerySet.as_manager()
+
     class Meta:
         indexes = [
             models.Index(fields=["user", "created_at"], name="res_user_created_idx"),
@@ -104,6 +175,9 @@ class Ticket(models.Model):
                 violation_error_message=MSG.SEAT_TAKEN,
             )
         ]
+        indexes = [
+            models.Index(fields=["reservation", "-id"], name="ticket_res_id_idx"),
+        ]
 
     def __str__(self) -> str:
         return f"Ticket for {self.performance} - Row {self.row} Seat {self.seat}"
@@ -130,3 +204,148 @@ class Ticket(models.Model):
 
         if errors:
             raise ValidationError(errors)
+
+
+class HistoricalTicket(models.Model):
+    """
+    A ticket for a performance that has already started, moved out of Ticket
+    so the hot table and its indexes only cover upcoming shows.
+    """
+
+    # keeps the original Ticket id
+    id = models.BigIntegerField(primary_key=True)
+    row = models.PositiveIntegerField()
+    seat = models.PositiveIntegerField()
+    performance = models.ForeignKey(
+        Performance, on_delete=models.CASCADE, related_name="historical_tickets"
+    )
+    reservation = models.ForeignKey(
+        Reservation, on_delete=models.CASCADE, related_name="historical_tickets"
+    )
+
+    class Meta:
+        db_table = "theater_ticket_history"
+        indexes = [
+            models.Index(fields=["reservation", "-id"], name="histticket_res_id_idx"),
+        ]
+
+    def __str__(self) -> str:
+        return f"Ticket for {self.performance} - Row {self.row} Seat {self.seat}"
+
+
+class PendingEmailQuerySet(models.QuerySet):
+    def pending(self) -> "PendingEmailQuerySet":
+        return self.filter(
+            sent_at__isnull=True, attempts__lt=settings.EMAIL_MAX_ATTEMPTS
+        )
+
+    def claimable(self) -> "PendingEmailQuerySet":
+        # pending and not leased to a sender, or its lease ran out
+        return self.pending().filter(
+            models.Q(claimed_until__isnull=True)
+            | models.Q(claimed_until__lt=timezone.now())
+        )
+
+
+class ReservationEmail(models.Model):
+    """
+    The booking confirmation of a reservation, listing all its seats. Written
+    with the booking and marked sent by the dispatcher, so a confirmation goes
+    out once however often a dispatch is queued; seats added later reset it
+    to pending. A dispatcher leases the rows it sends (claimed_by, until
+    claimed_until) instead of keeping them locked while it talks to SMTP.
+    """
+
+    # no database constraint: purges raw-delete reservations
+    reservation = models.OneToOneField(
+        Reservation,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        related_name="+",
+    )
+    home_url = models.CharField(max_length=500, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    last_error = models.CharField(max_length=255, blank=True)
+    claimed_until = models.DateTimeField(null=True, blank=True)
+    claimed_by = models.CharField(max_length=32, blank=True)
+
+    objects = PendingEmailQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["id"],
+                name="resemail_pending_idx",
+                condition=models.Q(sent_at__isnull=True),
+            ),
+            models.Index(fields=["sent_at"], name="resemail_sent_idx"),
+        ]
+
+    def __str__(self) -> str:
+        return f"Confirmation for reservation #{self.reservation_id}"
+
+
+class ReminderEmail(models.Model):
+    """
+    The pre-show reminder of one reservation for one performance, listing its
+    seats there. Rows are written by the reminder scan in the transaction that
+    queues their job through the outbox, so a re-run or a duplicate job never
+    reminds anyone twice. Jobs lease their rows like the dispatcher does.
+    """
+
+    # no database constraints: purges raw-delete reservations and performances
+    performance = models.ForeignKey(
+        Performance,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        related_name="+",
+    )
+    reservation = models.ForeignKey(
+        Reservation,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        related_name="+",
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    last_error = models.CharField(max_length=255, blank=True)
+    claimed_until = models.DateTimeField(null=True, blank=True)
+    claimed_by = models.CharField(max_length=32, blank=True)
+
+    objects = PendingEmailQuerySet.as_manager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["performance", "reservation"], name="uniq_reminder_perf_res"
+            ),
+        ]
+        indexes = [
+            models.Index(fields=["created_at"], name="reminder_created_idx"),
+        ]
+
+    def __str__(self) -> str:
+        return (
+            f"Reminder for reservation #{self.reservation_id} "
+            f"at performance #{self.performance_id}"
+        )
+
+
+class OutboxMessage(models.Model):
+    """
+    A Celery task to publish once the transaction that wrote it commits. The
+    relay publishes and deletes rows in bulk; a crash in between publishes
+    them again, so the tasks sent this way must be idempotent.
+    """
+
+    task = models.CharField(max_length=200)
+    kwargs = models.JSONField(default=dict, blank=True)
+    # messages with the same key in one relay batch are published once
+    dedup_key = models.CharField(max_length=200, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self) -> str:
+        return f"{self.task} #{self.id}"
@@ -0,0 +1,40 @@
+from celery import current_app
+from django.db import transaction
+
+from theater.models import OutboxMessage
+
+
+def publish(task: str, kwargs: dict | None = None, dedup_key: str = "") -> None:
+    # written in the caller's transaction: nothing is published if it rolls
+    # back, and nothing is lost if the process dies right after the commit
+    OutboxMessage.objects.create(task=task, kwargs=kwargs or {}, dedup_key=dedup_key)
+
+
+def relay_batch(batch_size: int) -> int:
+    """
+    Publish up to batch_size outbox messages over one broker connection and
+    delete them, all in one transaction. A publish that fails rolls the batch
+    back for the next run. Returns how many rows were relayed.
+    """
+    with transaction.atomic():
+        messages = list(
+            OutboxMessage.objects.select_for_update(skip_locked=True).order_by("id")[
+                :batch_size
+            ]
+        )
+        if not messages:
+            return 0
+
+        groups: dict[str, list[OutboxMessage]] = {}
+        for message in messages:
+            groups.setdefault(message.dedup_key or f"#{message.id}", []).append(message)
+        with current_app.producer_or_acquire() as producer:
+            for group in groups.values():
+                current_app.send_task(
+                    group[0].task,
+                    kwargs=group[0].kwargs,
+                    producer=producer,
+                    headers={"outbox_ids": [m.id for m in group]},
+                )
+        OutboxMessage.objects.filter(id__in=[m.id for m in messages]).delete()
+    return len(messages)
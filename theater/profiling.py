@@ -0,0 +1,184 @@
+import json
+import logging
+import random
+import time
+from contextlib import ExitStack
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+
+from django.conf import settings
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.cache.backends.redis import RedisCache
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from rest_framework import serializers
+
+from .metrics import CACHE_HITS, CACHE_MISSES
+
+logger = logging.getLogger("theater.profiling")
+
+_current: ContextVar["RequestProfile | None"] = ContextVar(
+    "request_profile", default=None
+)
+_MISSING = object()
+
+
+@dataclass
+class RequestProfile:
+    started: float = field(default_factory=time.perf_counter)
+    sql_count: int = 0
+    sql_time: float = 0.0
+    cache_hits: int = 0
+    cache_misses: int = 0
+    serialize_time: float = 0.0
+    render_started: float | None = None
+    render_time: float = 0.0
+
+    def record_sql(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.sql_time += time.perf_counter() - start
+            self.sql_count += 1
+
+    def server_timing(self, total: float) -> str:
+        return ", ".join(
+            (
+                f"total;dur={total * 1000:.1f}",
+                f'db;dur={self.sql_time * 1000:.1f};desc="{self.sql_count} queries"',
+                f'cache;desc="hit={self.cache_hits} miss={self.cache_misses}"',
+                f"serialize;dur={self.serialize_time * 1000:.1f}",
+                f"render;dur={self.render_time * 1000:.1f}",
+            )
+        )
+
+
+# cache accounting: the configured backends are these subclasses; they feed
+# the hit/miss counters and, only for a profiled request, its profile
+
+
+class ProfiledCacheMixin:
+    count_get_many = True
+
+    def get(self, key, default=None, version=None):
+        value = super().get(key, _MISSING, version)
+        (CACHE_MISSES if value is _MISSING else CACHE_HITS).inc()
+        profile = _current.get()
+        if profile is not None:
+            if value is _MISSING:
+                profile.cache_misses += 1
+            else:
+                profile.cache_hits += 1
+        return default if value is _MISSING else value
+
+    def get_many(self, keys, version=None):
+        if not self.count_get_many:
+            return super().get_many(keys, version)
+        keys = list(keys)
+        found = super().get_many(keys, version)
+        CACHE_HITS.inc(len(found))
+        CACHE_MISSES.inc(len(keys) - len(found))
+        profile = _current.get()
+        if profile is not None:
+            profile.cache_hits += len(found)
+            profile.cache_misses += len(keys) - len(found)
+        return found
+
+
+class ProfiledLocMemCache(ProfiledCacheMixin, LocMemCache):
+    # LocMemCache inherits BaseCache.get_many, which goes through get()
+    count_get_many = False
+
+
+class ProfiledRedisCache(ProfiledCacheMixin, RedisCache):
+    pass
+
+
+def _timed_data(prop: property) -> property:
+    def data(self):
+        profile = _current.get()
+        if profile is None:
+            return prop.fget(self)
+        start = time.perf_counter()
+        try:
+            return prop.fget(self)
+        finally:
+            profile.serialize_time += time.perf_counter() - start
+
+    return property(data)
+
+
+def instrument_serializers() -> None:
+    # DRF builds serializer.data inside the view, before the response is
+    # rendered; time it where it happens
+    for cls in (serializers.Serializer, serializers.ListSerializer):
+        if not getattr(cls.data, "_profiled", False):
+            cls.data = _timed_data(cls.data)
+            cls.data.fget._profiled = True
+
+
+class RequestProfilingMiddleware:
+    """
+    Samples REQUEST_PROFILING_SAMPLE_RATE of requests and reports wall time,
+    SQL count and time, cache hits and misses, serializer and render time as
+    a Server-Timing header and one JSON log line. Removed from the chain
+    entirely when the rate is 0.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.sample_rate = settings.REQUEST_PROFILING_SAMPLE_RATE
+        if self.sample_rate <= 0:
+            raise MiddlewareNotUsed()
+        instrument_serializers()
+
+    def __call__(self, request):
+        if self.sample_rate < 1 and random.random() >= self.sample_rate:
+            return self.get_response(request)
+
+        profile = RequestProfile()
+        token = _current.set(profile)
+        try:
+            with ExitStack() as stack:
+                for conn in connections.all():
+                    stack.enter_context(conn.execute_wrapper(profile.record_sql))
+                response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        total = time.perf_counter() - profile.started
+
+        response["Server-Timing"] = profile.server_timing(total)
+        match = getattr(request, "resolver_match", None)
+        logger.info(
+            json.dumps(
+                {
+                    "event": "request_profile",
+                    "method": request.method,
+                    "path": request.path,
+                    "view": match.view_name if match else None,
+                    "status": response.status_code,
+                    "total_ms": round(total * 1000, 2),
+                    "db_queries": profile.sql_count,
+                    "db_ms": round(profile.sql_time * 1000, 2),
+                    "cache_hits": profile.cache_hits,
+                    "cache_misses": profile.cache_misses,
+                    "serialize_ms": round(profile.serialize_time * 1000, 2),
+                    "render_ms": round(profile.render_time * 1000, 2),
+                }
+            )
+        )
+        return response
+
+    def process_template_response(self, request, response):
+        profile = _current.get()
+        if profile is not None:
+            profile.render_started = time.perf_counter()
+            response.add_post_render_callback(self._rendered)
+        return response
+
+    @staticmethod
+    def _rendered(response):
+        profile = _current.get()
+        if profile is not None and profile.render_started is not None:
+            profile.render_time += time.perf_counter() - profile.render_started
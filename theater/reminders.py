@@ -0,0 +1,85 @@
+from datetime import datetime, timedelta
+from itertools import groupby, islice
+from typing import Callable, Iterator
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+
+from theater.models import ReminderEmail, Ticket
+
+
+def chunked_pairs(
+    pairs: Iterator[tuple[int, int]], size: int
+) -> Iterator[tuple[int, list[int]]]:
+    # (performance_id, reservation_id) pairs sorted by performance, cut into
+    # chunks of one performance each
+    for performance_id, group in groupby(pairs, lambda pair: pair[0]):
+        reservation_ids = (reservation_id for _, reservation_id in group)
+        while chunk := list(islice(reservation_ids, size)):
+            yield performance_id, chunk
+
+
+def schedule_reminders(
+    now: datetime, chunk_size: int, enqueue: Callable[[int, list[int]], None]
+) -> dict:
+    """
+    Write a ReminderEmail for every reservation with seats at a performance
+    starting within REMINDER_LEAD_HOURS that has none yet, and hand each
+    chunk to enqueue in the transaction that writes its rows, so enqueue
+    should write to the outbox. Pairs are streamed with a server-side cursor
+    and every chunk commits on its own, so an interrupted scan resumes from
+    the reservations that still have no row.
+    """
+    window = Ticket.objects.filter(
+        performance__show_time__gt=now,
+        performance__show_time__lte=now + timedelta(hours=settings.REMINDER_LEAD_HOURS),
+    )
+    missing = (
+        window.filter(
+            ~Exists(
+                ReminderEmail.objects.filter(
+                    performance_id=OuterRef("performance_id"),
+                    reservation_id=OuterRef("reservation_id"),
+                )
+            )
+        )
+        .values_list("performance_id", "reservation_id")
+        .order_by("performance_id", "reservation_id")
+        .distinct()
+    )
+    # rows whose job never ran, or hit a failing server, are queued again
+    stale = (
+        ReminderEmail.objects.pending()
+        .filter(
+            created_at__lt=now - timedelta(seconds=settings.REMINDER_RETRY_AFTER),
+            performance__show_time__gt=now,
+        )
+        .values_list("performance_id", "reservation_id")
+        .order_by("performance_id", "reservation_id")
+    )
+
+    created = chunks = 0
+    for performance_id, reservation_ids in chunked_pairs(
+        missing.iterator(chunk_size=chunk_size), chunk_size
+    ):
+        with transaction.atomic():
+            ReminderEmail.objects.bulk_create(
+                [
+                    ReminderEmail(performance_id=performance_id, reservation_id=r)
+                    for r in reservation_ids
+                ],
+                ignore_conflicts=True,
+            )
+            enqueue(performance_id, reservation_ids)
+        created += len(reservation_ids)
+        chunks += 1
+
+    retried = 0
+    for performance_id, reservation_ids in chunked_pairs(
+        stale.iterator(chunk_size=chunk_size), chunk_size
+    ):
+        enqueue(performance_id, reservation_ids)
+        retried += len(reservation_ids)
+        chunks += 1
+    return {"created": created, "retried": retried, "chunks": chunks}
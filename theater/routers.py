@@ -0,0 +1,91 @@
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+PRIMARY_PIN_COOKIE = "db_primary_pin"
+SAFE_METHODS = ("GET", "HEAD", "OPTIONS")
+
+_read_from_replica: ContextVar[bool] = ContextVar("read_from_replica", default=False)
+
+
+@contextmanager
+def primary_reads():
+    token = _read_from_replica.set(False)
+    try:
+        yield
+    finally:
+        _read_from_replica.reset(token)
+
+
+def use_primary(view_func):
+    @wraps(view_func)
+    def _wrapped(request, *args, **kwargs):
+        with primary_reads():
+            return view_func(request, *args, **kwargs)
+
+    return _wrapped
+
+
+class PrimaryReplicaRouter:
+    """
+    Sends reads to a random replica while ReplicaRoutingMiddleware allows it
+    for the current request; everything else goes to the primary.
+    """
+
+    def db_for_read(self, model, **hints):
+        replicas = settings.DATABASE_REPLICAS
+        if not replicas or not _read_from_replica.get():
+            return DEFAULT_DB_ALIAS
+        # reads inside a write transaction must see its own rows
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        return random.choice(replicas)
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db not in settings.DATABASE_REPLICAS
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Lets safe-method API and ajax requests read from replicas. A successful
+    write pins the client to the primary for REPLICA_PIN_SECONDS via a
+    cookie, so it reads its own writes (e.g. a fresh ticket in "My
+    Reservations") until the replicas have caught up.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def use_replica(self, request) -> bool:
+        return (
+            request.method in SAFE_METHODS
+            and request.path.startswith(settings.REPLICA_READ_PATH_PREFIXES)
+            and PRIMARY_PIN_COOKIE not in request.COOKIES
+        )
+
+    def __call__(self, request):
+        token = _read_from_replica.set(self.use_replica(request))
+        try:
+            response = self.get_response(request)
+        finally:
+            _read_from_replica.reset(token)
+
+        if request.method not in SAFE_METHODS and response.status_code < 400:
+            response.set_cookie(
+                PRIMARY_PIN_COOKIE,
+                "1",
+                max_age=settings.REPLICA_PIN_SECONDS,
+                httponly=True,
+                samesite="Lax",
+            )
+        return response
@@ -1,19 +1,111 @@
 from typing import Any
+import time
 import logging
 from django.urls import reverse
-from django.db import transaction
-from theater.tasks import send_ticket_email
+from django.utils import timezone
+from django.core.cache import cache
+from django.db.models import Count, F, IntegerField, ExpressionWrapper, QuerySet
+from theater.models import Performance, ReservationEmail
+from theater.catalog import CATALOG_PENDING_KEY, CATALOG_REBUILD_DELAY
+from theater import outbox
+from theater.tasks import rebuild_catalog_snapshot
 
 logger = logging.getLogger(__name__)
 
+BOOKABLE_CACHE_KEY = "theater:bookable-performances"
+BOOKABLE_VERSION_KEY = "theater:bookable-performances:version"
+BOOKABLE_CACHE_TIMEOUT = 5 * 60
 
-def notify_ticket_booked(request: Any, reservation: Any, ticket: Any) -> None:
+
+def notify_reservation_booked(request: Any, reservation: Any) -> None:
     home_url = request.build_absolute_uri(reverse("theater:home")) if request else None
+    # part of the booking: rolled back with it, delivered once it commits.
+    # Seats added to an already confirmed reservation send it again, listing
+    # every seat; several added in one burst still make one message.
+    # one INSERT ... ON CONFLICT DO UPDATE: no SELECT FOR UPDATE, so the
+    # booking never queues behind a dispatcher. Resetting the lease means a
+    # dispatcher sending the previous version does not mark this one sent.
+    ReservationEmail.objects.bulk_create(
+        [ReservationEmail(reservation=reservation, home_url=home_url or "")],
+        update_conflicts=True,
+        unique_fields=["reservation"],
+        update_fields=[
+            "home_url",
+            "sent_at",
+            "attempts",
+            "last_error",
+            "claimed_until",
+            "claimed_by",
+        ],
+    )
+    # no broker round-trip here: the outbox relay publishes the dispatch
+    outbox.publish(
+        "theater.tasks.dispatch_ticket_emails", dedup_key="dispatch-ticket-emails"
+    )
+
+
+def bookable_performances_queryset() -> QuerySet[Performance]:
+    return (
+        Performance.objects.filter(show_time__gte=timezone.now())
+        .select_related("play", "theatre_hall")
+        .annotate(
+            reserved=Count("tickets"),
+            capacity=ExpressionWrapper(
+                F("theatre_hall__rows") * F("theatre_hall__seats_in_row"),
+                output_field=IntegerField(),
+            ),
+        )
+        .filter(reserved__lt=F("capacity"))
+        .order_by("show_time")
+    )
+
+
+def _bookable_cache_key() -> str:
+    version = cache.get_or_set(BOOKABLE_VERSION_KEY, time.time_ns, timeout=None)
+    return f"{BOOKABLE_CACHE_KEY}:v{version}"
+
+
+def cached_bookable_performances() -> list[dict] | None:
+    return cache.get(_bookable_cache_key())
+
+
+def bookable_performances() -> list[dict]:
+    key = _bookable_cache_key()
+    entries = cache.get(key)
+    if entries is None:
+        entries = list(
+            bookable_performances_queryset().values(
+                "id",
+                "show_time",
+                "capacity",
+                title=F("play__title"),
+                rows=F("theatre_hall__rows"),
+                seats_in_row=F("theatre_hall__seats_in_row"),
+            )
+        )
+        cache.set(key, entries, BOOKABLE_CACHE_TIMEOUT)
+
+    now = timezone.now()
+    return [e for e in entries if e["show_time"] >= now]
+
+
+def find_bookable_performance(pk: Any) -> dict | None:
+    return next((p for p in bookable_performances() if str(p["id"]) == str(pk)), None)
+
+
+def invalidate_bookable_performances() -> None:
+    try:
+        cache.incr(BOOKABLE_VERSION_KEY)
+    except ValueError:
+        cache.set(BOOKABLE_VERSION_KEY, time.time_ns(), timeout=None)
 
-    def _enqueue():
-        try:
-            send_ticket_email.delay(reservation.id, ticket.id, home_url)
-        except Exception as exc:
-            logger.warning("Email enqueue failed: %r", exc, exc_info=True)
 
-    transaction.on_commit(_enqueue)
+def schedule_catalog_rebuild() -> None:
+    # one delayed rebuild per burst of admin edits
+    if not cache.add(CATALOG_PENDING_KEY, 1, timeout=CATALOG_REBUILD_DELAY * 4):
+        return
+    try:
+        rebuild_catalog_snapshot.apply_async(countdown=CATALOG_REBUILD_DELAY)
+    except Exception as exc:
+        cache.delete(CATALOG_PENDING_KEY)
+        logger.warning("Catalog rebuild enqueue failed: %r", exc, exc_info=True)
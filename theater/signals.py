@@ -1,17 +1,147 @@
 from django.db import transaction
-from django.db.models.signals import post_delete
+from django.db.models import Count
+from django.utils import timezone
+from django.db.models.signals import m2m_changed, post_delete, post_save
 from django.dispatch import receiver
-from theater.models import Ticket, Reservation
+from theater.models import (
+    CatalogTombstone,
+    Actor,
+    Genre,
+    Play,
+    TheatreHall,
+    Performance,
+    Ticket,
+    Reservation,
+)
+from theater import outbox
+from theater.db import collect_on_commit
+from theater.images import delete_derivatives
+from theater.services import (
+    cached_bookable_performances,
+    invalidate_bookable_performances,
+    schedule_catalog_rebuild,
+)
+
+
+def _delete_empty_reservations(using: str, ids: set[int]) -> None:
+    # ids whose delete was rolled back with a savepoint are harmless:
+    # delete_empty rechecks every one
+    Reservation.objects.using(using).filter(pk__in=ids).delete_empty()
 
 
 @receiver(post_delete, sender=Ticket, dispatch_uid="theater.cleanup_empty_reservation")
-def cleanup_empty_reservation(sender, instance: Ticket, **kwargs) -> None:
-    res_id = instance.reservation_id
-    if not res_id:
+def cleanup_empty_reservation(sender, instance: Ticket, using: str, **kwargs) -> None:
+    # one set-based DELETE for all tickets of the transaction
+    if instance.reservation_id:
+        collect_on_commit(_delete_empty_reservations, instance.reservation_id, using)
+
+
+def _refresh_bookable(using: str, performance_ids: set[int | None]) -> None:
+    # None stands for a change that always makes the cached list stale; new
+    # tickets only do when they sold a listed performance out
+    if None not in performance_ids:
+        capacity = {
+            p["id"]: p["capacity"] for p in cached_bookable_performances() or []
+        }
+        listed = [pk for pk in performance_ids if pk in capacity]
+        if not listed:
+            return
+        reserved = (
+            Ticket.objects.using(using)
+            .filter(performance_id__in=listed)
+            .values_list("performance_id")
+            .annotate(n=Count("id"))
+        )
+        if all(n < capacity[pk] for pk, n in reserved):
+            return
+    invalidate_bookable_performances()
+
+
+@receiver(post_save, sender=Play, dispatch_uid="theater.bookable_play")
+@receiver(post_save, sender=TheatreHall, dispatch_uid="theater.bookable_hall")
+@receiver(post_save, sender=Performance, dispatch_uid="theater.bookable_perf")
+@receiver(post_delete, sender=Performance, dispatch_uid="theater.bookable_perf_del")
+@receiver(post_delete, sender=Ticket, dispatch_uid="theater.bookable_ticket_del")
+def schedule_changed(sender, using: str, **kwargs) -> None:
+    # once per transaction, after it commits: bumping earlier would let
+    # another process cache a list built before the commit
+    collect_on_commit(_refresh_bookable, None, using)
+
+
+@receiver(post_save, sender=Ticket, dispatch_uid="theater.bookable_ticket")
+def ticket_saved(sender, instance: Ticket, created: bool, using: str, **kwargs) -> None:
+    value = instance.performance_id if created else None
+    collect_on_commit(_refresh_bookable, value, using)
+
+
+@receiver(post_save, sender=Actor, dispatch_uid="theater.catalog_actor")
+@receiver(post_delete, sender=Actor, dispatch_uid="theater.catalog_actor_del")
+@receiver(post_save, sender=Genre, dispatch_uid="theater.catalog_genre")
+@receiver(post_delete, sender=Genre, dispatch_uid="theater.catalog_genre_del")
+@receiver(post_save, sender=Play, dispatch_uid="theater.catalog_play")
+@receiver(post_delete, sender=Play, dispatch_uid="theater.catalog_play_del")
+@receiver(post_save, sender=TheatreHall, dispatch_uid="theater.catalog_hall")
+@receiver(post_delete, sender=TheatreHall, dispatch_uid="theater.catalog_hall_del")
+@receiver(post_save, sender=Performance, dispatch_uid="theater.catalog_perf")
+@receiver(post_delete, sender=Performance, dispatch_uid="theater.catalog_perf_del")
+@receiver(m2m_changed, sender=Play.actors.through, dispatch_uid="theater.catalog_cast")
+@receiver(m2m_changed, sender=Play.genres.through, dispatch_uid="theater.catalog_tags")
+def catalog_changed(sender, **kwargs) -> None:
+    if kwargs.get("action") in (None, "post_add", "post_remove", "post_clear"):
+        transaction.on_commit(schedule_catalog_rebuild)
+
+
+@receiver(post_delete, sender=Actor, dispatch_uid="theater.tombstone_actor")
+@receiver(post_delete, sender=Genre, dispatch_uid="theater.tombstone_genre")
+@receiver(post_delete, sender=Play, dispatch_uid="theater.tombstone_play")
+@receiver(post_delete, sender=TheatreHall, dispatch_uid="theater.tombstone_hall")
+@receiver(post_delete, sender=Performance, dispatch_uid="theater.tombstone_perf")
+def record_tombstone(sender, instance, **kwargs) -> None:
+    CatalogTombstone.objects.create(
+        model_name=sender._meta.model_name, object_id=instance.pk
+    )
+
+
+@receiver(m2m_changed, sender=Play.actors.through, dispatch_uid="theater.touch_cast")
+@receiver(m2m_changed, sender=Play.genres.through, dispatch_uid="theater.touch_tags")
+def touch_play(sender, instance, action: str, reverse: bool, pk_set, **kwargs) -> None:
+    if reverse and action == "pre_clear":
+        # post_clear carries no pk_set, so remember which plays lose the link
+        instance._cleared_play_ids = list(instance.plays.values_list("pk", flat=True))
+        return
+    if action not in ("post_add", "post_remove", "post_clear"):
+        return
+
+    if not reverse:
+        play_ids = [instance.pk]
+    elif action == "post_clear":
+        play_ids = instance.__dict__.pop("_cleared_play_ids", [])
+    else:
+        play_ids = pk_set or []
+    Play.objects.filter(pk__in=play_ids).update(updated_at=timezone.now())
+
+
+@receiver(post_save, sender=Actor, dispatch_uid="theater.actor_derivatives")
+@receiver(post_save, sender=Play, dispatch_uid="theater.play_derivatives")
+def image_saved(sender, instance, **kwargs) -> None:
+    field, manifest_field = sender.RESPONSIVE_IMAGE
+    default = sender._meta.get_field(field).default
+    manifest = getattr(instance, manifest_field)
+    if getattr(instance, field).name == manifest.get("source", default):
         return
+    label = sender._meta.label_lower
+    outbox.publish(
+        "theater.tasks.generate_image_derivatives",
+        {"model": label, "pk": instance.pk},
+        dedup_key=f"derivatives:{label}:{instance.pk}",
+    )
 
-    def _do_cleanup() -> None:
-        if not Ticket.objects.filter(reservation_id=res_id).exists():
-            Reservation.objects.filter(pk=res_id).delete()
 
-    transaction.on_commit(_do_cleanup)
+@receiver(post_delete, sender=Actor, dispatch_uid="theater.actor_derivatives_del")
+@receiver(post_delete, sender=Play, dispatch_uid="theater.play_derivatives_del")
+def image_deleted(sender, instance, **kwargs) -> None:
+    field, manifest_field = sender.RESPONSIVE_IMAGE
+    manifest = getattr(instance, manifest_field)
+    if manifest.get("variants"):
+        storage = getattr(instance, field).storage
+        transaction.on_commit(lambda: delete_derivatives(storage, manifest))
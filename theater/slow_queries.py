@@ -0,0 +1,200 @@
+import hashlib
+import json
+import logging
+import re
+import threading
+import time
+from collections import OrderedDict
+from contextlib import ExitStack
+from dataclasses import dataclass
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import DatabaseError, connections, transaction
+
+logger = logging.getLogger("theater.slow_queries")
+
+_IN_LIST = re.compile(r"IN \((?:%s, )*%s\)")
+_LITERAL = re.compile(r"'(?:[^']|'')*'|\b\d+\b")
+_SPACE = re.compile(r"\s+")
+# SQL words that can follow a table name where an alias would
+_NOT_ALIASES = {
+    "CROSS",
+    "FULL",
+    "GROUP",
+    "INNER",
+    "JOIN",
+    "LEFT",
+    "LIMIT",
+    "ON",
+    "ORDER",
+    "OUTER",
+    "RIGHT",
+    "SET",
+    "USING",
+    "WHERE",
+}
+
+
+def fingerprint(sql: str) -> str:
+    # same statement modulo literals and IN-list length
+    normalized = _SPACE.sub(" ", _LITERAL.sub("?", _IN_LIST.sub("IN (...)", sql)))
+    return hashlib.sha1(normalized.strip().encode()).hexdigest()[:12]
+
+
+def param_shape(params) -> list | dict | None:
+    # types only: values can be personal data
+    if params is None:
+        return None
+    if isinstance(params, dict):
+        return {key: type(value).__name__ for key, value in params.items()}
+    return [type(value).__name__ for value in params]
+
+
+def explain(connection, sql: str, params) -> list[str] | None:
+    # a failed EXPLAIN must not poison the caller's transaction
+    try:
+        with transaction.atomic(using=connection.alias), connection.cursor() as cur:
+            cur.execute(f"{connection.ops.explain_query_prefix()} {sql}", params)
+            return [str(row[-1]) for row in cur.fetchall()]
+    except DatabaseError:
+        return None
+
+
+def seq_scans(plan: list[str], sql: str, tables) -> list[str]:
+    """
+    Tables from `tables` that the plan reads in full: "Seq Scan on <table>"
+    on PostgreSQL, "SCAN <table or alias>" without an index on SQLite.
+    """
+    found = []
+    for table in tables:
+        names = {table}
+        for match in re.finditer(rf'"?\b{table}\b"?\s+(?:AS\s+)?"?(\w+)"?', sql):
+            if match.group(1).upper() not in _NOT_ALIASES:
+                names.add(match.group(1))
+        alternatives = "|".join(re.escape(name) for name in names)
+        pattern = re.compile(
+            rf"Seq Scan on (?:{alternatives})\b"
+            rf"|^SCAN (?:{alternatives})\b(?! USING (?:COVERING )?INDEX)"
+        )
+        if any(pattern.search(line.strip()) for line in plan):
+            found.append(table)
+    return found
+
+
+@dataclass
+class _Seen:
+    count: int = 0
+    max_ms: float = 0.0
+    logged_at: float | None = None
+
+
+class SlowQueryLog:
+    """
+    Per-process dedup of slow statements by fingerprint. A fingerprint is
+    logged, with its plan, the first time it is seen and again once per
+    SLOW_QUERY_REPEAT_SECONDS; the entry carries how often it was slow since
+    it was last logged.
+    """
+
+    def __init__(self, max_entries: int = 1000) -> None:
+        self.max_entries = max_entries
+        self.lock = threading.Lock()
+        self.seen: OrderedDict[str, _Seen] = OrderedDict()
+
+    def record(self, key: str, ms: float, repeat_seconds: float) -> _Seen | None:
+        now = time.monotonic()
+        with self.lock:
+            entry = self.seen.pop(key, None) or _Seen()
+            self.seen[key] = entry
+            while len(self.seen) > self.max_entries:
+                self.seen.popitem(last=False)
+            entry.count += 1
+            entry.max_ms = max(entry.max_ms, ms)
+            if entry.logged_at is not None and now - entry.logged_at < repeat_seconds:
+                return None
+            report = _Seen(entry.count, entry.max_ms, entry.logged_at)
+            entry.count, entry.max_ms, entry.logged_at = 0, 0.0, now
+            return report
+
+    def clear(self) -> None:
+        with self.lock:
+            self.seen.clear()
+
+
+slow_query_log = SlowQueryLog()
+
+
+class SlowQueryWrapper:
+    def __init__(self, threshold_ms: float, source) -> None:
+        self.threshold_ms = threshold_ms
+        self.source = source
+        self.explaining = False
+
+    def __call__(self, execute, sql, params, many, context):
+        if self.explaining:
+            return execute(sql, params, many, context)
+        start = time.perf_counter()
+        result = execute(sql, params, many, context)
+        ms = (time.perf_counter() - start) * 1000
+        if ms >= self.threshold_ms:
+            self.report(context["connection"], sql, params, many, ms)
+        return result
+
+    def report(self, connection, sql, params, many, ms) -> None:
+        key = fingerprint(sql)
+        seen = slow_query_log.record(key, ms, settings.SLOW_QUERY_REPEAT_SECONDS)
+        if seen is None:
+            return
+
+        plan = None
+        if not many:
+            self.explaining = True
+            try:
+                plan = explain(connection, sql, params)
+            finally:
+                self.explaining = False
+        flagged = seq_scans(plan or [], sql, settings.SLOW_QUERY_SEQ_SCAN_TABLES)
+        logger.warning(
+            json.dumps(
+                {
+                    "event": "slow_query",
+                    "fingerprint": key,
+                    "source": self.source(),
+                    "database": connection.alias,
+                    "ms": round(ms, 2),
+                    "count": seen.count,
+                    "max_ms": round(seen.max_ms, 2),
+                    "sql": sql,
+                    "params": param_shape(params[0] if many and params else params),
+                    "many": many,
+                    "plan": plan,
+                    "seq_scan": flagged,
+                }
+            )
+        )
+
+
+class SlowQueryLogMiddleware:
+    """
+    Logs statements slower than SLOW_QUERY_MS on the "theater.slow_queries"
+    logger, with their EXPLAIN plan, the view that ran them and the types of
+    their parameters. Removed from the chain when the threshold is 0.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.threshold_ms = settings.SLOW_QUERY_MS
+        if self.threshold_ms <= 0:
+            raise MiddlewareNotUsed()
+
+    def __call__(self, request):
+        def source() -> str:
+            match = getattr(request, "resolver_match", None)
+            return match.view_name if match else request.path
+
+        wrapper = SlowQueryWrapper(self.threshold_ms, source)
+        with ExitStack() as stack:
+            for conn in connections.all():
+                stack.enter_context(conn.execute_wrapper(wrapper))
+            return self.get_response(request)
@@ -1,7 +1,10 @@
 from __future__ import annotations
+from functools import lru_cache
 from pathlib import Path
 from typing import Iterable
+from django.conf import settings
 from django.core.files.storage import FileSystemStorage
+from django.core.signals import setting_changed
 from django.db import transaction
 
 
@@ -44,7 +47,27 @@ def _prune_empty_dirs(
         cur = cur.parent
 
 
-class PruningFileSystemStorage(FileSystemStorage):
+class CachedUrlMixin:
+    """
+    Memoize url() per stored name. A name's URL only depends on the storage
+    configuration, so serializers and templates rendering the same avatar or
+    poster on every row reuse the first result instead of rebuilding it.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._url = lru_cache(maxsize=settings.MEDIA_URL_CACHE_SIZE)(super().url)
+        setting_changed.connect(self._clear_url_cache)
+
+    def _clear_url_cache(self, setting, **kwargs):
+        if setting in ("MEDIA_URL", "CLOUDINARY_STORAGE"):
+            self._url.cache_clear()
+
+    def url(self, name):
+        return self._url(name)
+
+
+class PruningFileSystemStorage(CachedUrlMixin, FileSystemStorage):
 
     def delete(self, name):
 
@@ -1,60 +1,172 @@
+from datetime import datetime, timedelta
 from celery import shared_task
+from django.apps import apps
 from django.conf import settings
+from django.core.cache import cache
 from django.utils import timezone
-from django.db import transaction
-from django.core.mail import EmailMultiAlternatives
-from django.template.loader import render_to_string
-from theater.models import Performance, Reservation, Ticket
+from theater.models import CatalogTombstone, ReminderEmail, ReservationEmail
+from theater.archive import purge_performance_batch
+from theater.catalog import CATALOG_PENDING_KEY, build_catalog_snapshot
+from theater.emails import send_reminder_batch, send_reservation_email_batch
+from theater.images import delete_derivatives, generate_derivatives
+from theater.outbox import publish, relay_batch
+from theater.reminders import schedule_reminders
+from theater.ticket_history import move_tickets_to_history
+
+
+@shared_task(bind=True, ignore_result=True)
+def purge_past_performances(self, cutoff: str | None = None) -> dict:
+    # every batch commits on its own, so an interrupted run resumes from
+    # whatever is still left; a run that hits PURGE_MAX_BATCHES re-queues
+    # itself with the same cutoff instead of holding the worker
+    cutoff_dt = datetime.fromisoformat(cutoff) if cutoff else timezone.now()
+    totals = {"performances": 0, "tickets": 0, "reservations": 0}
+    for _ in range(settings.PURGE_MAX_BATCHES):
+        purged = purge_performance_batch(cutoff_dt, settings.PURGE_BATCH_SIZE)
+        if purged is None:
+            break
+        for key, count in purged.items():
+            totals[key] += count
+    else:
+        self.apply_async(kwargs={"cutoff": cutoff_dt.isoformat()})
+
+    return {
+        "deleted_performances": totals["performances"],
+        "deleted_tickets": totals["tickets"],
+        "deleted_reservations": totals["reservations"],
+        "cutoff": cutoff_dt.isoformat(),
+    }
+
+
+@shared_task(bind=True, ignore_result=True)
+def move_past_tickets_to_history(self, cutoff: str | None = None) -> dict:
+    cutoff_dt = datetime.fromisoformat(cutoff) if cutoff else timezone.now()
+    total = 0
+    for _ in range(settings.PURGE_MAX_BATCHES):
+        moved = move_tickets_to_history(cutoff_dt, settings.TICKET_HISTORY_BATCH_SIZE)
+        total += moved
+        if not moved:
+            break
+    else:
+        self.apply_async(kwargs={"cutoff": cutoff_dt.isoformat()})
+    return {"moved_tickets": total, "cutoff": cutoff_dt.isoformat()}
 
 
 @shared_task(ignore_result=True)
-def purge_past_performances() -> dict:
-    now = timezone.now()
-    with transaction.atomic():
-        qs = Performance.objects.filter(show_time__lt=now)
-        deleted_count = qs.count()
-        qs.delete()
-    return {"deleted_performances": deleted_count, "cutoff": now.isoformat()}
+def purge_catalog_tombstones() -> dict:
+    cutoff = timezone.now() - timedelta(days=settings.CATALOG_TOMBSTONE_RETENTION_DAYS)
+    deleted_count, _ = CatalogTombstone.objects.filter(deleted_at__lt=cutoff).delete()
+    return {"deleted_tombstones": deleted_count, "cutoff": cutoff.isoformat()}
 
 
-@shared_task(bind=True, autoretry_for=(Exception,), retry_backoff=True, max_retries=5)
+@shared_task(ignore_result=True)
+def rebuild_catalog_snapshot() -> dict:
+    cache.delete(CATALOG_PENDING_KEY)
+    return build_catalog_snapshot()
+
+
+@shared_task(ignore_result=True)
+def send_reservation_email(reservation_id: int, home_url: str | None = None) -> None:
+    ReservationEmail.objects.get_or_create(
+        reservation_id=reservation_id, defaults={"home_url": home_url or ""}
+    )
+    dispatch_ticket_emails.delay()
+
+
+@shared_task(ignore_result=True)
 def send_ticket_email(
-    self, reservation_id: int, ticket_id: int, home_url: str | None = None
+    reservation_id: int, ticket_id: int, home_url: str | None = None
 ) -> None:
-    r = Reservation.objects.select_related("user").get(id=reservation_id)
-    t = Ticket.objects.select_related(
-        "performance__play", "performance__theatre_hall"
-    ).get(id=ticket_id)
-
-    site_name = getattr(settings, "SITE_NAME", "Wildfire Stageworks")
-    user_first = r.user.first_name or ""
-    user_last = r.user.last_name or ""
-    user_full = (user_first + " " + user_last).strip() or r.user.email
-
-    ctx = {
-        "site_name": site_name,
-        "user_first": user_first,
-        "user_last": user_last,
-        "user_full": user_full,
-        "reservation_id": r.id,
-        "play_title": t.performance.play.title,
-        "hall_name": t.performance.theatre_hall.name,
-        "show_time": t.performance.show_time,
-        "row": t.row,
-        "seat": t.seat,
-        "home_url": home_url,
-    }
+    # per-ticket messages queued before confirmations covered the reservation
+    send_reservation_email(reservation_id, home_url)
+
 
-    subject = (
-        f"[{site_name}] Reservation №{r.id}: {ctx['play_title']} — "
-        f"{ctx['show_time']:%Y-%m-%d %H:%M}"
+@shared_task(bind=True, autoretry_for=(Exception,), retry_backoff=True, max_retries=5)
+def dispatch_ticket_emails(self) -> dict:
+    # published by the outbox relay at least once per batch of bookings;
+    # confirmations already marked sent are skipped, so duplicates are no-ops
+    sent = claimed = 0
+    failed_ids = set()
+    for _ in range(settings.EMAIL_DISPATCH_MAX_BATCHES):
+        batch = send_reservation_email_batch(
+            settings.EMAIL_BATCH_SIZE, exclude=failed_ids
+        )
+        claimed += batch["claimed"]
+        sent += batch["sent"]
+        failed_ids |= batch["failed_ids"]
+        if batch["claimed"] < settings.EMAIL_BATCH_SIZE:
+            break
+    else:
+        self.apply_async()
+    return {"claimed": claimed, "sent": sent, "failed": len(failed_ids)}
+
+
+@shared_task(ignore_result=True)
+def schedule_performance_reminders() -> dict:
+    # one job per chunk of reservations instead of one per ticket, published
+    # by the outbox relay once the chunk's rows are committed
+    return schedule_reminders(
+        timezone.now(),
+        settings.EMAIL_BATCH_SIZE,
+        lambda performance_id, reservation_ids: publish(
+            "theater.tasks.send_performance_reminders",
+            {"performance_id": performance_id, "reservation_ids": reservation_ids},
+        ),
     )
-    text = render_to_string("email/ticket_booked.txt", ctx)
-    html = render_to_string("email/ticket_booked.html", ctx)
 
-    from_email = (
-        getattr(settings, "DEFAULT_FROM_EMAIL", None) or settings.EMAIL_HOST_USER
+
+@shared_task(bind=True, autoretry_for=(Exception,), retry_backoff=True, max_retries=5)
+def send_performance_reminders(
+    self, performance_id: int, reservation_ids: list[int]
+) -> dict:
+    return send_reminder_batch(performance_id, reservation_ids)
+
+
+@shared_task(bind=True, ignore_result=True)
+def relay_outbox(self) -> dict:
+    relayed = 0
+    for _ in range(settings.OUTBOX_MAX_BATCHES):
+        count = relay_batch(settings.OUTBOX_BATCH_SIZE)
+        relayed += count
+        if count < settings.OUTBOX_BATCH_SIZE:
+            break
+    else:
+        self.apply_async()
+    return {"relayed": relayed}
+
+
+@shared_task(ignore_result=True)
+def purge_sent_ticket_emails() -> dict:
+    cutoff = timezone.now() - timedelta(days=settings.EMAIL_RETENTION_DAYS)
+    deleted_count, _ = ReservationEmail.objects.filter(sent_at__lt=cutoff).delete()
+    # reminders are only written in the day before their show
+    reminders, _ = ReminderEmail.objects.filter(created_at__lt=cutoff).delete()
+    return {
+        "deleted": deleted_count,
+        "reminders": reminders,
+        "cutoff": cutoff.isoformat(),
+    }
+
+
+@shared_task(ignore_result=True)
+def generate_image_derivatives(model: str, pk: int) -> dict:
+    model_cls = apps.get_model(model)
+    field, manifest_field = model_cls.RESPONSIVE_IMAGE
+    obj = model_cls.objects.filter(pk=pk).first()
+    if obj is None:
+        return {"variants": 0}
+    field_file = getattr(obj, field)
+    old = getattr(obj, manifest_field)
+    if old.get("source") == field_file.name:
+        return {"variants": len(old["variants"])}
+
+    manifest = {}
+    if field_file and field_file.name != model_cls._meta.get_field(field).default:
+        manifest = generate_derivatives(field_file)
+
+    # only if the upload is still the one we resized; no signals fire here
+    updated = model_cls.objects.filter(pk=pk, **{field: field_file.name}).update(
+        **{manifest_field: manifest, "updated_at": timezone.now()}
     )
-    msg = EmailMultiAlternatives(subject, text, from_email, [r.user.email])
-    msg.attach_alternative(html, "text/html")
-    msg.send(fail_silently=True)
+    delete_derivatives(field_file.storage, old if updated else manifest)
+    return {"variants": len(manifest.get("variants", ())) if updated else 0}
@@ -0,0 +1,174 @@
+import shutil
+import tempfile
+from datetime import timedelta
+from io import BytesIO, StringIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.files.storage import FileSystemStorage, default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from PIL import Image
+from rest_framework.test import APIClient
+
+from theater.models import Actor, OutboxMessage, Performance, Play, TheatreHall
+from theater.storage import PruningFileSystemStorage
+from theater.tasks import generate_image_derivatives
+
+
+def upload(name: str, size: tuple[int, int], fmt: str = "PNG") -> SimpleUploadedFile:
+    buffer = BytesIO()
+    Image.new("RGB", size, "teal").save(buffer, fmt)
+    return SimpleUploadedFile(name, buffer.getvalue())
+
+
+class ImageDerivativeTests(TestCase):
+    def setUp(self):
+        media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media, ignore_errors=True)
+        overrides = override_settings(MEDIA_ROOT=media)
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+
+    def generate(self, obj):
+        generate_image_derivatives.apply(
+            kwargs={"model": obj._meta.label_lower, "pk": obj.pk}
+        )
+        obj.refresh_from_db()
+
+    def test_upload_queues_and_generates(self):
+        play = Play.objects.create(
+            title="Hamlet", description="d", image=upload("poster.png", (1200, 800))
+        )
+        message = OutboxMessage.objects.get()
+        self.assertEqual(message.task, "theater.tasks.generate_image_derivatives")
+        self.assertEqual(message.kwargs, {"model": "theater.play", "pk": play.pk})
+
+        self.generate(play)
+        manifest = play.image_variants
+        self.assertEqual(manifest["source"], play.image.name)
+        self.assertEqual([v["width"] for v in manifest["variants"]], [320, 640, 960])
+        with default_storage.open(manifest["variants"][0]["webp"]) as f:
+            self.assertEqual(Image.open(f).size, (320, 213))
+        with default_storage.open(manifest["variants"][0]["jpg"]) as f:
+            self.assertEqual(Image.open(f).format, "JPEG")
+
+        sources = play.image_sources
+        self.assertIn("_320w.webp 320w, ", sources["webp"])
+        self.assertTrue(sources["jpeg"].endswith("_960w.jpg 960w"))
+        self.assertTrue(sources["placeholder"].startswith("data:image/jpeg;base64,"))
+
+        # the task is idempotent and saving without a new upload queues nothing
+        self.generate(play)
+        play.save()
+        self.assertEqual(OutboxMessage.objects.count(), 1)
+
+    def test_widths_capped_at_original(self):
+        actor = Actor.objects.create(
+            first_name="A", last_name="B", avatar=upload("a.jpg", (200, 200), "JPEG")
+        )
+        self.generate(actor)
+        self.assertEqual([v["width"] for v in actor.avatar_variants["variants"]], [200])
+
+    def test_new_upload_replaces_derivatives(self):
+        actor = Actor.objects.create(
+            first_name="A", last_name="B", avatar=upload("a.png", (800, 800))
+        )
+        self.generate(actor)
+        old = actor.avatar_variants["variants"][0]["webp"]
+
+        actor.avatar = upload("b.png", (800, 800))
+        actor.save()
+        # the previous manifest no longer matches the file being served
+        self.assertIsNone(actor.avatar_sources)
+        self.generate(actor)
+
+        self.assertFalse(default_storage.exists(old))
+        self.assertIn("b_320w.webp", actor.avatar_sources["webp"])
+
+    def test_unreadable_upload_keeps_original(self):
+        actor = Actor.objects.create(
+            first_name="A",
+            last_name="B",
+            avatar=SimpleUploadedFile("avatar.jpg", b"file"),
+        )
+        with self.assertLogs("theater.images", "WARNING"):
+            self.generate(actor)
+        self.assertEqual(actor.avatar_variants["variants"], [])
+        self.assertIsNone(actor.avatar_sources)
+
+    def test_delete_removes_derivatives(self):
+        actor = Actor.objects.create(
+            first_name="A", last_name="B", avatar=upload("a.png", (400, 400))
+        )
+        self.generate(actor)
+        names = [v["webp"] for v in actor.avatar_variants["variants"]]
+        with (
+            mock.patch("theater.services.rebuild_catalog_snapshot.apply_async"),
+            self.captureOnCommitCallbacks(execute=True),
+        ):
+            actor.delete()
+        self.assertFalse(any(default_storage.exists(n) for n in names))
+
+    def test_backfill_queues_stale_images(self):
+        actor = Actor.objects.create(
+            first_name="A", last_name="B", avatar=upload("a.png", (400, 400))
+        )
+        self.generate(actor)
+        Play.objects.create(title="Default", description="d")
+        Play.objects.create(
+            title="Old", description="d", image=upload("old.png", (400, 300))
+        )
+        # uploaded before derivatives existed: nothing was queued for it
+        OutboxMessage.objects.all().delete()
+
+        out = StringIO()
+        call_command("backfill_image_derivatives", stdout=out)
+        self.assertIn("Queued 1 images.", out.getvalue())
+        self.assertEqual(OutboxMessage.objects.get().kwargs["model"], "theater.play")
+
+    def test_exposed_in_api_and_home_page(self):
+        play = Play.objects.create(
+            title="Hamlet", description="d", image=upload("poster.png", (1200, 800))
+        )
+        self.generate(play)
+        hall = TheatreHall.objects.create(name="Main", rows=2, seats_in_row=2)
+        Performance.objects.create(
+            play=play, theatre_hall=hall, show_time=timezone.now() + timedelta(days=1)
+        )
+
+        api = APIClient()
+        api.force_authenticate(
+            get_user_model().objects.create_user(email="u@example.com", password="p")
+        )
+        data = api.get(reverse("api_v1:play-detail", args=[play.pk])).json()
+        self.assertTrue(data["image_srcset"]["webp"].startswith("http://testserver/"))
+        self.assertIn(" 640w, http://testserver/", data["image_srcset"]["jpeg"])
+
+        html = self.client.get(reverse("theater:home")).content.decode()
+        self.assertIn('type="image/webp"', html)
+        self.assertIn("_320w.jpg 320w", html)
+
+
+class MediaUrlCacheTests(SimpleTestCase):
+    def test_url_built_once_per_name(self):
+        with mock.patch.object(
+            FileSystemStorage, "url", autospec=True, return_value="/media/a.png"
+        ) as build:
+            storage = PruningFileSystemStorage()
+            for _ in range(500):
+                storage.url("plays/default.png")
+            storage.url("plays/other.png")
+        self.assertEqual(build.call_count, 2)
+
+    def test_media_url_change_clears_cache(self):
+        storage = PruningFileSystemStorage()
+        self.assertEqual(storage.url("plays/a.png"), "/media/plays/a.png")
+        with override_settings(MEDIA_URL="https://cdn.example.com/"):
+            self.assertEqual(
+                storage.url("plays/a.png"), "https://cdn.example.com/plays/a.png"
+            )
+        self.assertEqual(storage.url("plays/a.png"), "/media/plays/a.png")
@@ -0,0 +1,191 @@
+from datetime import timedelta
+from types import SimpleNamespace
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import IntegrityError
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from prometheus_client import REGISTRY
+from rest_framework.test import APIClient
+
+from theater import metrics
+from theater.models import Play, TheatreHall, Performance, Reservation, Ticket
+
+AJAX = {"HTTP_X_REQUESTED_WITH": "XMLHttpRequest"}
+# what SQLite reports for uniq_performance_row_seat
+SEAT_TAKEN_ERROR = IntegrityError(
+    "UNIQUE constraint failed: "
+    "theater_ticket.performance_id, theater_ticket.row, theater_ticket.seat"
+)
+
+
+def sample(name: str, **labels) -> float:
+    return REGISTRY.get_sample_value(name, labels) or 0.0
+
+
+class MetricsTests(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email="user@example.com", password="pass12345"
+        )
+        play = Play.objects.create(title="Hamlet", description="Desc")
+        hall = TheatreHall.objects.create(name="Main", rows=2, seats_in_row=3)
+        self.perf = Performance.objects.create(
+            play=play,
+            theatre_hall=hall,
+            show_time=timezone.now() + timedelta(hours=1),
+        )
+        self.reservation = Reservation.objects.create(user=self.user)
+        Ticket.objects.create(
+            performance=self.perf, reservation=self.reservation, row=1, seat=1
+        )
+        cache.clear()
+
+    def test_exposition(self):
+        self.client.get(reverse("api:performance-info", args=[self.perf.pk]), **AJAX)
+        resp = self.client.get(reverse("metrics"))
+
+        self.assertEqual(resp.status_code, 200)
+        self.assertTrue(resp["Content-Type"].startswith("text/plain"))
+        body = resp.content.decode()
+        self.assertIn(
+            'theater_http_request_duration_seconds_count{method="GET",'
+            'status="200",view="api:performance-info"}',
+            body,
+        )
+
+    @override_settings(METRICS_TOKEN="s3cret")
+    def test_token(self):
+        self.assertEqual(self.client.get(reverse("metrics")).status_code, 401)
+        resp = self.client.get(reverse("metrics"), HTTP_AUTHORIZATION="Bearer s3cret")
+        self.assertEqual(resp.status_code, 200)
+
+    @override_settings(METRICS_TOKEN="", METRICS_REQUIRE_TOKEN=True)
+    def test_required_token_missing(self):
+        self.assertEqual(self.client.get(reverse("metrics")).status_code, 404)
+
+    def test_form_bookings(self):
+        self.client.force_login(self.user)
+        url = reverse("theater:home")
+        before = {
+            outcome: sample("theater_bookings_total", channel="form", outcome=outcome)
+            for outcome in ("success", "conflict", "invalid")
+        }
+
+        self.client.post(
+            url, {"performance": self.perf.pk, "row": 1, "seat": 2}, **AJAX
+        )
+        self.client.post(
+            url, {"performance": self.perf.pk, "row": 1, "seat": 1}, **AJAX
+        )
+        self.client.post(
+            url, {"performance": self.perf.pk, "row": 9, "seat": 1}, **AJAX
+        )
+        with mock.patch(
+            "theater.views.Reservation.objects.create",
+            side_effect=SEAT_TAKEN_ERROR,
+        ):
+            resp = self.client.post(
+                url, {"performance": self.perf.pk, "row": 2, "seat": 2}, **AJAX
+            )
+        self.assertEqual(resp.status_code, 409)
+
+        for outcome, delta in (("success", 1), ("conflict", 2), ("invalid", 1)):
+            self.assertEqual(
+                sample("theater_bookings_total", channel="form", outcome=outcome),
+                before[outcome] + delta,
+                outcome,
+            )
+
+    def test_api_bookings(self):
+        api = APIClient()
+        api.force_authenticate(self.user)
+        before = sample("theater_bookings_total", channel="api", outcome="conflict")
+        url = reverse("api_v1:ticket-list")
+        data = {"reservation": self.reservation.pk, "performance": self.perf.pk}
+
+        api.post(url, {**data, "row": 1, "seat": 1}, format="json")
+        self.assertEqual(
+            sample("theater_bookings_total", channel="api", outcome="conflict"),
+            before + 1,
+        )
+
+    def test_cache_counters(self):
+        hits = sample("theater_cache_requests_total", result="hit")
+        misses = sample("theater_cache_requests_total", result="miss")
+        cache.set("a", 1)
+        cache.get("a")
+        cache.get("b")
+        cache.get_many(["a", "b", "c"])
+
+        self.assertEqual(sample("theater_cache_requests_total", result="hit"), hits + 2)
+        self.assertEqual(
+            sample("theater_cache_requests_total", result="miss"), misses + 3
+        )
+
+    def test_pool_usage(self):
+        stats = {
+            "default": {
+                "pool_size": 5,
+                "pool_available": 2,
+                "pool_max": 8,
+                "requests_waiting": 1,
+            }
+        }
+        with mock.patch("theater.metrics.pool_stats", return_value=stats):
+            metrics.record_pool_usage()
+        for state, value in (("in_use", 3), ("available", 2), ("max", 8)):
+            self.assertEqual(
+                sample("theater_db_pool_connections", alias="default", state=state),
+                value,
+            )
+
+
+class CeleryMetricsTests(TestCase):
+    def task(self, **request):
+        return SimpleNamespace(
+            name="theater.tasks.send_ticket_email",
+            request=SimpleNamespace(get=request.get),
+        )
+
+    def test_queue_latency_counts_from_eta(self):
+        eta = timezone.now() - timedelta(seconds=2)
+        headers = {"eta": eta.isoformat()}
+        metrics._stamp_ready_at(headers=headers)
+        self.assertAlmostEqual(headers[metrics.READY_AT_HEADER], eta.timestamp())
+
+        headers = {"eta": None}
+        metrics._stamp_ready_at(headers=headers)
+        self.assertAlmostEqual(
+            headers[metrics.READY_AT_HEADER], timezone.now().timestamp(), delta=1
+        )
+
+    def test_task_lifecycle(self):
+        name = "theater.tasks.send_ticket_email"
+        count = sample(
+            "theater_celery_task_duration_seconds_count", task=name, state="SUCCESS"
+        )
+        latency = sample("theater_celery_task_queue_latency_seconds_sum", task=name)
+        retries = sample("theater_celery_task_retries_total", task=name)
+
+        task = self.task(**{metrics.READY_AT_HEADER: timezone.now().timestamp() - 3})
+        metrics._task_prerun(task_id="t1", task=task)
+        metrics._task_retry(sender=task)
+        metrics._task_postrun(task_id="t1", task=task, state="SUCCESS")
+
+        self.assertEqual(
+            sample(
+                "theater_celery_task_duration_seconds_count", task=name, state="SUCCESS"
+            ),
+            count + 1,
+        )
+        self.assertGreaterEqual(
+            sample("theater_celery_task_queue_latency_seconds_sum", task=name),
+            latency + 3,
+        )
+        self.assertEqual(
+            sample("theater_celery_task_retries_total", task=name), retries + 1
+        )
@@ -1,7 +1,7 @@
 from datetime import timedelta
 
 from django.core.exceptions import ValidationError
-from django.db import IntegrityError
+from django.db import IntegrityError, transaction
 from django.test import TestCase
 from django.utils import timezone
 from django.contrib.auth import get_user_model
@@ -15,6 +15,7 @@ from theater.models import (
     Reservation,
     Ticket,
 )
+from theater.signals import _delete_empty_reservations as cleanup
 
 
 class ModelsBasicsTests(TestCase):
@@ -70,3 +71,85 @@ class ModelsBasicsTests(TestCase):
         res = Reservation.objects.create(user=self.user)
         t = Ticket.objects.create(performance=self.perf, reservation=res, row=1, seat=2)
         self.assertIn("Row 1 Seat 2", str(t))
+
+
+class EmptyReservationCleanupTests(TestCase):
+    """Reservations left without tickets are removed after commit."""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email="user@example.com", password="pass12345"
+        )
+        self.play = Play.objects.create(title="Hamlet", description="Desc")
+        self.hall = TheatreHall.objects.create(name="Main", rows=2, seats_in_row=3)
+        self.perf = Performance.objects.create(
+            play=self.play,
+            theatre_hall=self.hall,
+            show_time=timezone.now() + timedelta(hours=1),
+        )
+
+    def test_single_ticket_delete(self):
+        """Deleting the last ticket removes the reservation, not before."""
+        res = Reservation.objects.create(user=self.user)
+        t1 = Ticket.objects.create(
+            performance=self.perf, reservation=res, row=1, seat=1
+        )
+        t2 = Ticket.objects.create(
+            performance=self.perf, reservation=res, row=1, seat=2
+        )
+
+        with self.captureOnCommitCallbacks(execute=True):
+            t1.delete()
+        self.assertTrue(Reservation.objects.filter(pk=res.pk).exists())
+
+        with self.captureOnCommitCallbacks(execute=True):
+            t2.delete()
+        self.assertFalse(Reservation.objects.filter(pk=res.pk).exists())
+
+    def test_bulk_delete_queues_one_cleanup(self):
+        """A cascade over many tickets runs one set-based cleanup."""
+        other = Performance.objects.create(
+            play=self.play,
+            theatre_hall=self.hall,
+            show_time=timezone.now() + timedelta(days=1),
+        )
+        emptied = [Reservation.objects.create(user=self.user) for _ in range(3)]
+        for i, res in enumerate(emptied):
+            Ticket.objects.create(
+                performance=self.perf, reservation=res, row=1, seat=i + 1
+            )
+        kept = Reservation.objects.create(user=self.user)
+        Ticket.objects.create(performance=self.perf, reservation=kept, row=2, seat=1)
+        Ticket.objects.create(performance=other, reservation=kept, row=2, seat=1)
+
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.perf.delete()
+        cleanups = [cb for cb in callbacks if getattr(cb, "flush", None) is cleanup]
+        self.assertEqual(len(cleanups), 1)
+
+        with self.assertNumQueries(1):
+            cleanups[0]()
+        self.assertEqual(list(Reservation.objects.all()), [kept])
+
+    def test_cleanup_survives_rolled_back_savepoint(self):
+        """A delete after a rolled-back savepoint still gets cleaned up."""
+        res_a = Reservation.objects.create(user=self.user)
+        res_b = Reservation.objects.create(user=self.user)
+        t_a = Ticket.objects.create(
+            performance=self.perf, reservation=res_a, row=1, seat=1
+        )
+        t_b = Ticket.objects.create(
+            performance=self.perf, reservation=res_b, row=1, seat=2
+        )
+
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            with self.assertRaises(RuntimeError), transaction.atomic():
+                t_a.delete()
+                raise RuntimeError
+            t_b.delete()
+        # the rolled-back callback went with its savepoint, and its ids too
+        cleanups = [cb for cb in callbacks if getattr(cb, "flush", None) is cleanup]
+        self.assertEqual([cb.values for cb in cleanups], [{res_b.pk}])
+
+        self.assertTrue(Reservation.objects.filter(pk=res_a.pk).exists())
+        self.assertFalse(Reservation.objects.filter(pk=res_b.pk).exists())
@@ -0,0 +1,100 @@
+import json
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from theater.models import Play, TheatreHall, Performance, Reservation, Ticket
+
+AJAX = {"HTTP_X_REQUESTED_WITH": "XMLHttpRequest"}
+
+
+def timings(response) -> dict:
+    metrics = {}
+    for metric in response["Server-Timing"].split(", "):
+        name, *params = metric.split(";")
+        metrics[name] = dict(p.split("=", 1) for p in params)
+    return metrics
+
+
+class RequestProfilingTests(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email="user@example.com", password="pass12345"
+        )
+        play = Play.objects.create(title="Hamlet", description="Desc")
+        hall = TheatreHall.objects.create(name="Main", rows=2, seats_in_row=3)
+        self.perf = Performance.objects.create(
+            play=play,
+            theatre_hall=hall,
+            show_time=timezone.now() + timedelta(hours=1),
+        )
+        res = Reservation.objects.create(user=self.user)
+        Ticket.objects.create(performance=self.perf, reservation=res, row=1, seat=1)
+        cache.clear()
+
+    def test_disabled_by_default(self):
+        resp = self.client.get(
+            reverse("api:performance-info", args=[self.perf.pk]), **AJAX
+        )
+        self.assertEqual(resp.status_code, 200)
+        self.assertNotIn("Server-Timing", resp)
+
+    @override_settings(REQUEST_PROFILING_SAMPLE_RATE=1.0)
+    def test_performance_info(self):
+        with self.assertLogs("theater.profiling", "INFO") as logs:
+            resp = self.client.get(
+                reverse("api:performance-info", args=[self.perf.pk]), **AJAX
+            )
+
+        self.assertEqual(timings(resp)["db"]["desc"], '"2 queries"')
+        line = json.loads(logs.records[0].getMessage())
+        self.assertEqual(line["view"], "api:performance-info")
+        self.assertEqual(line["db_queries"], 2)
+        self.assertEqual(line["status"], 200)
+
+    @override_settings(REQUEST_PROFILING_SAMPLE_RATE=1.0)
+    def test_drf_viewset_serialize_and_render(self):
+        api = APIClient()
+        api.force_authenticate(self.user)
+        with self.assertLogs("theater.profiling", "INFO") as logs:
+            resp = api.get(reverse("api_v1:performance-list"))
+
+        self.assertEqual(
+            set(timings(resp)), {"total", "db", "cache", "serialize", "render"}
+        )
+        line = json.loads(logs.records[0].getMessage())
+        self.assertEqual(line["view"], "api_v1:performance-list")
+        self.assertGreater(line["serialize_ms"], 0)
+        self.assertGreater(line["render_ms"], 0)
+        # DRF throttling reads its history from the cache
+        self.assertGreater(line["cache_hits"] + line["cache_misses"], 0)
+
+    @override_settings(REQUEST_PROFILING_SAMPLE_RATE=1.0)
+    def test_ajax_partial_counts_cache_hits(self):
+        self.client.force_login(self.user)
+        with self.assertLogs("theater.profiling", "INFO") as logs:
+            self.client.get(reverse("ajax:reservations-my"), **AJAX)
+            self.client.get(reverse("theater:home"))
+            self.client.get(reverse("theater:home"))
+
+        lines = [json.loads(r.getMessage()) for r in logs.records]
+        self.assertEqual(lines[0]["view"], "ajax:reservations-my")
+        self.assertGreater(lines[0]["render_ms"], 0)
+        # the bookable-performances list is computed once, then served cached
+        self.assertLess(lines[2]["db_queries"], lines[1]["db_queries"])
+        self.assertGreater(lines[2]["cache_hits"], lines[1]["cache_hits"])
+
+    @override_settings(REQUEST_PROFILING_SAMPLE_RATE=0.5)
+    def test_sampling(self):
+        url = reverse("api:performance-info", args=[self.perf.pk])
+        with self.assertLogs("theater.profiling", "INFO") as logs:
+            headers = [
+                "Server-Timing" in self.client.get(url, **AJAX) for _ in range(40)
+            ]
+        self.assertTrue(0 < sum(headers) < 40)
+        self.assertEqual(len(logs.records), sum(headers))
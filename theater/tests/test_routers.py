@@ -0,0 +1,74 @@
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, override_settings
+
+from theater.models import Ticket
+from theater.routers import (
+    PRIMARY_PIN_COOKIE,
+    PrimaryReplicaRouter,
+    ReplicaRoutingMiddleware,
+    primary_reads,
+    use_primary,
+)
+
+
+@override_settings(DATABASE_REPLICAS=["replica"])
+class PrimaryReplicaRouterTests(SimpleTestCase):
+    def setUp(self):
+        self.factory = RequestFactory()
+        self.router = PrimaryReplicaRouter()
+        self.seen = []
+
+    def read_alias(self, request):
+        def view(req):
+            self.seen.append(self.router.db_for_read(Ticket))
+            return HttpResponse(status=200)
+
+        return ReplicaRoutingMiddleware(view)(request)
+
+    def test_safe_api_and_ajax_reads_use_replica(self):
+        self.read_alias(self.factory.get("/api/v1/performances/"))
+        self.read_alias(self.factory.get("/ajax/reservations/my/"))
+        self.assertEqual(self.seen, ["replica", "replica"])
+
+    def test_pages_and_unsafe_methods_use_primary(self):
+        self.read_alias(self.factory.get("/"))
+        self.read_alias(self.factory.post("/api/v1/tickets/"))
+        self.assertEqual(self.seen, ["default", "default"])
+
+    def test_outside_request_uses_primary(self):
+        self.assertEqual(self.router.db_for_read(Ticket), "default")
+        self.assertEqual(self.router.db_for_write(Ticket), "default")
+
+    def test_successful_write_pins_client_to_primary(self):
+        response = self.read_alias(self.factory.post("/"))
+        self.assertIn(PRIMARY_PIN_COOKIE, response.cookies)
+
+        request = self.factory.get("/ajax/reservations/my/")
+        request.COOKIES[PRIMARY_PIN_COOKIE] = "1"
+        self.read_alias(request)
+        self.assertEqual(self.seen, ["default", "default"])
+
+    def test_use_primary_overrides_replica_routing(self):
+        @use_primary
+        def seat_check(req):
+            self.seen.append(self.router.db_for_read(Ticket))
+            return HttpResponse()
+
+        ReplicaRoutingMiddleware(seat_check)(
+            self.factory.get("/api/performance-info/1/")
+        )
+        self.assertEqual(self.seen, ["default"])
+
+    def test_primary_reads_context_manager(self):
+        def view(req):
+            with primary_reads():
+                self.seen.append(self.router.db_for_read(Ticket))
+            self.seen.append(self.router.db_for_read(Ticket))
+            return HttpResponse()
+
+        ReplicaRoutingMiddleware(view)(self.factory.get("/api/v1/tickets/"))
+        self.assertEqual(self.seen, ["default", "replica"])
+
+    def test_replicas_are_not_migrated(self):
+        self.assertFalse(self.router.allow_migrate("replica", "theater"))
+        self.assertTrue(self.router.allow_migrate("default", "theater"))
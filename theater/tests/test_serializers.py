@@ -4,12 +4,28 @@ from rest_framework.test import APIRequestFactory
 from django.test import TestCase, override_settings
 from django.core.files.uploadedfile import SimpleUploadedFile
 
-from theater.models import Actor, Genre, Play, TheatreHall, Performance, Reservation
+from rest_framework.renderers import JSONRenderer
+
+from theater.models import (
+    Actor,
+    Genre,
+    Play,
+    TheatreHall,
+    Performance,
+    Reservation,
+    Ticket,
+)
 from theater.api.v1.serializers import (
     PlayWriteSerializer,
     ReservationWriteSerializer,
     TicketWriteSerializer,
     ActorSerializer,
+    GenreSerializer,
+    PerformanceListSerializer,
+    ReservationListSerializer,
+    ReservationRetrieveSerializer,
+    TicketListSerializer,
+    ValuesListSerializer,
 )
 
 User = get_user_model()
@@ -158,3 +174,47 @@ class ActorSerializerTests(TestCase):
         actor = Actor.objects.create(first_name="A", last_name="B", avatar=image)
         ser = ActorSerializer(actor, context={"request": None})
         self.assertTrue(ser.data["avatar_url"].endswith("avatar.jpg"))
+
+
+class ValuesListSerializerTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email="u@example.com", password="pass12345"
+        )
+        hall = TheatreHall.objects.create(name="H1", rows=5, seats_in_row=5)
+        Genre.objects.create(name="Drama")
+        Genre.objects.create(name="Comedy")
+        play = Play.objects.create(title="T", description="d")
+        for day in (1, 2):
+            perf = Performance.objects.create(
+                play=play, theatre_hall=hall, show_time=f"2030-01-0{day}T10:00:00Z"
+            )
+            res = Reservation.objects.create(user=self.user)
+            Ticket.objects.create(performance=perf, reservation=res, row=1, seat=day)
+
+    def test_fast_path_output_is_byte_identical(self):
+        cases = (
+            (GenreSerializer, Genre.objects.order_by("name")),
+            (PerformanceListSerializer, Performance.objects.order_by("show_time")),
+            (ReservationListSerializer, Reservation.objects.order_by("-created_at")),
+            (TicketListSerializer, Ticket.objects.order_by("row", "seat")),
+        )
+        renderer = JSONRenderer()
+        for serializer_class, qs in cases:
+            with self.subTest(serializer=serializer_class.__name__):
+                self.assertIsNotNone(serializer_class(many=True).get_values_plan())
+                fast = serializer_class(qs, many=True).data
+                slow = [serializer_class(obj).data for obj in qs]
+                self.assertEqual(renderer.render(fast), renderer.render(slow))
+
+    def test_fast_path_skips_model_instances(self):
+        with self.assertNumQueries(1):
+            data = TicketListSerializer(Ticket.objects.all(), many=True).data
+        self.assertEqual(len(data), 2)
+
+    def test_non_flat_serializer_has_no_plan(self):
+        self.assertIsNone(
+            ValuesListSerializer(
+                child=ReservationRetrieveSerializer()
+            ).get_values_plan()
+        )
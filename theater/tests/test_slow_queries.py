@@ -0,0 +1,129 @@
+import json
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from theater.models import Play, TheatreHall, Performance, Reservation, Ticket
+from theater.slow_queries import (
+    SlowQueryLog,
+    SlowQueryWrapper,
+    fingerprint,
+    param_shape,
+    seq_scans,
+    slow_query_log,
+)
+
+
+class SlowQueryHelpersTests(SimpleTestCase):
+    def test_fingerprint(self):
+        a = 'SELECT * FROM "theater_ticket" WHERE "id" IN (%s, %s) LIMIT 21'
+        b = 'SELECT  *  FROM "theater_ticket" WHERE "id" IN (%s) LIMIT 5'
+        c = 'SELECT * FROM "theater_ticket_history" WHERE "id" IN (%s)'
+        self.assertEqual(fingerprint(a), fingerprint(b))
+        self.assertNotEqual(fingerprint(a), fingerprint(c))
+        self.assertEqual(
+            fingerprint("SELECT 1 WHERE x = 'a'"), fingerprint("SELECT 2 WHERE x = 'b'")
+        )
+
+    def test_param_shape(self):
+        self.assertEqual(param_shape((1, "x", None)), ["int", "str", "NoneType"])
+        self.assertEqual(param_shape({"a": 1.5}), {"a": "float"})
+        self.assertIsNone(param_shape(None))
+
+    def test_seq_scans(self):
+        tables = ("theater_ticket",)
+        postgres = [
+            "Hash Join  (cost=1.09..2.19 rows=4 width=8)",
+            "  ->  Seq Scan on theater_ticket u0  (cost=0.00..1.04 rows=4 width=8)",
+        ]
+        self.assertEqual(seq_scans(postgres, "", tables), ["theater_ticket"])
+
+        sql = 'SELECT U0."id" FROM "theater_ticket" U0 INNER JOIN "x" ON (1)'
+        self.assertEqual(seq_scans(["SCAN U0"], sql, tables), ["theater_ticket"])
+        self.assertEqual(
+            seq_scans(["SCAN U0 USING COVERING INDEX t_idx"], sql, tables), []
+        )
+        self.assertEqual(
+            seq_scans(["SEARCH theater_ticket USING INDEX t_idx (id=?)"], sql, tables),
+            [],
+        )
+        history = 'SELECT * FROM "theater_ticket_history"'
+        self.assertEqual(
+            seq_scans(["SCAN theater_ticket_history"], history, tables), []
+        )
+
+    def test_dedup(self):
+        log = SlowQueryLog(max_entries=2)
+        first = log.record("a", 10, repeat_seconds=60)
+        self.assertEqual((first.count, first.max_ms), (1, 10))
+        self.assertIsNone(log.record("a", 30, repeat_seconds=60))
+        self.assertIsNone(log.record("a", 20, repeat_seconds=60))
+
+        again = log.record("a", 5, repeat_seconds=0)
+        self.assertEqual((again.count, again.max_ms), (3, 30))
+
+        log.record("b", 1, repeat_seconds=60)
+        log.record("c", 1, repeat_seconds=60)
+        self.assertEqual(list(log.seen), ["b", "c"])
+
+
+class SlowQueryMiddlewareTests(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email="user@example.com", password="pass12345"
+        )
+        play = Play.objects.create(title="Hamlet", description="Desc")
+        hall = TheatreHall.objects.create(name="Main", rows=2, seats_in_row=3)
+        perf = Performance.objects.create(
+            play=play,
+            theatre_hall=hall,
+            show_time=timezone.now() + timedelta(hours=1),
+        )
+        res = Reservation.objects.create(user=self.user)
+        Ticket.objects.create(performance=perf, reservation=res, row=1, seat=1)
+        slow_query_log.clear()
+        self.addCleanup(slow_query_log.clear)
+
+    def test_disabled_by_default(self):
+        api = APIClient()
+        api.force_authenticate(self.user)
+        with self.assertNoLogs("theater.slow_queries"):
+            api.get(reverse("api_v1:ticket-list"))
+
+    @override_settings(SLOW_QUERY_MS=0.000001)
+    def test_logs_with_plan_and_dedups(self):
+        api = APIClient()
+        api.force_authenticate(self.user)
+        with self.assertLogs("theater.slow_queries", "WARNING") as logs:
+            api.get(reverse("api_v1:ticket-list"))
+        lines = [json.loads(r.getMessage()) for r in logs.records]
+
+        tickets = [line for line in lines if '"theater_ticket"' in line["sql"]]
+        self.assertTrue(tickets)
+        line = tickets[0]
+        self.assertEqual(line["source"], "api_v1:ticket-list")
+        self.assertEqual(line["count"], 1)
+        self.assertTrue(line["plan"])
+        self.assertTrue(all(isinstance(t, str) for t in line["params"]))
+
+        # the same statements again are counted, not logged
+        with self.assertNoLogs("theater.slow_queries"):
+            api.get(reverse("api_v1:ticket-list"))
+        self.assertEqual(slow_query_log.seen[line["fingerprint"]].count, 1)
+
+    def test_flags_ticket_seq_scan(self):
+        wrapper = SlowQueryWrapper(0, lambda: "test")
+        with self.assertLogs("theater.slow_queries", "WARNING") as logs:
+            with connection.execute_wrapper(wrapper):
+                # row has no index: the whole table is read
+                list(Ticket.objects.filter(row=1))
+                list(Ticket.objects.filter(performance_id=1))
+        scan, search = (json.loads(r.getMessage()) for r in logs.records)
+        self.assertEqual(scan["source"], "test")
+        self.assertEqual(scan["seq_scan"], ["theater_ticket"])
+        self.assertEqual(search["seq_scan"], [])
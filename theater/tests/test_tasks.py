@@ -0,0 +1,745 @@
+import gzip
+import json
+import tempfile
+from datetime import datetime, timedelta, timezone as dt_timezone
+from io import StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core import mail
+from django.core.cache import cache
+from django.core.files.storage import storages
+from django.core.management import call_command
+from django.db import DatabaseError, connection
+from django.db.models import Max, Min
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import APIClient
+from django.utils import timezone
+
+from theater.models import (
+    Actor,
+    CatalogTombstone,
+    Genre,
+    HistoricalTicket,
+    Play,
+    TheatreHall,
+    Performance,
+    Reservation,
+    Ticket,
+    ReservationEmail,
+    ReminderEmail,
+    OutboxMessage,
+)
+from theater.emails import email_templates, html_layout
+from theater.outbox import publish, relay_batch
+from theater.services import notify_reservation_booked
+from theater.tasks import (
+    dispatch_ticket_emails,
+    move_past_tickets_to_history,
+    purge_past_performances,
+    purge_sent_ticket_emails,
+    relay_outbox,
+    schedule_performance_reminders,
+    send_performance_reminders,
+    send_reservation_email,
+    send_ticket_email,
+)
+from theater.ticket_history import move_tickets_to_history
+from theater_service.celery import QUEUES, WORKER_PROFILES, app
+
+
+class PurgePastPerformancesTests(TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        override = override_settings(
+            STORAGES={
+                "default": {"BACKEND": "django.core.files.storage.FileSystemStorage"},
+                "archive": {
+                    "BACKEND": "django.core.files.storage.FileSystemStorage",
+                    "OPTIONS": {"location": self.tmp.name},
+                },
+            },
+            PURGE_BATCH_SIZE=2,
+        )
+        override.enable()
+        self.addCleanup(override.disable)
+
+        self.user = get_user_model().objects.create_user(
+            email="user@example.com", password="pass12345"
+        )
+        play = Play.objects.create(title="Hamlet", description="Desc")
+        hall = TheatreHall.objects.create(name="Main", rows=5, seats_in_row=5)
+        now = timezone.now()
+        self.past = [
+            Performance.objects.create(
+                play=play, theatre_hall=hall, show_time=now - timedelta(days=i + 1)
+            )
+            for i in range(3)
+        ]
+        self.future = Performance.objects.create(
+            play=play, theatre_hall=hall, show_time=now + timedelta(days=1)
+        )
+
+        # one reservation only for a past show, one spanning past and future
+        self.past_only = Reservation.objects.create(user=self.user)
+        Ticket.objects.create(
+            performance=self.past[0], reservation=self.past_only, row=1, seat=1
+        )
+        Ticket.objects.create(
+            performance=self.past[2], reservation=self.past_only, row=1, seat=2
+        )
+        self.mixed = Reservation.objects.create(user=self.user)
+        Ticket.objects.create(
+            performance=self.past[1], reservation=self.mixed, row=2, seat=1
+        )
+        Ticket.objects.create(
+            performance=self.future, reservation=self.mixed, row=2, seat=1
+        )
+
+    def archived_rows(self) -> list[dict]:
+        storage = storages["archive"]
+        rows = []
+        for name in sorted(storage.listdir("archive/performances")[1]):
+            with storage.open(f"archive/performances/{name}") as fh:
+                rows += [
+                    json.loads(line) for line in gzip.decompress(fh.read()).splitlines()
+                ]
+        return rows
+
+    def test_purges_in_batches_and_archives(self):
+        result = purge_past_performances.apply().get()
+
+        self.assertEqual(result["deleted_performances"], 3)
+        self.assertEqual(result["deleted_tickets"], 3)
+        self.assertEqual(result["deleted_reservations"], 1)
+        self.assertEqual(list(Performance.objects.all()), [self.future])
+        self.assertFalse(Reservation.objects.filter(pk=self.past_only.pk).exists())
+        self.assertEqual(self.mixed.tickets.count(), 1)
+        self.assertEqual(
+            CatalogTombstone.objects.filter(model_name="performance").count(), 3
+        )
+
+        rows = self.archived_rows()
+        by_model = {}
+        for row in rows:
+            by_model.setdefault(row["model"], []).append(row)
+        self.assertEqual(
+            sorted(r["id"] for r in by_model["theater.performance"]),
+            sorted(p.pk for p in self.past),
+        )
+        self.assertEqual(len(by_model["theater.ticket"]), 3)
+        self.assertEqual(
+            [r["id"] for r in by_model["theater.reservation"]], [self.past_only.pk]
+        )
+        self.assertEqual(by_model["theater.performance"][0]["play__title"], "Hamlet")
+
+    def test_retry_overwrites_rolled_back_archive(self):
+        with mock.patch("theater.archive.delete_rows", side_effect=DatabaseError):
+            with self.assertRaises(DatabaseError):
+                purge_past_performances.apply().get()
+        self.assertEqual(Performance.objects.count(), 4)
+
+        purge_past_performances.apply()
+        _, names = storages["archive"].listdir("archive/performances")
+        self.assertEqual(
+            sorted(names),
+            [f"{p.pk:012d}.jsonl.gz" for p in (self.past[0], self.past[2])],
+        )
+        performances = [
+            r["id"] for r in self.archived_rows() if r["model"] == "theater.performance"
+        ]
+        self.assertEqual(sorted(performances), sorted(p.pk for p in self.past))
+
+    def test_requeues_itself_when_batch_budget_runs_out(self):
+        with (
+            override_settings(PURGE_MAX_BATCHES=1),
+            mock.patch.object(purge_past_performances, "apply_async") as requeue,
+        ):
+            result = purge_past_performances.apply().get()
+
+        self.assertEqual(result["deleted_performances"], 2)
+        requeue.assert_called_once_with(kwargs={"cutoff": result["cutoff"]})
+        self.assertEqual(Performance.objects.count(), 2)
+
+        purge_past_performances.apply(kwargs={"cutoff": result["cutoff"]})
+        self.assertEqual(list(Performance.objects.all()), [self.future])
+
+    def test_archives_tickets_moved_to_history(self):
+        move_tickets_to_history(timezone.now(), batch_size=10)
+        self.assertEqual(HistoricalTicket.objects.count(), 3)
+
+        result = purge_past_performances.apply().get()
+
+        self.assertEqual(result["deleted_tickets"], 3)
+        self.assertEqual(result["deleted_reservations"], 1)
+        self.assertFalse(HistoricalTicket.objects.exists())
+        self.assertEqual(self.mixed.tickets.count(), 1)
+        self.assertEqual(
+            len([r for r in self.archived_rows() if r["model"] == "theater.ticket"]),
+            3,
+        )
+
+    def test_nothing_to_purge(self):
+        Performance.objects.exclude(pk=self.future.pk).delete()
+        result = purge_past_performances.apply().get()
+        self.assertEqual(result["deleted_performances"], 0)
+
+
+class TicketHistoryTests(TestCase):
+    def setUp(self):
+        user = get_user_model().objects.create_user(
+            email="user@example.com", password="pass12345"
+        )
+        play = Play.objects.create(title="Hamlet", description="Desc")
+        hall = TheatreHall.objects.create(name="Main", rows=5, seats_in_row=5)
+        now = timezone.now()
+        self.past = Performance.objects.create(
+            play=play, theatre_hall=hall, show_time=now - timedelta(days=1)
+        )
+        self.future = Performance.objects.create(
+            play=play, theatre_hall=hall, show_time=now + timedelta(days=1)
+        )
+        self.reservation = Reservation.objects.create(user=user)
+        self.old = [
+            Ticket.objects.create(
+                performance=self.past, reservation=self.reservation, row=1, seat=i
+            )
+            for i in (1, 2, 3)
+        ]
+        self.upcoming = Ticket.objects.create(
+            performance=self.future, reservation=self.reservation, row=1, seat=1
+        )
+
+    def test_moves_past_tickets_in_batches(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(move_tickets_to_history(timezone.now(), 2), 2)
+            self.assertEqual(move_tickets_to_history(timezone.now(), 2), 1)
+            self.assertEqual(move_tickets_to_history(timezone.now(), 2), 0)
+
+        self.assertEqual(list(Ticket.objects.all()), [self.upcoming])
+        self.assertEqual(
+            list(HistoricalTicket.objects.order_by("id").values_list("id", "seat")),
+            [(t.pk, t.seat) for t in self.old],
+        )
+        # the move is not a cancellation
+        self.assertTrue(Reservation.objects.filter(pk=self.reservation.pk).exists())
+
+    def test_history_keeps_reservation_alive(self):
+        move_tickets_to_history(timezone.now(), 10)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.upcoming.delete()
+        self.assertTrue(Reservation.objects.filter(pk=self.reservation.pk).exists())
+
+    def test_backfill_command(self):
+        out = StringIO()
+        call_command("backfill_ticket_history", batch_size=2, pause=0, stdout=out)
+        self.assertIn("3 tickets moved", out.getvalue())
+        self.assertEqual(HistoricalTicket.objects.count(), 3)
+
+    def test_task_requeues_when_batch_budget_runs_out(self):
+        with (
+            override_settings(PURGE_MAX_BATCHES=1, TICKET_HISTORY_BATCH_SIZE=2),
+            mock.patch.object(move_past_tickets_to_history, "apply_async") as requeue,
+        ):
+            result = move_past_tickets_to_history.apply().get()
+
+        self.assertEqual(result["moved_tickets"], 2)
+        requeue.assert_called_once_with(kwargs={"cutoff": result["cutoff"]})
+
+
+class SeedTheaterTests(TestCase):
+    def seed(self, **options) -> list[tuple]:
+        call_command(
+            "seed_theater",
+            halls=2,
+            actors=5,
+            genres=3,
+            plays=4,
+            performances=6,
+            users=10,
+            days_back=10,
+            days_ahead=10,
+            anchor=timezone.now().replace(year=2030, month=1, day=1),
+            stdout=StringIO(),
+            **options,
+        )
+        first_perf = Performance.objects.order_by("id").first().pk
+        first_res = Reservation.objects.order_by("id").first().pk
+        return sorted(
+            (
+                t.performance_id - first_perf,
+                t.reservation_id - first_res,
+                t.row,
+                t.seat,
+                t.reservation.created_at,
+            )
+            for t in Ticket.objects.select_related("reservation")
+        )
+
+    def wipe(self) -> None:
+        for model in (Ticket, Reservation, Performance, Play, TheatreHall):
+            model.objects.all().delete()
+        get_user_model().objects.all().delete()
+
+    def test_same_seed_same_data(self):
+        first = self.seed(seed=7)
+        self.assertTrue(first)
+        self.wipe()
+        self.assertEqual(self.seed(seed=7), first)
+        self.wipe()
+        self.assertNotEqual(self.seed(seed=8), first)
+
+    def test_tickets_fit_their_halls(self):
+        self.seed()
+        self.assertEqual(Performance.objects.count(), 6)
+        for ticket in Ticket.objects.select_related("performance__theatre_hall"):
+            hall = ticket.performance.theatre_hall
+            self.assertLessEqual(ticket.row, hall.rows)
+            self.assertLessEqual(ticket.seat, hall.seats_in_row)
+            self.assertLess(ticket.reservation.created_at, ticket.performance.show_time)
+
+    def test_keeps_seeded_timestamps(self):
+        self.seed()
+        anchor = datetime(2030, 1, 1, tzinfo=dt_timezone.utc)
+        # booked on the timeline leading up to the anchor, not when seeded
+        created = Reservation.objects.aggregate(
+            first=Min("created_at"), last=Max("created_at")
+        )
+        self.assertLessEqual(created["last"], anchor)
+        self.assertGreater(created["first"], anchor - timedelta(days=365))
+        self.assertLess(created["first"], created["last"])
+        for model in (Genre, Actor, TheatreHall, Play, Performance):
+            self.assertEqual(
+                set(model.objects.values_list("updated_at", flat=True)), {anchor}
+            )
+
+
+class ReservationEmailDispatchTests(TestCase):
+    def setUp(self):
+        hall = TheatreHall.objects.create(name="Main", rows=5, seats_in_row=5)
+        play = Play.objects.create(title="Hamlet", description="d")
+        self.perf = Performance.objects.create(
+            play=play, theatre_hall=hall, show_time=timezone.now() + timedelta(days=1)
+        )
+        self.users = [
+            get_user_model().objects.create_user(
+                email=f"user{i}@example.com", password="pass12345"
+            )
+            for i in range(5)
+        ]
+        self.emails = []
+        for i, user in enumerate(self.users):
+            reservation = Reservation.objects.create(user=user)
+            Ticket.objects.create(
+                performance=self.perf, reservation=reservation, row=1, seat=i + 1
+            )
+            self.emails.append(ReservationEmail.objects.create(reservation=reservation))
+        cache.clear()
+
+    def connections(self):
+        return mock.patch(
+            "theater.emails.get_connection", side_effect=mail.get_connection
+        )
+
+    def test_booking_writes_outbox_without_broker(self):
+        self.client.force_login(self.users[0])
+        with mock.patch("theater.outbox.current_app") as app:
+            for seat in (1, 2):
+                self.client.post(
+                    reverse("theater:home"),
+                    {"performance": self.perf.pk, "row": 2, "seat": seat},
+                    HTTP_X_REQUESTED_WITH="XMLHttpRequest",
+                )
+            app.send_task.assert_not_called()
+
+            self.assertEqual(ReservationEmail.objects.count(), 7)
+            self.assertEqual(OutboxMessage.objects.count(), 2)
+            relay_outbox.apply()
+
+        # one dispatch for the burst, over one producer
+        app.send_task.assert_called_once()
+        self.assertEqual(
+            app.send_task.call_args.args, ("theater.tasks.dispatch_ticket_emails",)
+        )
+        self.assertFalse(OutboxMessage.objects.exists())
+
+    @override_settings(EMAIL_BATCH_SIZE=2)
+    def test_sends_batches_over_one_connection_each(self):
+        with self.connections() as get_connection:
+            result = dispatch_ticket_emails.apply().get()
+
+        self.assertEqual(result, {"claimed": 5, "sent": 5, "failed": 0})
+        self.assertEqual(get_connection.call_count, 3)
+        self.assertEqual(
+            sorted(m.to[0] for m in mail.outbox), sorted(u.email for u in self.users)
+        )
+        self.assertIn("Row 1, Seat 3", mail.outbox[2].body)
+        self.assertFalse(ReservationEmail.objects.pending().exists())
+
+    def test_each_confirmation_is_sent_once(self):
+        dispatch_ticket_emails.apply()
+        dispatch_ticket_emails.apply()
+        send_ticket_email.apply(args=(self.emails[0].reservation_id, 1))
+        send_reservation_email.apply(args=(self.emails[1].reservation_id,))
+
+        self.assertEqual(len(mail.outbox), 5)
+        self.assertEqual(ReservationEmail.objects.count(), 5)
+
+    def test_failed_recipient_is_retried_later(self):
+        real_send = mail.EmailMultiAlternatives.send
+
+        def send(msg, *args, **kwargs):
+            if msg.to == [self.users[1].email]:
+                raise OSError("mailbox unavailable")
+            return real_send(msg, *args, **kwargs)
+
+        with mock.patch.object(mail.EmailMultiAlternatives, "send", send):
+            result = dispatch_ticket_emails.apply().get()
+        self.assertEqual(result, {"claimed": 5, "sent": 4, "failed": 1})
+        failed = ReservationEmail.objects.get(pk=self.emails[1].pk)
+        self.assertEqual(failed.attempts, 1)
+        self.assertIn("mailbox unavailable", failed.last_error)
+
+        dispatch_ticket_emails.apply()
+        self.assertEqual(len(mail.outbox), 5)
+        self.assertEqual(mail.outbox[-1].to, [self.users[1].email])
+
+    def test_claims_are_leased_not_locked(self):
+        ReservationEmail.objects.filter(pk=self.emails[0].pk).update(
+            claimed_until=timezone.now() + timedelta(minutes=5), claimed_by="other"
+        )
+        depth = len(connection.atomic_blocks)
+        real_send = mail.EmailMultiAlternatives.send
+
+        def send(msg, *args, **kwargs):
+            # nothing the dispatcher opened is still open while talking SMTP
+            self.assertEqual(len(connection.atomic_blocks), depth)
+            if msg.to == [self.users[1].email]:
+                notify_reservation_booked(None, self.emails[1].reservation)
+            return real_send(msg, *args, **kwargs)
+
+        with mock.patch.object(mail.EmailMultiAlternatives, "send", send):
+            result = dispatch_ticket_emails.apply().get()
+        self.assertEqual(result, {"claimed": 4, "sent": 4, "failed": 0})
+
+        # another sender's lease is left alone until it runs out
+        leased = ReservationEmail.objects.get(pk=self.emails[0].pk)
+        self.assertEqual(leased.claimed_by, "other")
+        self.assertIsNone(leased.sent_at)
+        # booked again while being sent: stays pending, nothing leased
+        rebooked = ReservationEmail.objects.get(pk=self.emails[1].pk)
+        self.assertIsNone(rebooked.sent_at)
+        self.assertEqual(rebooked.claimed_by, "")
+        self.assertEqual(
+            set(ReservationEmail.objects.claimable().values_list("pk", flat=True)),
+            {self.emails[1].pk},
+        )
+
+    def test_booking_resets_confirmation_in_one_upsert(self):
+        dispatch_ticket_emails.apply()
+        email = self.emails[0]
+        ReservationEmail.objects.filter(pk=email.pk).update(
+            attempts=2,
+            claimed_until=timezone.now() + timedelta(minutes=5),
+            claimed_by="other",
+        )
+        with CaptureQueriesContext(connection) as queries:
+            notify_reservation_booked(None, email.reservation)
+        upserts = [q["sql"] for q in queries if "theater_reservationemail" in q["sql"]]
+        self.assertEqual(len(upserts), 1)
+        self.assertIn("ON CONFLICT", upserts[0])
+
+        email.refresh_from_db()
+        self.assertEqual(
+            (email.sent_at, email.attempts, email.claimed_until, email.claimed_by),
+            (None, 0, None, ""),
+        )
+        self.assertEqual(ReservationEmail.objects.count(), 5)
+
+    def test_one_message_per_reservation(self):
+        ReservationEmail.objects.all().delete()
+        later = Performance.objects.create(
+            play=Play.objects.create(title="Macbeth", description="d"),
+            theatre_hall=self.perf.theatre_hall,
+            show_time=self.perf.show_time + timedelta(days=1),
+        )
+        api = APIClient()
+        api.force_authenticate(self.users[0])
+        reservation = Reservation.objects.create(user=self.users[0])
+        for perf, row, seat in (
+            (later, 1, 1),
+            (self.perf, 3, 2),
+            (self.perf, 3, 1),
+        ):
+            api.post(
+                reverse("api_v1:ticket-list"),
+                {
+                    "reservation": reservation.pk,
+                    "performance": perf.pk,
+                    "row": row,
+                    "seat": seat,
+                },
+                format="json",
+            )
+        self.assertEqual(ReservationEmail.objects.get().reservation, reservation)
+
+        # lease in a savepoint, the leased rows, reservations, all their
+        # tickets, mark sent
+        with self.assertNumQueries(8):
+            dispatch_ticket_emails.apply()
+        self.assertEqual(len(mail.outbox), 1)
+        body = mail.outbox[0].body
+        self.assertIn("Seats: Row 3, Seat 1; Row 3, Seat 2", body)
+        self.assertLess(body.index("Hamlet"), body.index("Macbeth"))
+        self.assertIn("Hamlet", mail.outbox[0].subject)
+
+        # a seat added after the confirmation went out sends it again
+        api.post(
+            reverse("api_v1:ticket-list"),
+            {
+                "reservation": reservation.pk,
+                "performance": later.pk,
+                "row": 1,
+                "seat": 2,
+            },
+            format="json",
+        )
+        dispatch_ticket_emails.apply()
+        self.assertEqual(len(mail.outbox), 2)
+        self.assertIn("Row 1, Seat 1; Row 1, Seat 2", mail.outbox[1].body)
+
+    def test_html_layout_rendered_once(self):
+        self.users[0].first_name = "<Ann>"
+        self.users[0].save()
+        layout = email_templates()["layout.html"]
+        html_layout.cache_clear()
+        with mock.patch.object(layout, "render", wraps=layout.render) as render:
+            dispatch_ticket_emails.apply()
+        self.assertEqual(len(mail.outbox), 5)
+        render.assert_called_once()
+
+        html, _ = mail.outbox[0].alternatives[0]
+        self.assertTrue(html.startswith("<!doctype html>"))
+        self.assertTrue(html.rstrip().endswith("</html>"))
+        self.assertIn("&lt;Ann&gt;", html)
+        show_time = timezone.localtime(self.perf.show_time)
+        self.assertIn(f"{show_time:%Y-%m-%d %H:%M}", html)
+        self.assertIn(f"{show_time:%Y-%m-%d %H:%M}", mail.outbox[0].subject)
+
+    def test_purge_sent(self):
+        dispatch_ticket_emails.apply()
+        ReservationEmail.objects.filter(pk=self.emails[0].pk).update(
+            sent_at=timezone.now() - timedelta(days=settings.EMAIL_RETENTION_DAYS + 1)
+        )
+        self.assertEqual(purge_sent_ticket_emails.apply().get()["deleted"], 1)
+
+
+@override_settings(EMAIL_BACKEND="django.core.mail.backends.locmem.EmailBackend")
+class PerformanceReminderTests(TestCase):
+    def setUp(self):
+        hall = TheatreHall.objects.create(name="Main", rows=5, seats_in_row=5)
+        now = timezone.now()
+        self.soon, self.later = (
+            Performance.objects.create(
+                play=Play.objects.create(title=title, description="d"),
+                theatre_hall=hall,
+                show_time=now + delay,
+            )
+            for title, delay in (
+                ("Hamlet", timedelta(hours=12)),
+                ("Macbeth", timedelta(days=3)),
+            )
+        )
+        self.reservations = [
+            Reservation.objects.create(
+                user=get_user_model().objects.create_user(
+                    email=f"user{i}@example.com", password="pass12345"
+                )
+            )
+            for i in range(3)
+        ]
+        first, second, third = self.reservations
+        for perf, reservation, row, seat in (
+            (self.soon, first, 1, 1),
+            (self.soon, first, 1, 2),
+            (self.later, first, 1, 1),
+            (self.soon, second, 2, 1),
+            (self.later, third, 3, 1),
+        ):
+            Ticket.objects.create(
+                performance=perf, reservation=reservation, row=row, seat=seat
+            )
+
+    def queued(self) -> list[dict]:
+        # the jobs the scan left for the outbox relay, taken off it
+        messages = list(
+            OutboxMessage.objects.filter(
+                task="theater.tasks.send_performance_reminders"
+            ).order_by("id")
+        )
+        OutboxMessage.objects.filter(id__in=[m.id for m in messages]).delete()
+        return [m.kwargs for m in messages]
+
+    @override_settings(EMAIL_BATCH_SIZE=1)
+    def test_fans_out_one_job_per_chunk(self):
+        first, second, _ = self.reservations
+        result = schedule_performance_reminders.apply().get()
+        self.assertEqual(result, {"created": 2, "retried": 0, "chunks": 2})
+        self.assertEqual(
+            self.queued(),
+            [
+                {"performance_id": self.soon.pk, "reservation_ids": [first.pk]},
+                {"performance_id": self.soon.pk, "reservation_ids": [second.pk]},
+            ],
+        )
+        self.assertEqual(
+            set(ReminderEmail.objects.values_list("performance", "reservation")),
+            {(self.soon.pk, first.pk), (self.soon.pk, second.pk)},
+        )
+
+        # a second scan finds nothing left to remind
+        schedule_performance_reminders.apply()
+        self.assertEqual(self.queued(), [])
+
+    def test_rows_roll_back_with_their_job(self):
+        with mock.patch(
+            "theater.outbox.OutboxMessage.objects.create",
+            side_effect=DatabaseError("outbox unavailable"),
+        ):
+            with self.assertRaises(DatabaseError):
+                schedule_performance_reminders.apply().get()
+        # left for the next scan instead of waiting for the stale retry
+        self.assertFalse(ReminderEmail.objects.exists())
+
+    def test_sends_one_reminder_per_reservation(self):
+        schedule_performance_reminders.apply()
+        (job,) = self.queued()
+        send_performance_reminders.apply(kwargs=job)
+
+        self.assertEqual(len(mail.outbox), 2)
+        first = next(m for m in mail.outbox if m.to == ["user0@example.com"])
+        self.assertIn("Reminder: Hamlet", first.subject)
+        self.assertIn("Seats: Row 1, Seat 1; Row 1, Seat 2", first.body)
+        self.assertNotIn("Macbeth", first.body)
+        self.assertFalse(ReminderEmail.objects.pending().exists())
+        self.assertFalse(ReminderEmail.objects.exclude(claimed_by="").exists())
+
+        # the same chunk queued twice sends nothing the second time
+        send_performance_reminders.apply(kwargs=job)
+        self.assertEqual(len(mail.outbox), 2)
+
+    def test_skips_reminders_leased_by_another_job(self):
+        schedule_performance_reminders.apply()
+        (job,) = self.queued()
+        ReminderEmail.objects.filter(reservation=self.reservations[0]).update(
+            claimed_until=timezone.now() + timedelta(minutes=5), claimed_by="other"
+        )
+
+        result = send_performance_reminders.apply(kwargs=job).get()
+        self.assertEqual(result, {"claimed": 1, "sent": 1})
+        self.assertEqual([m.to for m in mail.outbox], [["user1@example.com"]])
+
+    def test_requeues_stale_pending(self):
+        schedule_performance_reminders.apply()
+        self.queued()
+        ReminderEmail.objects.update(
+            created_at=timezone.now()
+            - timedelta(seconds=settings.REMINDER_RETRY_AFTER + 1)
+        )
+
+        result = schedule_performance_reminders.apply().get()
+        self.assertEqual(result, {"created": 0, "retried": 2, "chunks": 1})
+        self.assertEqual(
+            self.queued(),
+            [
+                {
+                    "performance_id": self.soon.pk,
+                    "reservation_ids": [r.pk for r in self.reservations[:2]],
+                }
+            ],
+        )
+
+    def test_gives_up_after_show_start(self):
+        schedule_performance_reminders.apply()
+        (job,) = self.queued()
+        Performance.objects.filter(pk=self.soon.pk).update(
+            show_time=timezone.now() - timedelta(minutes=1)
+        )
+
+        send_performance_reminders.apply(kwargs=job)
+        self.assertEqual(mail.outbox, [])
+        self.assertEqual(
+            set(ReminderEmail.objects.values_list("last_error", flat=True)),
+            {"performance started"},
+        )
+        self.assertFalse(ReminderEmail.objects.pending().exists())
+
+
+class OutboxRelayTests(TestCase):
+    def setUp(self):
+        patcher = mock.patch("theater.outbox.current_app")
+        self.app = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_publishes_each_dedup_key_once(self):
+        publish("theater.tasks.dispatch_ticket_emails", dedup_key="dispatch")
+        publish("theater.tasks.dispatch_ticket_emails", dedup_key="dispatch")
+        publish("theater.tasks.send_reservation_email", {"reservation_id": 1})
+        publish("theater.tasks.send_reservation_email", {"reservation_id": 2})
+
+        self.assertEqual(relay_batch(10), 4)
+
+        self.app.producer_or_acquire.assert_called_once()
+        sent = [(c.args[0], c.kwargs["kwargs"]) for c in self.app.send_task.mock_calls]
+        self.assertEqual(
+            sent,
+            [
+                ("theater.tasks.dispatch_ticket_emails", {}),
+                ("theater.tasks.send_reservation_email", {"reservation_id": 1}),
+                ("theater.tasks.send_reservation_email", {"reservation_id": 2}),
+            ],
+        )
+        self.assertFalse(OutboxMessage.objects.exists())
+
+    def test_failed_publish_keeps_rows(self):
+        publish("theater.tasks.dispatch_ticket_emails")
+        self.app.send_task.side_effect = ConnectionError("broker down")
+
+        with self.assertRaises(ConnectionError):
+            relay_batch(10)
+        self.assertEqual(OutboxMessage.objects.count(), 1)
+
+    def test_command_drains_outbox(self):
+        for i in range(5):
+            publish("theater.tasks.send_reservation_email", {"reservation_id": i})
+        out = StringIO()
+
+        call_command("run_outbox_relay", batch_size=2, once=True, stdout=out)
+
+        self.assertIn("Relayed 5 messages.", out.getvalue())
+        self.assertEqual(self.app.send_task.call_count, 5)
+        self.assertFalse(OutboxMessage.objects.exists())
+
+
+class TaskRoutingTests(SimpleTestCase):
+    def route(self, name):
+        return app.amqp.router.route({}, name)["queue"].name
+
+    def test_routes(self):
+        self.assertEqual(
+            self.route("theater.tasks.dispatch_ticket_emails"), "notifications"
+        )
+        self.assertEqual(
+            self.route("theater.tasks.purge_past_performances"), "maintenance"
+        )
+        self.assertEqual(self.route("theater.tasks.relay_outbox"), "celery")
+
+    def test_every_queue_has_a_profile(self):
+        self.assertEqual(set(WORKER_PROFILES), set(QUEUES))
+        for name in app.tasks:
+            if name.startswith("theater."):
+                self.assertIn(self.route(name), QUEUES)
@@ -1,9 +1,24 @@
+import os
+from datetime import datetime, timedelta
+from unittest import mock
+
 from django.contrib.auth import get_user_model
+from django.db import IntegrityError, connections
+from django.db.utils import ConnectionHandler
+from django.utils import timezone
 from django.urls import reverse
-from django.test import TestCase
+from django.test import SimpleTestCase, TestCase
 from rest_framework import status
 from rest_framework.test import APIClient
 
+from theater.api.v1.query_plans import serializer_relations
+from theater.api.v1.views import (
+    PlayViewSet,
+    PerformanceViewSet,
+    ReservationViewSet,
+    TicketViewSet,
+)
+from theater.messages import MSG
 from theater.models import (
     Actor,
     Genre,
@@ -13,6 +28,8 @@ from theater.models import (
     Reservation,
     Ticket,
 )
+from theater_service.celery import WORKER_PROFILES
+from theater_service.settings.base import postgres_connection_settings
 
 User = get_user_model()
 
@@ -23,6 +40,8 @@ PLAY_LIST = reverse("api_v1:play-list")
 PERFORMANCE_LIST = reverse("api_v1:performance-list")
 RESERVATION_LIST = reverse("api_v1:reservation-list")
 TICKET_LIST = reverse("api_v1:ticket-list")
+SYNC_URL = reverse("api_v1:sync")
+DB_POOL_URL = reverse("api_v1:db-pool")
 
 
 def detail_url(name, pk):
@@ -211,6 +230,47 @@ class TheaterApiAuthTests(TestCase):
         )
         self.assertEqual(r3.status_code, status.HTTP_400_BAD_REQUEST)
 
+    def test_ticket_create_taken_seat_conflicts(self):
+        h = TheatreHall.objects.create(name="H1", rows=5, seats_in_row=5)
+        p = Play.objects.create(title="T", description="d")
+        perf = Performance.objects.create(
+            play=p, theatre_hall=h, show_time="2030-01-01T10:00:00Z"
+        )
+        my_res = Reservation.objects.create(user=self.user)
+        payload = {
+            "reservation": my_res.id,
+            "performance": perf.id,
+            "row": 1,
+            "seat": 1,
+        }
+        r1 = self.client.post(TICKET_LIST, payload, format="json")
+        self.assertEqual(r1.status_code, status.HTTP_201_CREATED)
+        r2 = self.client.post(TICKET_LIST, payload, format="json")
+        self.assertEqual(r2.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(r2.data["detail"], MSG.SEAT_TAKEN)
+        self.assertEqual(Ticket.objects.filter(performance=perf).count(), 1)
+
+    def test_ticket_create_other_integrity_error_propagates(self):
+        h = TheatreHall.objects.create(name="H1", rows=5, seats_in_row=5)
+        p = Play.objects.create(title="T", description="d")
+        perf = Performance.objects.create(
+            play=p, theatre_hall=h, show_time="2030-01-01T10:00:00Z"
+        )
+        my_res = Reservation.objects.create(user=self.user)
+        payload = {
+            "reservation": my_res.id,
+            "performance": perf.id,
+            "row": 1,
+            "seat": 1,
+        }
+        with mock.patch(
+            "theater.api.v1.views.notify_reservation_booked",
+            side_effect=IntegrityError("NOT NULL constraint failed"),
+        ):
+            with self.assertRaises(IntegrityError):
+                self.client.post(TICKET_LIST, payload, format="json")
+        self.assertFalse(Ticket.objects.filter(performance=perf).exists())
+
 
 class TheaterApiAdminTests(TestCase):
     def setUp(self):
@@ -259,3 +319,188 @@ class TheaterApiAdminTests(TestCase):
         self.assertEqual(res.status_code, status.HTTP_200_OK)
         ids = [item["id"] for item in results(res)]
         self.assertCountEqual(ids, [r1.id, r2.id])
+
+
+class QueryPlanTests(TestCase):
+    """Per-action query plans match their serializers and keep query counts flat."""
+
+    viewsets = (PlayViewSet, PerformanceViewSet, ReservationViewSet, TicketViewSet)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.admin = User.objects.create_user(
+            email="admin@example.com", password="pass12345", is_staff=True
+        )
+        self.client.force_authenticate(self.admin)
+
+        hall = TheatreHall.objects.create(name="H1", rows=5, seats_in_row=5)
+        genre = Genre.objects.create(name="Drama")
+        actor = Actor.objects.create(first_name="A", last_name="One")
+        for i in range(3):
+            play = Play.objects.create(title=f"P{i}", description="d")
+            play.actors.add(actor)
+            play.genres.add(genre)
+            perf = Performance.objects.create(
+                play=play, theatre_hall=hall, show_time=f"2030-01-0{i + 1}T10:00:00Z"
+            )
+            res = Reservation.objects.create(user=self.admin)
+            Ticket.objects.create(reservation=res, performance=perf, row=1, seat=1)
+
+        self.play = play
+        self.perf = perf
+        self.res = res
+        self.ticket = Ticket.objects.latest("id")
+
+    def test_plans_match_serializers(self):
+        for viewset in self.viewsets:
+            for action in ("list", "retrieve"):
+                view = viewset(action=action)
+                select, prefetch = serializer_relations(view.get_serializer_class()())
+                plan = view.get_query_plan()
+                planned_prefetch = {
+                    getattr(p, "prefetch_to", p) for p in plan.prefetch_related
+                }
+                with self.subTest(viewset=viewset.__name__, action=action):
+                    self.assertSetEqual(set(plan.select_related), select)
+                    self.assertSetEqual(planned_prefetch, prefetch)
+
+    def assert_queries(self, url, expected):
+        with self.assertNumQueries(expected):
+            res = self.client.get(url)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_play_query_counts(self):
+        self.assert_queries(PLAY_LIST, 3)
+        self.assert_queries(detail_url("play", self.play.id), 3)
+
+    def test_performance_query_counts(self):
+        self.assert_queries(PERFORMANCE_LIST, 1)
+        self.assert_queries(detail_url("performance", self.perf.id), 3)
+
+    def test_reservation_query_counts(self):
+        self.assert_queries(RESERVATION_LIST, 1)
+        self.assert_queries(detail_url("reservation", self.res.id), 1)
+
+    def test_ticket_query_counts(self):
+        self.assert_queries(TICKET_LIST, 1)
+        self.assert_queries(detail_url("ticket", self.ticket.id), 3)
+
+
+class CatalogSyncTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(
+            email="u@example.com", password="pass12345"
+        )
+        self.client.force_authenticate(self.user)
+        self.hall = TheatreHall.objects.create(name="H1", rows=5, seats_in_row=5)
+        self.actor = Actor.objects.create(first_name="A", last_name="One")
+        self.play = Play.objects.create(title="T", description="d")
+        self.perf = Performance.objects.create(
+            play=self.play, theatre_hall=self.hall, show_time="2030-01-01T10:00:00Z"
+        )
+
+    def sync(self, since=None):
+        params = {"since": since} if since else {}
+        res = self.client.get(SYNC_URL, params)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return res.data
+
+    def backdate(self):
+        """Age every catalog row and return a cursor issued after that."""
+        old = timezone.now() - timedelta(minutes=5)
+        for model in (Actor, Genre, Play, TheatreHall, Performance):
+            model.objects.update(updated_at=old)
+        return (old + timedelta(minutes=1)).isoformat()
+
+    def test_initial_sync_returns_full_catalog(self):
+        data = self.sync()
+        self.assertTrue(data["reset"])
+        self.assertEqual([p["id"] for p in data["plays"]], [self.play.id])
+        self.assertEqual([p["id"] for p in data["performances"]], [self.perf.id])
+        self.assertIn("cursor", data)
+
+    def test_incremental_sync_returns_only_changes(self):
+        cursor = self.backdate()
+        self.assertEqual(self.sync(cursor)["plays"], [])
+
+        other = Play.objects.create(title="New", description="d")
+        self.hall.name = "Renamed"
+        self.hall.save()
+        data = self.sync(cursor)
+        self.assertFalse(data["reset"])
+        self.assertEqual([p["id"] for p in data["plays"]], [other.id])
+        self.assertEqual([h["name"] for h in data["halls"]], ["Renamed"])
+        self.assertEqual(data["performances"], [])
+
+    def test_m2m_change_touches_play(self):
+        cursor = self.backdate()
+        self.actor.plays.add(self.play)
+        data = self.sync(cursor)
+        self.assertEqual(data["plays"][0]["actors"], [self.actor.id])
+
+    def test_deletes_are_reported_as_tombstones(self):
+        cursor = self.backdate()
+        play_id, perf_id = self.play.id, self.perf.id
+        self.play.delete()
+        data = self.sync(cursor)
+        self.assertEqual(data["deleted"]["plays"], [play_id])
+        self.assertEqual(data["deleted"]["performances"], [perf_id])
+
+    def test_invalid_cursor(self):
+        res = self.client.get(SYNC_URL, {"since": "yesterday"})
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_cursor_without_offset(self):
+        cursor = self.backdate()
+        naive = timezone.make_naive(datetime.fromisoformat(cursor))
+        data = self.sync(naive.isoformat())
+        self.assertFalse(data["reset"])
+        self.assertEqual(data["plays"], [])
+
+
+class DatabasePoolStatsTests(TestCase):
+    def test_staff_only(self):
+        client = APIClient()
+        user = User.objects.create_user(email="u@example.com", password="pass12345")
+        client.force_authenticate(user)
+        self.assertEqual(client.get(DB_POOL_URL).status_code, status.HTTP_403_FORBIDDEN)
+
+        user.is_staff = True
+        user.save()
+        res = client.get(DB_POOL_URL)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        # one entry per pooled alias; none when the tests run on SQLite
+        pooled = {a for a in connections if getattr(connections[a], "pool", None)}
+        self.assertEqual(set(res.data), pooled)
+
+
+class DatabasePoolSettingsTests(SimpleTestCase):
+    def test_pool_built_from_settings(self):
+        env = {"DB_POOL": "true", "WEB_CONCURRENCY": "2", "GUNICORN_THREADS": "4"}
+        with mock.patch.dict(os.environ, env):
+            options = postgres_connection_settings(sslmode="require")
+        # pools are shared per alias, so not "default": a pooled test run
+        # already has one there
+        handler = ConnectionHandler(
+            {
+                "default": {},
+                "pooled": {
+                    "ENGINE": "django.db.backends.postgresql",
+                    "NAME": "theater",
+                    **options,
+                },
+            }
+        )
+        conn = handler["pooled"]
+        self.addCleanup(conn.close_pool)
+        # the pool is created closed, so nothing connects here
+        self.assertEqual((conn.pool.min_size, conn.pool.max_size), (1, 4))
+
+    def test_worker_pool_size_override(self):
+        # the notifications worker's threads each need a connection
+        threads = WORKER_PROFILES["notifications"]["worker_concurrency"]
+        env = {"DB_POOL": "true", "GUNICORN_THREADS": "4"}
+        with mock.patch.dict(os.environ, {**env, "DB_POOL_MAX_SIZE": str(threads)}):
+            options = postgres_connection_settings()
+        self.assertEqual(options["OPTIONS"]["pool"]["max_size"], threads)
@@ -1,8 +1,13 @@
 from datetime import timedelta
 import json
+import tempfile
+from unittest import mock
 
 from django.contrib.auth import get_user_model
 from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.core.files.storage import storages
+from django.db import IntegrityError
 from django.http import Http404
 from django.test import TestCase, RequestFactory, override_settings
 from django.urls import reverse
@@ -10,13 +15,17 @@ from django.utils import timezone
 
 from theater.models import (
     Actor,
+    CatalogSnapshot,
     Play,
     Genre,
+    HistoricalTicket,
     TheatreHall,
     Performance,
     Reservation,
     Ticket,
 )
+from theater.signals import _refresh_bookable
+from theater.ticket_history import move_tickets_to_history
 from theater.views import (
     performance_info,
     ActorsListView,
@@ -25,11 +34,15 @@ from theater.views import (
     HomePageListView,
     custom_page_not_found_view,
 )
+from theater.catalog import build_catalog_snapshot, current_catalog_snapshot
+from theater.forms import TicketForm
 from theater.messages import MSG
 
 
 class ViewsSetupMixin(TestCase):
     def setUp(self):
+        # the bookable list is only invalidated on commit, which never comes
+        cache.clear()
         self.factory = RequestFactory()
         self.user = get_user_model().objects.create_user(
             email="user@example.com", password="pass12345"
@@ -128,6 +141,80 @@ class MyReservationsPartialViewTests(ViewsSetupMixin):
         response = MyReservationsPartialView.as_view()(request)
         self.assertEqual(response.status_code, 200)
 
+    def test_upcoming_only_by_default(self):
+        past = Performance.objects.create(
+            play=self.play,
+            theatre_hall=self.hall,
+            show_time=timezone.now() - timedelta(days=1),
+        )
+        res = Reservation.objects.create(user=self.user)
+        upcoming = Ticket.objects.create(
+            performance=self.perf1, reservation=res, row=1, seat=1
+        )
+        old = Ticket.objects.create(performance=past, reservation=res, row=1, seat=1)
+
+        request = self.factory.get("/includes/reservations/")
+        request.user = self.user
+        response = MyReservationsPartialView.as_view()(request)
+        self.assertEqual(response.context_data["my_tickets"], [upcoming])
+
+        request = self.factory.get("/includes/reservations/", {"scope": "all"})
+        request.user = self.user
+        response = MyReservationsPartialView.as_view()(request)
+        self.assertEqual(response.context_data["my_tickets"], [old, upcoming])
+
+    def test_scope_all_includes_ticket_history(self):
+        past = Performance.objects.create(
+            play=self.play,
+            theatre_hall=self.hall,
+            show_time=timezone.now() - timedelta(days=1),
+        )
+        res = Reservation.objects.create(user=self.user)
+        upcoming = Ticket.objects.create(
+            performance=self.perf1, reservation=res, row=1, seat=1
+        )
+        old = Ticket.objects.create(performance=past, reservation=res, row=1, seat=1)
+        move_tickets_to_history(timezone.now(), batch_size=10)
+
+        request = self.factory.get("/includes/reservations/", {"scope": "all"})
+        request.user = self.user
+        response = MyReservationsPartialView.as_view()(request)
+        rows = response.context_data["my_tickets"]
+        self.assertEqual([t.pk for t in rows], [old.pk, upcoming.pk])
+        self.assertIsInstance(rows[0], HistoricalTicket)
+        self.assertContains(response, "Hamlet", count=2)
+
+    def test_keyset_pagination(self):
+        tickets = []
+        for seat in (1, 2, 3):
+            res = Reservation.objects.create(user=self.user)
+            tickets.append(
+                Ticket.objects.create(
+                    performance=self.perf1, reservation=res, row=1, seat=seat
+                )
+            )
+        view = MyReservationsPartialView.as_view(history_page_size=2)
+
+        request = self.factory.get("/includes/reservations/")
+        request.user = self.user
+        response = view(request)
+        self.assertEqual(response.context_data["my_tickets"], tickets[:0:-1])
+        next_url = response.context_data["my_tickets_next_url"]
+        self.assertIsNotNone(next_url)
+
+        request = self.factory.get(next_url)
+        request.user = self.user
+        response = view(request)
+        self.assertEqual(response.context_data["my_tickets"], [tickets[0]])
+        self.assertEqual(response.context_data["my_tickets_offset"], 2)
+        self.assertIsNone(response.context_data["my_tickets_next_url"])
+
+    def test_invalid_cursor_returns_404(self):
+        request = self.factory.get("/includes/reservations/", {"cursor": "bogus"})
+        request.user = self.user
+        with self.assertRaises(Http404):
+            MyReservationsPartialView.as_view()(request)
+
 
 class HomePageListViewTests(ViewsSetupMixin):
     def test_home_get_for_anonymous(self):
@@ -185,6 +272,22 @@ class HomePageListViewTests(ViewsSetupMixin):
             )
         self.assertIn(MSG.SEAT_TAKEN, msg)
 
+    def test_home_post_other_integrity_error_propagates(self):
+        self.client.login(username="user@example.com", password="pass12345")
+        url = reverse("theater:home")
+        headers = {"HTTP_X_REQUESTED_WITH": "XMLHttpRequest"}
+        with mock.patch(
+            "theater.views.notify_reservation_booked",
+            side_effect=IntegrityError("NOT NULL constraint failed"),
+        ):
+            with self.assertRaises(IntegrityError):
+                self.client.post(
+                    url,
+                    data={"performance": self.perf1.pk, "row": 1, "seat": 1},
+                    **headers,
+                )
+        self.assertFalse(Reservation.objects.filter(user=self.user).exists())
+
     def test_home_get_form_sets_filtered_performance_queryset(self):
         request = self.factory.get(reverse("theater:home"))
         request.user = self.user
@@ -202,6 +305,154 @@ class HomePageListViewTests(ViewsSetupMixin):
             self.assertLess(p.reserved, p.capacity)
 
 
+class TicketFormCacheTests(ViewsSetupMixin):
+    def setUp(self):
+        # the list is refreshed after commit: run what the fixtures queued
+        with self.captureOnCommitCallbacks() as callbacks:
+            super().setUp()
+        for callback in callbacks:
+            if getattr(callback, "flush", None) is _refresh_bookable:
+                callback()
+
+    def test_unbound_form_renders_from_cache(self):
+        str(TicketForm()["performance"])
+        with self.assertNumQueries(0):
+            html = str(TicketForm()["performance"])
+        self.assertIn(f'value="{self.perf1.pk}"', html)
+
+    def test_bound_form_queries_are_constant(self):
+        str(TicketForm()["performance"])
+        data = {"performance": str(self.perf1.pk), "row": "1", "seat": "1"}
+        # performance lookup, model FK validation, unique constraint check
+        with self.assertNumQueries(3):
+            form = TicketForm(data=data)
+            self.assertTrue(form.is_valid(), form.errors)
+        self.assertEqual(form.fields["row"].choices, [(1, "1"), (2, "2")])
+
+    def test_sold_out_performance_is_dropped(self):
+        res = Reservation.objects.create(user=self.user)
+        for r in (1, 2):
+            for s in (1, 2, 3):
+                self.assertIn(self.perf1.pk, [p.pk for p in self.bookable()])
+                with self.captureOnCommitCallbacks(execute=True):
+                    Ticket.objects.create(
+                        performance=self.perf1, reservation=res, row=r, seat=s
+                    )
+        self.assertNotIn(self.perf1.pk, [p.pk for p in self.bookable()])
+
+        form = TicketForm(
+            data={"performance": str(self.perf1.pk), "row": "1", "seat": "1"}
+        )
+        self.assertFalse(form.is_valid())
+        self.assertIn("performance", form.errors)
+
+    def test_invalidated_once_per_transaction(self):
+        self.bookable()
+        res = Reservation.objects.create(user=self.user)
+        with mock.patch("theater.signals.invalidate_bookable_performances") as bump:
+            # seats left: no count per ticket, one at commit, list kept
+            with self.captureOnCommitCallbacks(execute=True):
+                with self.assertNumQueries(2):
+                    tickets = [
+                        Ticket.objects.create(
+                            performance=self.perf1, reservation=res, row=1, seat=s
+                        )
+                        for s in (1, 2)
+                    ]
+            bump.assert_not_called()
+
+            with self.captureOnCommitCallbacks(execute=True):
+                for ticket in tickets:
+                    ticket.delete()
+            bump.assert_called_once()
+
+    def bookable(self):
+        return [
+            Performance(pk=pk)
+            for pk, _ in TicketForm().fields["performance"].choices
+            if pk != ""
+        ]
+
+
+class CatalogSnapshotTests(ViewsSetupMixin):
+    def setUp(self):
+        super().setUp()
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        storages = {
+            "default": {"BACKEND": "django.core.files.storage.FileSystemStorage"},
+            "staticfiles": {
+                "BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage"
+            },
+            "catalog": {
+                "BACKEND": "django.core.files.storage.FileSystemStorage",
+                "OPTIONS": {"location": self.tmp.name},
+            },
+        }
+        override = override_settings(STORAGES=storages)
+        override.enable()
+        self.addCleanup(override.disable)
+        cache.clear()
+
+    def test_redirects_to_content_hashed_file(self):
+        snapshot = build_catalog_snapshot()
+        with self.assertNumQueries(1):
+            resp = self.client.get(reverse("api:catalog"))
+        self.assertEqual(resp.status_code, 302)
+        self.assertIn("max-age=60", resp["Cache-Control"])
+        self.assertEqual(resp.url, storages["catalog"].url(snapshot["name"]))
+
+        with storages["catalog"].open(snapshot["name"]) as fh:
+            data = json.loads(fh.read())
+        self.assertEqual(
+            [p["id"] for p in data["performances"]], [self.perf1.pk, self.perf2.pk]
+        )
+        self.assertEqual(data["performances"][0]["play_detail"]["title"], "Hamlet")
+
+        file_resp = self.client.get(
+            reverse("api:catalog-file", args=[snapshot["digest"]])
+        )
+        self.assertEqual(file_resp.url, resp.url)
+        self.assertIn("max-age=31536000", file_resp["Cache-Control"])
+        self.assertIn("immutable", file_resp["Cache-Control"])
+
+    def test_never_built_inside_a_request(self):
+        with mock.patch("theater.views.schedule_catalog_rebuild") as schedule:
+            resp = self.client.get(reverse("api:catalog"))
+        self.assertEqual(resp.status_code, 503)
+        self.assertIn("Retry-After", resp)
+        schedule.assert_called_once_with()
+        self.assertFalse(CatalogSnapshot.objects.exists())
+
+    def test_digest_changes_only_with_content(self):
+        first = build_catalog_snapshot()
+        self.assertEqual(build_catalog_snapshot()["digest"], first["digest"])
+
+        self.perf2.delete()
+        second = build_catalog_snapshot()
+        self.assertNotEqual(second["digest"], first["digest"])
+        self.assertEqual(second["previous"], first["digest"])
+        # every process reads the pointer the rebuild wrote
+        self.assertEqual(current_catalog_snapshot().digest, second["digest"])
+
+    def test_superseded_file_kept_for_grace_period(self):
+        first = build_catalog_snapshot()
+        self.perf2.delete()
+        build_catalog_snapshot()
+        self.assertTrue(storages["catalog"].exists(first["name"]))
+
+        CatalogSnapshot.objects.filter(digest=first["digest"]).update(
+            superseded_at=timezone.now() - timedelta(hours=2)
+        )
+        build_catalog_snapshot()
+        self.assertFalse(storages["catalog"].exists(first["name"]))
+        self.assertFalse(CatalogSnapshot.objects.filter(digest=first["digest"]))
+
+    def test_unknown_digest_returns_404(self):
+        resp = self.client.get(reverse("api:catalog-file", args=["deadbeef"]))
+        self.assertEqual(resp.status_code, 404)
+
+
 class Custom404ViewTests(TestCase):
     @override_settings(DEBUG=False)
     def test_custom_404_view_returns_404(self):
@@ -0,0 +1,33 @@
+from datetime import datetime
+
+from django.db import transaction
+
+from theater.db import delete_rows
+from theater.models import HistoricalTicket, Ticket
+
+
+def move_tickets_to_history(cutoff: datetime, batch_size: int) -> int:
+    """
+    Move up to batch_size tickets of performances that started before cutoff
+    from Ticket to HistoricalTicket in one short transaction. Returns how
+    many were moved; 0 once the backlog is drained.
+    """
+    with transaction.atomic():
+        rows = list(
+            Ticket.objects.select_for_update(skip_locked=True, of=("self",))
+            .filter(performance__show_time__lt=cutoff)
+            .order_by("id")
+            .values("id", "row", "seat", "performance_id", "reservation_id")[
+                :batch_size
+            ]
+        )
+        if not rows:
+            return 0
+
+        HistoricalTicket.objects.bulk_create(
+            [HistoricalTicket(**row) for row in rows], ignore_conflicts=True
+        )
+        # the reservations keep their tickets, just in the other table, so the
+        # per-ticket post_delete cleanup must not run
+        delete_rows(Ticket.objects.filter(id__in=[row["id"] for row in rows]))
+    return len(rows)
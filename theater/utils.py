@@ -1,3 +1,4 @@
+from datetime import datetime
 from functools import wraps
 from django.http import Http404
 
@@ -10,3 +11,15 @@ def ajax_only(view_func):
         return view_func(request, *args, **kwargs)
 
     return _wrapped
+
+
+def encode_cursor(created_at: datetime, pk: int) -> str:
+    return f"{created_at.isoformat()}_{pk}"
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, int]:
+    try:
+        raw_ts, raw_pk = cursor.rsplit("_", 1)
+        return datetime.fromisoformat(raw_ts), int(raw_pk)
+    except ValueError:
+        raise Http404("Invalid cursor.")
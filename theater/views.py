@@ -1,10 +1,15 @@
+from urllib.parse import urlencode
+
+from django.urls import reverse
 from django.views import generic
 from django.utils import timezone
-from django.db.models import QuerySet
+from django.db.models import Q, QuerySet
 from django.views.generic.edit import FormMixin
 from django.db import IntegrityError, transaction
 from django.views.decorators.http import require_GET
-from django.shortcuts import get_object_or_404, render
+from django.shortcuts import get_object_or_404, redirect, render
+from django.core.files.storage import storages
+from django.utils.cache import patch_cache_control
 from django.contrib.auth.views import redirect_to_login
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.http import JsonResponse, HttpRequest, HttpResponse, Http404
@@ -19,15 +24,31 @@ from django.db.models import (
     Value,
 )
 
-from theater.services import notify_ticket_booked
-from theater.utils import ajax_only
+from theater.catalog import (
+    CATALOG_REBUILD_DELAY,
+    CATALOG_STORAGE,
+    current_catalog_snapshot,
+)
+from theater.db import violates_constraint
+from theater.metrics import record_booking
+from theater.services import notify_reservation_booked, schedule_catalog_rebuild
+from theater.routers import use_primary
+from theater.utils import ajax_only, encode_cursor, decode_cursor
 from theater.forms import TicketForm
 from theater.messages import MSG
-from theater.models import Performance, Actor, Reservation, Ticket
+from theater.models import (
+    Performance,
+    Actor,
+    CatalogSnapshot,
+    HistoricalTicket,
+    Reservation,
+    Ticket,
+)
 
 
 @ajax_only
 @require_GET
+@use_primary
 def performance_info(request: HttpRequest, pk: int) -> JsonResponse:
     perf = get_object_or_404(Performance.objects.select_related("theatre_hall"), pk=pk)
     hall = perf.theatre_hall
@@ -44,6 +65,42 @@ def performance_info(request: HttpRequest, pk: int) -> JsonResponse:
     )
 
 
+@require_GET
+def catalog_snapshot(request: HttpRequest) -> HttpResponse:
+    """Redirect to the current catalog file.
+
+    The redirect is cached for 60 seconds; the file it points to never
+    changes. The file is a JSON object ``{"generated_at": ...,
+    "performances": [...]}``, each performance in the ``/performances/<id>/``
+    detail format, ordered by show time. Clients get it compressed by asking
+    the CDN with ``Accept-Encoding``. Answers 503 with ``Retry-After`` until
+    the first file has been built.
+    """
+    snapshot = current_catalog_snapshot()
+    if snapshot is None:
+        # the first file is built by the worker, never inside a request
+        schedule_catalog_rebuild()
+        response = HttpResponse(status=503)
+        response["Retry-After"] = str(CATALOG_REBUILD_DELAY)
+        return response
+    # the file itself is served by the storage (CDN in production)
+    response = redirect(storages[CATALOG_STORAGE].url(snapshot.name))
+    patch_cache_control(response, public=True, max_age=60)
+    return response
+
+
+@require_GET
+def catalog_snapshot_file(request: HttpRequest, digest: str) -> HttpResponse:
+    """Redirect to the catalog file for ``digest``.
+
+    The digest is a hash of the content, so the answer can be cached forever.
+    """
+    snapshot = get_object_or_404(CatalogSnapshot, digest=digest)
+    response = redirect(storages[CATALOG_STORAGE].url(snapshot.name))
+    patch_cache_control(response, public=True, max_age=31536000, immutable=True)
+    return response
+
+
 class ActorsListView(generic.ListView):
     template_name = "includes/actors_partial.html"
     context_object_name = "actors"
@@ -83,22 +140,80 @@ class PerformanceBaseListView(generic.ListView):
         return qs if self.limit is None else qs[: self.limit]
 
 
-class MyReservationsPartialView(LoginRequiredMixin, generic.ListView):
-    template_name = "includes/reservations_rows.html"
-    context_object_name = "my_tickets"
+class ReservationHistoryMixin:
+    history_page_size = 20
 
-    def get_queryset(self):
-        return (
-            Ticket.objects.filter(reservation__user=self.request.user)
+    def get_history_queryset(self, model=Ticket) -> QuerySet[Ticket]:
+        qs = (
+            model.objects.filter(reservation__user=self.request.user)
             .select_related(
-                "performance__play", "performance__theatre_hall", "reservation"
+                "reservation", "performance__play", "performance__theatre_hall"
             )
-            .order_by("-reservation__created_at")
+            .order_by("-reservation__created_at", "-id")
         )
+        if model is Ticket and self.request.GET.get("scope") != "all":
+            qs = qs.filter(performance__show_time__gte=timezone.now())
+
+        cursor = self.request.GET.get("cursor")
+        if cursor:
+            created_at, pk = decode_cursor(cursor)
+            qs = qs.filter(
+                Q(reservation__created_at__lt=created_at)
+                | Q(reservation__created_at=created_at, pk__lt=pk)
+            )
+        return qs
+
+    def get_history_page(self) -> list:
+        limit = self.history_page_size + 1
+        tickets = list(self.get_history_queryset()[:limit])
+        if self.request.GET.get("scope") == "all":
+            # tickets moved out of the hot table (TICKET_HISTORY); ids are kept,
+            # so both sides page with the same keyset cursor
+            tickets += self.get_history_queryset(HistoricalTicket)[:limit]
+            tickets.sort(key=lambda t: (t.reservation.created_at, t.pk), reverse=True)
+        return tickets[:limit]
+
+    def get_history_context(self) -> dict:
+        tickets = self.get_history_page()
+        has_next = len(tickets) > self.history_page_size
+        tickets = tickets[: self.history_page_size]
+
+        try:
+            offset = max(int(self.request.GET.get("offset", 0)), 0)
+        except ValueError:
+            offset = 0
+
+        next_url = None
+        if has_next:
+            last = tickets[-1]
+            params = {
+                "cursor": encode_cursor(last.reservation.created_at, last.pk),
+                "offset": offset + len(tickets),
+            }
+            if self.request.GET.get("scope") == "all":
+                params["scope"] = "all"
+            next_url = f"{reverse('ajax:reservations-my')}?{urlencode(params)}"
+
+        return {
+            "my_tickets": tickets,
+            "my_tickets_offset": offset,
+            "my_tickets_next_url": next_url,
+        }
+
+
+class MyReservationsPartialView(
+    LoginRequiredMixin, ReservationHistoryMixin, generic.TemplateView
+):
+    template_name = "includes/reservations_rows.html"
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context.update(self.get_history_context())
+        return context
 
 
 # Main
-class HomePageListView(FormMixin, PerformanceBaseListView):
+class HomePageListView(ReservationHistoryMixin, FormMixin, PerformanceBaseListView):
     template_name = "theater/home.html"
     form_class = TicketForm
 
@@ -111,15 +226,7 @@ class HomePageListView(FormMixin, PerformanceBaseListView):
         context = super().get_context_data(**kwargs)
         context["actors"] = Actor.objects.all().order_by("last_name")[:3]
         if self.request.user.is_authenticated:
-            context["my_tickets"] = (
-                Ticket.objects.filter(reservation__user=self.request.user)
-                .select_related(
-                    "reservation",
-                    "performance__play",
-                    "performance__theatre_hall",
-                )
-                .order_by("-reservation__created_at", "-id")
-            )
+            context.update(self.get_history_context())
         else:
             context["my_tickets"] = None
         return context
@@ -129,6 +236,7 @@ class HomePageListView(FormMixin, PerformanceBaseListView):
         is_ajax = request.headers.get("x-requested-with") == "XMLHttpRequest"
 
         if not form.is_valid():
+            record_booking("form", "conflict" if form.seat_taken() else "invalid")
             if is_ajax:
                 return JsonResponse(
                     {"success": False, "errors": form.errors.get_json_data()},
@@ -143,9 +251,11 @@ class HomePageListView(FormMixin, PerformanceBaseListView):
                 ticket = form.save(commit=False)
                 ticket.reservation = reservation
                 ticket.save()
-                notify_ticket_booked(request, reservation, ticket)
-        except IntegrityError:
-
+                notify_reservation_booked(request, reservation)
+        except IntegrityError as exc:
+            if not violates_constraint(exc, Ticket, "uniq_performance_row_seat"):
+                raise
+            record_booking("form", "conflict")
             if is_ajax:
                 return JsonResponse(
                     {
@@ -158,6 +268,7 @@ class HomePageListView(FormMixin, PerformanceBaseListView):
             form.add_error("seat", MSG.SEAT_TAKEN)
             return self.render_to_response(self.get_context_data(form=form))
 
+        record_booking("form", "success")
         if is_ajax:
             return JsonResponse({"success": True, "message": MSG.SUCCESS})
         return self.render_to_response(self.get_context_data(form=self.get_form()))
@@ -2,6 +2,7 @@ import os
 from pathlib import Path
 from dotenv import load_dotenv
 from celery import Celery
+from kombu import Queue
 
 BASE_DIR = Path(__file__).resolve().parent.parent
 load_dotenv(BASE_DIR / ".env")
@@ -21,12 +22,69 @@ def _normalize(url: str) -> str:
 broker = _normalize(broker)
 backend = _normalize(backend)
 
+# "celery" stays the default queue so messages already waiting there are
+# still consumed; everything not routed below goes to it
+QUEUES = ("celery", "notifications", "maintenance", "media", "analytics")
+
+TASK_ROUTES = {
+    "theater.tasks.send_reservation_email": {"queue": "notifications"},
+    "theater.tasks.send_ticket_email": {"queue": "notifications"},
+    "theater.tasks.dispatch_ticket_emails": {"queue": "notifications"},
+    "theater.tasks.schedule_performance_reminders": {"queue": "notifications"},
+    "theater.tasks.send_performance_reminders": {"queue": "notifications"},
+    "theater.tasks.generate_image_derivatives": {"queue": "media"},
+    "theater.tasks.purge_past_performances": {"queue": "maintenance"},
+    "theater.tasks.move_past_tickets_to_history": {"queue": "maintenance"},
+    "theater.tasks.purge_catalog_tombstones": {"queue": "maintenance"},
+    "theater.tasks.purge_sent_ticket_emails": {"queue": "maintenance"},
+}
+
+# Pool, concurrency and prefetch for a worker consuming one queue, picked with
+# CELERY_WORKER_PROFILE=<queue> (command-line options still win). Email is
+# spent waiting on SMTP, so threads overlap it; the rest is CPU or long
+# database work and keeps processes, which also enforce the task time limit.
+# A prefetch of 1 stops one worker holding long tasks the others could run.
+WORKER_PROFILES = {
+    "celery": {
+        "worker_pool": "prefork",
+        "worker_concurrency": 2,
+        "worker_prefetch_multiplier": 4,
+    },
+    "notifications": {
+        "worker_pool": "threads",
+        "worker_concurrency": 16,
+        "worker_prefetch_multiplier": 1,
+    },
+    "maintenance": {
+        "worker_pool": "prefork",
+        "worker_concurrency": 1,
+        "worker_prefetch_multiplier": 1,
+    },
+    "media": {
+        "worker_pool": "prefork",
+        "worker_concurrency": 2,
+        "worker_prefetch_multiplier": 1,
+    },
+    "analytics": {
+        "worker_pool": "prefork",
+        "worker_concurrency": 1,
+        "worker_prefetch_multiplier": 4,
+    },
+}
+
 app.conf.update(
     broker_url=broker,
     result_backend=backend,
     broker_connection_retry_on_startup=True,
     broker_use_ssl=None,
     redis_backend_use_ssl=None,
+    task_default_queue="celery",
+    task_queues=[Queue(name) for name in QUEUES],
+    task_routes=TASK_ROUTES,
 )
 
+worker_profile = os.getenv("CELERY_WORKER_PROFILE")
+if worker_profile:
+    app.conf.update(WORKER_PROFILES[worker_profile])
+
 app.autodiscover_tasks()
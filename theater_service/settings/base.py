@@ -39,7 +39,11 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "theater.metrics.MetricsMiddleware",
+    "theater.profiling.RequestProfilingMiddleware",
+    "theater.slow_queries.SlowQueryLogMiddleware",
     "django.middleware.security.SecurityMiddleware",
+    "theater.routers.ReplicaRoutingMiddleware",
     "whitenoise.middleware.WhiteNoiseMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -77,6 +81,71 @@ DATABASES = {
     }
 }
 
+# Safe-method API/ajax reads go to DATABASE_REPLICAS; writes and anything
+# within REPLICA_PIN_SECONDS of the client's last write stay on the primary.
+DATABASE_ROUTERS = ["theater.routers.PrimaryReplicaRouter"]
+DATABASE_REPLICAS: list[str] = []
+REPLICA_READ_PATH_PREFIXES = ("/api/", "/ajax/")
+REPLICA_PIN_SECONDS = int(os.getenv("REPLICA_PIN_SECONDS", "15"))
+
+# A second SQLite file (e.g. a stale copy of db.sqlite3) to try replica
+# routing locally.
+if os.getenv("SQLITE_REPLICA_NAME"):
+    DATABASES["replica"] = {
+        "ENGINE": "django.db.backends.sqlite3",
+        "NAME": os.getenv("SQLITE_REPLICA_NAME"),
+        "TEST": {"MIRROR": "default"},
+    }
+    DATABASE_REPLICAS = ["replica"]
+
+
+def postgres_replicas(primary: dict) -> dict[str, dict]:
+    hosts = [h.strip() for h in os.getenv("POSTGRES_REPLICA_HOSTS", "").split(",")]
+    return {
+        f"replica_{i}": {**primary, "HOST": host, "TEST": {"MIRROR": "default"}}
+        for i, host in enumerate(h for h in hosts if h)
+    }
+
+
+def postgres_connection_settings(**options) -> dict:
+    """
+    CONN_MAX_AGE / OPTIONS for a Postgres alias. With DB_POOL enabled every
+    process keeps a psycopg pool sized so that WEB_CONCURRENCY processes
+    together stay within DB_MAX_CONNECTIONS, with no more connections per
+    process than it has request threads. Processes that are not gunicorn
+    workers (a threaded Celery worker runs worker_concurrency tasks at once)
+    set DB_POOL_MAX_SIZE instead.
+    """
+    if os.getenv("DB_POOL", "true").lower() not in ("1", "true", "yes"):
+        return {
+            "CONN_MAX_AGE": int(os.getenv("DB_CONN_MAX_AGE", "60")),
+            "CONN_HEALTH_CHECKS": True,
+            "OPTIONS": options,
+        }
+
+    workers = max(int(os.getenv("WEB_CONCURRENCY", "1")), 1)
+    threads = max(int(os.getenv("GUNICORN_THREADS", "1")), 1)
+    budget = int(os.getenv("DB_MAX_CONNECTIONS", "20"))
+    max_size = max(1, min(threads, budget // workers))
+    max_size = int(os.getenv("DB_POOL_MAX_SIZE", max_size))
+    min_size = int(os.getenv("DB_POOL_MIN_SIZE", "1"))
+    return {
+        "CONN_MAX_AGE": 0,
+        # makes Django give the pool ConnectionPool.check_connection on
+        # checkout (a "check" pool option would clash with it)
+        "CONN_HEALTH_CHECKS": True,
+        "OPTIONS": {
+            **options,
+            "pool": {
+                "min_size": min(min_size, max_size),
+                "max_size": max_size,
+                "timeout": float(os.getenv("DB_POOL_TIMEOUT", "10")),
+                "max_idle": 5 * 60,
+            },
+        },
+    }
+
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         "NAME": "django.contrib.auth.password_validation.UserAttributeSimilarityValidator",
@@ -118,6 +187,10 @@ STATICFILES_DIRS = [
 
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
+# purged performances, tickets and reservations; keep out of MEDIA_ROOT.
+# Local only: dev and prod archive to Cloudinary raw storage
+ARCHIVE_ROOT = os.getenv("ARCHIVE_ROOT", BASE_DIR / "archive")
+
 STORAGES = {
     "default": {
         "BACKEND": "theater.storage.PruningFileSystemStorage",
@@ -125,6 +198,13 @@ STORAGES = {
     "staticfiles": {
         "BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage",
     },
+    "catalog": {
+        "BACKEND": "django.core.files.storage.FileSystemStorage",
+    },
+    "archive": {
+        "BACKEND": "django.core.files.storage.FileSystemStorage",
+        "OPTIONS": {"location": ARCHIVE_ROOT},
+    },
 }
 
 INTERNAL_IPS = [
@@ -140,6 +220,44 @@ EMAIL_USE_TLS = True
 EMAIL_HOST_USER = os.getenv("EMAIL_HOST_USER", "")
 EMAIL_HOST_PASSWORD = os.getenv("EMAIL_HOST_PASSWORD", "")
 
+# Booking confirmations are queued as ReservationEmail rows and sent in
+# batches of EMAIL_BATCH_SIZE over one SMTP connection, up to
+# EMAIL_DISPATCH_MAX_BATCHES per task run.
+EMAIL_BATCH_SIZE = int(os.getenv("EMAIL_BATCH_SIZE", "50"))
+EMAIL_DISPATCH_MAX_BATCHES = 20
+EMAIL_MAX_ATTEMPTS = 5
+# seconds a dispatcher owns the rows it claimed; rows still unsent after
+# that (a crashed worker) are picked up by the next dispatch
+EMAIL_CLAIM_LEASE = 10 * 60
+EMAIL_RETENTION_DAYS = 30
+
+# Every REMINDER_INTERVAL seconds, reservations at performances starting
+# within REMINDER_LEAD_HOURS get a ReminderEmail row and are sent in jobs of
+# EMAIL_BATCH_SIZE; rows still pending REMINDER_RETRY_AFTER seconds after
+# they were written are queued again.
+REMINDER_LEAD_HOURS = 24
+REMINDER_INTERVAL = 15 * 60
+REMINDER_RETRY_AFTER = 30 * 60
+
+# Uploaded actor avatars and play images get WebP and JPEG copies at these
+# widths (never wider than the upload) plus an inline IMAGE_LQIP_WIDTH px
+# placeholder, generated by a task on the media queue.
+IMAGE_DERIVATIVE_WIDTHS = (320, 640, 960)
+IMAGE_WEBP_QUALITY = 80
+IMAGE_JPEG_QUALITY = 82
+IMAGE_LQIP_WIDTH = 24
+
+# Media storages remember the URL built for each stored name, so listings
+# resolve each distinct file once per process instead of once per row.
+MEDIA_URL_CACHE_SIZE = 4096
+
+# Tasks published through theater.outbox are written in the caller's
+# transaction and relayed to the broker by `manage.py run_outbox_relay`, or by
+# the relay_outbox beat task every OUTBOX_RELAY_INTERVAL seconds without it.
+OUTBOX_BATCH_SIZE = 500
+OUTBOX_MAX_BATCHES = 20
+OUTBOX_RELAY_INTERVAL = float(os.getenv("OUTBOX_RELAY_INTERVAL", "5"))
+
 CRISPY_ALLOWED_TEMPLATE_PACKS = ["bootstrap5"]
 CRISPY_TEMPLATE_PACK = "bootstrap5"
 
@@ -152,12 +270,104 @@ CAPTCHA_BACKGROUND_COLOR = "#ffffff"
 CAPTCHA_FOREGROUND_COLOR = "#000000"
 CAPTCHA_CHALLENGE_FUNCT = "captcha.helpers.random_char_challenge"
 
+# Without REDIS_CACHE_URL every process gets its own LocMem cache, so cache
+# invalidation (the bookable-performances version key) stays in the process
+# that made the change; fine for one runserver, prod.py requires Redis.
+REDIS_CACHE_URL = os.getenv("REDIS_CACHE_URL")
+CACHES = {
+    "default": (
+        {
+            "BACKEND": "theater.profiling.ProfiledRedisCache",
+            "LOCATION": REDIS_CACHE_URL,
+        }
+        if REDIS_CACHE_URL
+        else {"BACKEND": "theater.profiling.ProfiledLocMemCache"}
+    )
+}
+
+# Share of requests that get a Server-Timing header and a "request_profile"
+# log line (theater.profiling); 0 takes the middleware out of the chain.
+REQUEST_PROFILING_SAMPLE_RATE = float(os.getenv("REQUEST_PROFILING_SAMPLE_RATE", "0"))
+
+# Statements over SLOW_QUERY_MS are logged on "theater.slow_queries" with their
+# EXPLAIN plan, once per fingerprint per SLOW_QUERY_REPEAT_SECONDS; full scans
+# of SLOW_QUERY_SEQ_SCAN_TABLES are flagged. 0 disables the middleware.
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "0"))
+SLOW_QUERY_REPEAT_SECONDS = 300
+SLOW_QUERY_SEQ_SCAN_TABLES = ("theater_ticket",)
+
+# Prometheus exposition (theater.metrics): /metrics on the web service, and
+# CELERY_METRICS_PORT on each worker when set. A non-empty METRICS_TOKEN
+# makes /metrics require "Authorization: Bearer <token>"; with
+# METRICS_REQUIRE_TOKEN (on in prod) /metrics is disabled until one is set.
+METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")
+METRICS_REQUIRE_TOKEN = False
+CELERY_METRICS_PORT = int(os.getenv("CELERY_METRICS_PORT", "0"))
+
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "handlers": {"console": {"class": "logging.StreamHandler"}},
+    "loggers": {
+        "theater.profiling": {"handlers": ["console"], "level": "INFO"},
+        "theater.slow_queries": {"handlers": ["console"], "level": "WARNING"},
+    },
+}
+
+CATALOG_TOMBSTONE_RETENTION_DAYS = 30
+# seconds a replaced catalog snapshot file is kept after /api/catalog/ stops
+# redirecting to it
+CATALOG_SNAPSHOT_GRACE = 60 * 60
+
+PURGE_BATCH_SIZE = 200
+PURGE_MAX_BATCHES = 50
+
+# Move tickets of started performances into theater_ticket_history so the
+# hot Ticket table only holds upcoming shows. Off by default because the v1
+# API's reservation/ticket endpoints only read the active table.
+TICKET_HISTORY = os.getenv("TICKET_HISTORY", "false").lower() in ("1", "true", "yes")
+TICKET_HISTORY_BATCH_SIZE = 1000
+
 CELERY_BROKER_URL = os.getenv("CELERY_BROKER_URL")
 CELERY_RESULT_BACKEND = os.getenv("CELERY_RESULT_BACKEND")
 CELERY_TASK_IGNORE_RESULT = True
 CELERY_TIMEZONE = "America/Vancouver"
 CELERY_TASK_TRACK_STARTED = False
 CELERY_TASK_TIME_LIMIT = 30 * 60
+CELERY_BEAT_SCHEDULE = {
+    # upcoming performances drop out of the catalog as they start
+    "rebuild-catalog-snapshot": {
+        "task": "theater.tasks.rebuild_catalog_snapshot",
+        "schedule": 60 * 60,
+    },
+    "purge-catalog-tombstones": {
+        "task": "theater.tasks.purge_catalog_tombstones",
+        "schedule": 24 * 60 * 60,
+    },
+    "relay-outbox": {
+        "task": "theater.tasks.relay_outbox",
+        "schedule": OUTBOX_RELAY_INTERVAL,
+    },
+    # confirmations that failed to send
+    "dispatch-ticket-emails": {
+        "task": "theater.tasks.dispatch_ticket_emails",
+        "schedule": 60,
+    },
+    "schedule-performance-reminders": {
+        "task": "theater.tasks.schedule_performance_reminders",
+        "schedule": REMINDER_INTERVAL,
+    },
+    "purge-sent-ticket-emails": {
+        "task": "theater.tasks.purge_sent_ticket_emails",
+        "schedule": 24 * 60 * 60,
+    },
+}
+
+if TICKET_HISTORY:
+    CELERY_BEAT_SCHEDULE["move-past-tickets-to-history"] = {
+        "task": "theater.tasks.move_past_tickets_to_history",
+        "schedule": 60 * 60,
+    }
 
 REST_FRAMEWORK = {
     "DEFAULT_PERMISSION_CLASSES": [
@@ -13,14 +13,25 @@ DATABASES = {
         "PASSWORD": os.getenv("POSTGRES_PASSWORD"),
         "HOST": os.getenv("POSTGRES_HOST", "db"),
         "PORT": int(os.getenv("POSTGRES_PORT", "5432")),
+        **postgres_connection_settings(),  # noqa: F405
     }
 }
 
+DATABASES.update(postgres_replicas(DATABASES["default"]))  # noqa: F405
+DATABASE_REPLICAS = [alias for alias in DATABASES if alias != "default"]
+
 STORAGES = {
     "default": {
-        "BACKEND": "cloudinary_storage.storage.MediaCloudinaryStorage",
+        "BACKEND": "theater.cloud_storage.CachedMediaCloudinaryStorage",
     },
     "staticfiles": {
         "BACKEND": "whitenoise.storage.CompressedManifestStaticFilesStorage",
     },
+    "catalog": {
+        "BACKEND": "cloudinary_storage.storage.RawMediaCloudinaryStorage",
+    },
+    # containers and the build.sh deploy have no persistent disk
+    "archive": {
+        "BACKEND": "cloudinary_storage.storage.RawMediaCloudinaryStorage",
+    },
 }
@@ -17,15 +17,39 @@ DATABASES = {
         "PASSWORD": os.environ["POSTGRES_PASSWORD"],
         "HOST": os.environ["POSTGRES_HOST"],
         "PORT": int(os.environ.get("POSTGRES_DB_PORT", 5432)),
-        "OPTIONS": {"sslmode": "require"},
+        **postgres_connection_settings(sslmode="require"),  # noqa: F405
     }
 }
 
+DATABASES.update(postgres_replicas(DATABASES["default"]))  # noqa: F405
+DATABASE_REPLICAS = [alias for alias in DATABASES if alias != "default"]
+
 STORAGES = {
     "default": {
-        "BACKEND": "cloudinary_storage.storage.MediaCloudinaryStorage",
+        "BACKEND": "theater.cloud_storage.CachedMediaCloudinaryStorage",
     },
     "staticfiles": {
         "BACKEND": "whitenoise.storage.CompressedManifestStaticFilesStorage",
     },
+    "catalog": {
+        "BACKEND": "cloudinary_storage.storage.RawMediaCloudinaryStorage",
+    },
+    # containers and the build.sh deploy have no persistent disk
+    "archive": {
+        "BACKEND": "cloudinary_storage.storage.RawMediaCloudinaryStorage",
+    },
+}
+
+# The bookable-performances cache is invalidated by bumping a version key,
+# which only reaches every web process through a shared cache: no LocMem
+# fallback in production
+CACHES = {
+    "default": {
+        "BACKEND": "theater.profiling.ProfiledRedisCache",
+        "LOCATION": os.environ["REDIS_CACHE_URL"],
+    }
 }
+
+# /metrics is public unless a token is set, so production refuses to serve
+# it without one
+METRICS_REQUIRE_TOKEN = True
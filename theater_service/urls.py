@@ -13,11 +13,14 @@ from rest_framework_simplejwt.views import (
     TokenVerifyView,
 )
 
+from theater.metrics import metrics_view
+
 urlpatterns = [
     path("admin/", admin.site.urls),
     path("", include("theater.urls", namespace="theater")),
     path("accounts/", include("user.urls", namespace="user")),
     path("captcha/", include("captcha.urls")),
+    path("metrics", metrics_view, name="metrics"),
     path("ajax/", include(("theater.ajax.urls", "ajax"), namespace="ajax")),
     # API (legacy Django views)
     path("api/", include(("theater.api.urls", "api"), namespace="api")),